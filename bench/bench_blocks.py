@@ -0,0 +1,54 @@
+"""
+Benchmark markdown_to_html_node on a synthetic 50k-block document.
+
+Run from the repository root:  python bench/bench_blocks.py
+Pass --src to time another checkout's src/ directory (e.g. an older commit
+exported with `git worktree add`) against the same document.
+"""
+import argparse
+import os
+import sys
+import time
+
+BLOCKS = (
+    "# Heading with **bold** text",
+    "A paragraph with *italic*, `code` and a [link](https://example.com).",
+    "```\nprint('hello')\nprint('world')\n```",
+    "> a quoted line\n> another quoted line",
+    "* first item\n* second item\n* third item",
+    "1. first\n2. second\n3. third\n4. fourth\n5. fifth",
+)
+
+
+def synthetic_document(blocks):
+    """Build a markdown document that cycles through every block type"""
+    return "\n\n".join(BLOCKS[i % len(BLOCKS)] for i in range(blocks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--src",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"),
+        help="Directory containing textnode.py",
+    )
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(args.src))
+    from textnode import markdown_to_html_node
+
+    document = synthetic_document(args.blocks)
+    best = None
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        markdown_to_html_node(document)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{args.blocks} blocks: {best:.3f}s ({args.blocks / best:,.0f} blocks/s) from {args.src}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark text_to_textnodes on paragraphs with a growing number of links.
+
+Run from the repository root:  python bench/bench_inline.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from textnode import text_to_textnodes
+
+
+def link_paragraph(links):
+    """Build one paragraph with the given number of links and inline markup"""
+    parts = []
+    for i in range(links):
+        parts.append(f"see **item {i}** and [link {i}](https://example.com/{i}) or `code` ")
+    return "".join(parts)
+
+
+def time_paragraph(text, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text_to_textnodes(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print(f"{'links':>8} {'seconds':>10} {'us/link':>10}")
+    for links in (10, 100, 1_000, 10_000):
+        elapsed = time_paragraph(link_paragraph(links))
+        print(f"{links:>8} {elapsed:>10.4f} {elapsed / links * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Measure the throughput of the in-memory Renderer in pages per second.
+
+Run from the repository root:  python bench/bench_render.py
+Pages come from the synthetic corpus and never touch the disk. Each mode is
+timed with a cold block cache and then again warm, as a long-running
+service would see it.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from corpus import BLOCK_TYPES, CorpusGenerator, parse_mix
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+TEMPLATE_PATH = os.path.join(ROOT, "template.html")
+
+
+def run_serial(renderer, pages, jobs):
+    return sum(1 for _ in renderer.render_pages(pages))
+
+
+def run_threads(renderer, pages, jobs):
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return sum(1 for _ in executor.map(lambda item: renderer.render_page(*item), pages))
+
+
+def run_batch(renderer, pages, jobs):
+    return sum(1 for _ in renderer.render_batch(pages, jobs))
+
+
+MODES = {"serial": run_serial, "threads": run_threads, "batch": run_batch}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=40, help="Blocks per page")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=None,
+        help=f"Block weights, e.g. paragraph=6,code=1 (types: {', '.join(BLOCK_TYPES)})",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--cache-size", type=int, default=1 << 16, help="Rendered blocks kept in memory")
+    parser.add_argument("--modes", default=",".join(MODES), help="Comma-separated modes to run")
+    parser.add_argument(
+        "--src", default=os.path.join(ROOT, "src"),
+        help="Directory containing renderer.py",
+    )
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(args.src))
+    from blockcache import BlockCache
+    from renderer import Renderer
+
+    generator = CorpusGenerator(args.pages, args.blocks, args.mix, seed=args.seed)
+    pages = [(generator.page_path(i), generator.page(i)) for i in range(args.pages)]
+    print(f"{args.pages} pages, {sum(len(markdown) for _, markdown in pages) / 1e6:.1f} MB of markdown, {args.jobs} jobs")
+
+    for mode in args.modes.split(","):
+        # A fresh renderer per mode, so the first pass starts with an empty cache and no pool.
+        with Renderer(TEMPLATE_PATH, BlockCache(args.cache_size)) as renderer:
+            for state in ("cold", "warm"):
+                start = time.perf_counter()
+                count = MODES[mode](renderer, pages, args.jobs)
+                elapsed = time.perf_counter() - start
+                print(f"{mode:<8} {state}  {count / elapsed:10.0f} pages/s  ({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
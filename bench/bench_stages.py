@@ -0,0 +1,190 @@
+"""
+Time each build stage on a synthetic corpus and compare against a stored baseline.
+
+Run from the repository root:  python bench/bench_stages.py
+Exits non-zero when a stage is slower than the baseline by more than
+--threshold. Pass --update-baseline to record the current timings instead.
+
+Timings are divided by a fixed pure-Python calibration loop before they are
+compared, so a baseline recorded on one machine stays roughly usable on another.
+Each stage and the calibration keep the median of --repeat runs, which a
+single slow or lucky run does not move.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from corpus import BLOCK_TYPES, CorpusGenerator, parse_mix
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+STAGES = ("read", "blocks", "inline", "nodes", "serialize", "write")
+
+
+def calibrate():
+    """Time a fixed interpreter workload to normalise timings across machines."""
+    start = time.perf_counter()
+    total = 0
+    for i in range(2_000_000):
+        total += i % 7
+    return time.perf_counter() - start
+
+
+def time_stages(paths, output_dir):
+    """Run every stage once over all pages and return {stage: seconds}."""
+    from textnode import (
+        BLOCK_TYPE_CODE,
+        block_to_block_type,
+        markdown_to_blocks,
+        markdown_to_html_node,
+        text_to_textnodes,
+    )
+
+    timings = {}
+
+    start = time.perf_counter()
+    documents = []
+    for path in paths:
+        with open(path) as f:
+            documents.append(f.read())
+    timings["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blocks = [
+        [(block, block_to_block_type(block)) for block in markdown_to_blocks(document)]
+        for document in documents
+    ]
+    timings["blocks"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    textnodes = [
+        [text_to_textnodes(block) for block, block_type in page if block_type != BLOCK_TYPE_CODE]
+        for page in blocks
+    ]
+    timings["inline"] = time.perf_counter() - start
+
+    # The build's own path through block_to_html_node, less the inline parsing it does.
+    build_timings = {}
+    trees = [markdown_to_html_node(document, timings=build_timings) for document in documents]
+    timings["nodes"] = build_timings["render"]
+
+    start = time.perf_counter()
+    rendered = [tree.to_html() for tree in trees]
+    timings["serialize"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i, html in enumerate(rendered):
+        with open(os.path.join(output_dir, f"{i}.html"), "w") as f:
+            f.write(html)
+    timings["write"] = time.perf_counter() - start
+    return timings
+
+
+def compare(current, baseline, threshold, floor=0.002):
+    """Return a report line per stage and the stages that regressed.
+
+    A stage regresses when it is more than threshold slower relative to the
+    calibration and also more than floor seconds slower, so millisecond-sized
+    I/O stages do not fail on scheduler noise.
+    """
+    lines = []
+    regressed = []
+    for stage in STAGES:
+        now = current["stages"][stage] / current["calibration"]
+        before = baseline["stages"].get(stage)
+        if before is None:
+            lines.append(f"{stage:<10} {current['stages'][stage] * 1000:9.1f} ms  (no baseline)")
+            continue
+        expected = before / baseline["calibration"]
+        change = now / expected - 1
+        flag = ""
+        if change > threshold and (now - expected) * current["calibration"] > floor:
+            flag = "  REGRESSED"
+            regressed.append(stage)
+        lines.append(f"{stage:<10} {current['stages'][stage] * 1000:9.1f} ms  {change:+7.1%}{flag}")
+    return lines, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--blocks", type=int, default=40, help="Blocks per page")
+    parser.add_argument(
+        "--mix", type=parse_mix, default=None,
+        help=f"Block weights, e.g. paragraph=6,code=1 (types: {', '.join(BLOCK_TYPES)})",
+    )
+    parser.add_argument("--link-density", type=float, default=0.1)
+    parser.add_argument("--depth", type=int, default=2, help="Directory nesting of pages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=9, help="Keep the median of this many runs")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown per stage")
+    parser.add_argument(
+        "--floor", type=float, default=2.0,
+        help="Ignore slowdowns smaller than this many milliseconds",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument(
+        "--src", default=os.path.join(ROOT, "src"),
+        help="Directory containing textnode.py",
+    )
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(args.src))
+
+    generator = CorpusGenerator(args.pages, args.blocks, args.mix, args.link_density, args.depth, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generator.write(os.path.join(tmp, "content"))
+        output_dir = os.path.join(tmp, "public")
+        os.makedirs(output_dir)
+        runs = {stage: [] for stage in STAGES}
+        calibrations = []
+        for _ in range(args.repeat):
+            # Like timeit, keep collector pauses out of the stage that happens to trigger them.
+            gc.collect()
+            gc.disable()
+            try:
+                timings = time_stages(paths, output_dir)
+            finally:
+                gc.enable()
+            for stage, elapsed in timings.items():
+                runs[stage].append(elapsed)
+            # Calibrating between runs lets it see the same machine load the stages did.
+            calibrations.append(calibrate())
+
+    current = {
+        "corpus": {
+            "pages": args.pages, "blocks": args.blocks, "mix": generator.mix,
+            "link_density": args.link_density, "depth": args.depth, "seed": args.seed,
+        },
+        "calibration": statistics.median(calibrations),
+        "stages": {stage: statistics.median(elapsed) for stage, elapsed in runs.items()},
+    }
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote baseline to {args.baseline}")
+        return
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {"calibration": current["calibration"], "stages": {}}
+    if baseline.get("corpus", current["corpus"]) != current["corpus"]:
+        sys.exit("Baseline was recorded on a different corpus; rerun with --update-baseline")
+
+    lines, regressed = compare(current, baseline, args.threshold, args.floor / 1000)
+    print("\n".join(lines))
+    if regressed:
+        sys.exit(f"{len(regressed)} stage(s) regressed more than {args.threshold:.0%}: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
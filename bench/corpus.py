@@ -0,0 +1,102 @@
+"""
+Deterministic generator for synthetic content trees.
+
+The same arguments and seed always produce the same files, so timings from
+different commits are measured on identical input.
+"""
+import os
+import random
+
+WORDS = (
+    "the", "majesty", "of", "tolkien", "ring", "fellowship", "shire", "mountain",
+    "river", "king", "return", "journey", "elves", "dwarves", "wizard", "tower",
+    "ancient", "forest", "road", "song", "shadow", "light", "council", "gate",
+)
+BLOCK_TYPES = ("paragraph", "heading", "code", "quote", "list", "ordered")
+DEFAULT_MIX = {"paragraph": 6, "heading": 1, "code": 1, "quote": 1, "list": 1, "ordered": 1}
+
+
+def parse_mix(text):
+    """Parse "paragraph=6,code=1" into a block type weight dict."""
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in BLOCK_TYPES:
+            raise ValueError(f"Unknown block type: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class CorpusGenerator:
+    """Writes pages of weighted random blocks under a nested directory tree.
+
+    link_density is the chance that any inline span of a paragraph, list item
+    or quote line is a link; depth is how many directories deep pages sit.
+    """
+    def __init__(self, pages=200, blocks=40, mix=None, link_density=0.1, depth=2, seed=0):
+        self.pages = pages
+        self.blocks = blocks
+        self.mix = mix or DEFAULT_MIX
+        self.link_density = link_density
+        self.depth = depth
+        self.seed = seed
+
+    def page_path(self, i):
+        parts = [f"section{(i // 10 ** level) % 10}" for level in range(self.depth, 0, -1)]
+        return os.path.join(*parts, f"page{i}", "index.md")
+
+    def words(self, rng, count):
+        return " ".join(rng.choice(WORDS) for _ in range(count))
+
+    def inline(self, rng, spans=4):
+        """Return a line of text with a random mix of inline markup."""
+        parts = []
+        for _ in range(spans):
+            text = self.words(rng, rng.randint(2, 6))
+            roll = rng.random()
+            if roll < self.link_density:
+                target = self.page_path(rng.randrange(self.pages)).replace(os.sep, "/")
+                parts.append(f"[{text}](/{os.path.dirname(target)}/)")
+            elif roll < self.link_density + 0.1:
+                parts.append(f"**{text}**")
+            elif roll < self.link_density + 0.2:
+                parts.append(f"*{text}*")
+            elif roll < self.link_density + 0.25:
+                parts.append(f"`{text}`")
+            else:
+                parts.append(text)
+        return " ".join(parts)
+
+    def block(self, rng, block_type):
+        if block_type == "heading":
+            return "#" * rng.randint(2, 6) + " " + self.inline(rng, 2)
+        if block_type == "code":
+            return "```\n" + "\n".join(self.words(rng, 5) for _ in range(rng.randint(2, 8))) + "\n```"
+        if block_type == "quote":
+            return "\n".join("> " + self.inline(rng, 2) for _ in range(rng.randint(1, 4)))
+        if block_type == "list":
+            return "\n".join("* " + self.inline(rng, 2) for _ in range(rng.randint(2, 6)))
+        if block_type == "ordered":
+            return "\n".join(f"{n}. " + self.inline(rng, 2) for n in range(1, rng.randint(3, 7)))
+        return self.inline(rng, rng.randint(3, 10))
+
+    def page(self, i):
+        """Return the markdown of page i, which depends only on i and the seed."""
+        rng = random.Random(f"{self.seed}-{i}")
+        types = list(self.mix)
+        weights = [self.mix[name] for name in types]
+        blocks = [f"# Page {i}: {self.words(rng, 3)}"]
+        blocks.extend(self.block(rng, block_type) for block_type in rng.choices(types, weights, k=self.blocks))
+        return "\n\n".join(blocks)
+
+    def write(self, root):
+        """Write every page under root and return their paths."""
+        paths = []
+        for i in range(self.pages):
+            path = os.path.join(root, self.page_path(i))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write(self.page(i))
+            paths.append(path)
+        return paths
@@ -0,0 +1,121 @@
+"""
+Load-test server.py against a generated site and report requests/sec and latency.
+
+Run from the repository root:  python bench/loadtest.py --pages 200 --clients 16
+Pass --single-threaded to measure the plain HTTPServer mode for comparison.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from main import generate_pages_recursive
+
+
+def generate_site(root, pages):
+    """Render a synthetic content tree with the real generator and return the page URLs"""
+    content = os.path.join(root, "content")
+    public = os.path.join(root, "public")
+    for i in range(pages):
+        page_dir = os.path.join(content, f"section{i % 10}", f"page{i}")
+        os.makedirs(page_dir)
+        with open(os.path.join(page_dir, "index.md"), "w") as f:
+            f.write(f"# Page {i}\n\n")
+            f.write("\n\n".join(
+                f"Paragraph {j} with **bold**, *italic* and a [link](/section{j % 10}/)."
+                for j in range(40)
+            ))
+    with contextlib.redirect_stdout(io.StringIO()):
+        generate_pages_recursive(content, os.path.join(ROOT, "template.html"), public)
+    return public, [f"/section{i % 10}/page{i}/" for i in range(pages)]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server did not start")
+
+
+def run_client(port, urls, requests, latencies, keep_alive, seed):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    rng = random.Random(seed)
+    local = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        conn.request("GET", rng.choice(urls))
+        response = conn.getresponse()
+        response.read()
+        local.append(time.perf_counter() - start)
+        if not keep_alive or response.will_close:
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    conn.close()
+    latencies.extend(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per client")
+    parser.add_argument("--single-threaded", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        public, urls = generate_site(tmp, args.pages)
+        port = free_port()
+        command = [sys.executable, os.path.join(ROOT, "server.py"), "--dir", public, "--port", str(port), "--quiet"]
+        if args.single_threaded:
+            command.append("--single-threaded")
+        server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+        try:
+            wait_for_server(port)
+            latencies = []
+            threads = [
+                threading.Thread(
+                    target=run_client,
+                    args=(port, urls, args.requests, latencies, not args.single_threaded, seed),
+                )
+                for seed in range(args.clients)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    total = len(latencies)
+    print(f"{total} requests from {args.clients} clients in {elapsed:.2f}s")
+    print(f"{total / elapsed:,.0f} requests/sec")
+    print(f"p50 {latencies[total // 2] * 1000:.2f} ms, p99 {latencies[int(total * 0.99)] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
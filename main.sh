@@ -1,2 +1,2 @@
-python src/main.py
-python server.py --dir public
+python src/main.py --publish site
+python server.py --dir site
@@ -1,9 +1,213 @@
 import os
+import re
+import json
+import time
+import hashlib
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from http import HTTPStatus
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import unquote, urlsplit
+
+
+class FileCache:
+    """Thread-safe LRU cache of file bytes keyed by path, mtime and size."""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_bytes=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, stat):
+        """Return the file's bytes, reading from disk only if it is not cached or has changed."""
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) <= self.max_file_bytes:
+            self._put(key, data)
+        return data
+
+    def _put(self, key, data):
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+# Written next to the site by the build (see OutputIndex in src/manifest.py):
+# {relative path: [size, mtime_ns, sha256]}.
+OUTPUT_INDEX_NAME = ".outputs.json"
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+# Precompressed siblings written by the build (src/compress.py), most preferred
+# first. The build stamps each with its source's mtime to mark it fresh.
+ENCODINGS = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+# Rewritten by `main.py --watch` after each rebuild; the live-reload endpoint
+# streams its contents as server-sent events.
+BUILD_ID_NAME = ".build-id"
+LIVE_RELOAD_PATH = "/__livereload"
+LIVE_RELOAD_POLL = 0.05
+LIVE_RELOAD_KEEPALIVE = 15
+# Written by `main.py --fingerprint` (see src/fingerprint.py):
+# {asset path: [size, mtime_ns, fingerprinted path]}. A fingerprinted path
+# changes whenever its content does, so it may be cached forever.
+FINGERPRINTS_NAME = ".fingerprints.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class ETagStore:
+    """Strong content-hash ETags, read from the build's output index or hashed once on demand.
+
+    At most max_computed hashed ETags are kept, least recently used first out.
+    """
+
+    def __init__(self, max_computed=4096):
+        self._index = {}
+        self._index_stat = None
+        self.max_computed = max_computed
+        self._computed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load_index(self, root):
+        index_path = os.path.join(root, OUTPUT_INDEX_NAME)
+        try:
+            stat = os.stat(index_path)
+        except OSError:
+            self._index, self._index_stat = {}, None
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._index_stat:
+            return
+        try:
+            with open(index_path, "r") as f:
+                self._index = json.load(f)
+        except (OSError, ValueError):
+            self._index = {}
+        self._index_stat = key
+
+    def get(self, root, path, stat):
+        with self._lock:
+            self._load_index(root)
+            rel_path = os.path.relpath(path, root).replace(os.sep, "/")
+            known = self._index.get(rel_path)
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                return f'"{known[2][:32]}"'
+            computed = self._computed.get(path)
+            if computed and computed[0] == (stat.st_size, stat.st_mtime_ns):
+                self._computed.move_to_end(path)
+                return computed[1]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()[:32]}"'
+        with self._lock:
+            self._computed[path] = ((stat.st_size, stat.st_mtime_ns), etag)
+            self._computed.move_to_end(path)
+            while len(self._computed) > self.max_computed:
+                self._computed.popitem(last=False)
+        return etag
+
+
+class FingerprintStore:
+    """The set of fingerprinted paths in the served directory, reloaded when the build rewrites it."""
+
+    def __init__(self):
+        self._paths = frozenset()
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def is_fingerprinted(self, root, path):
+        with self._lock:
+            self._load(root)
+            return os.path.relpath(path, root).replace(os.sep, "/") in self._paths
+
+    def _load(self, root):
+        try:
+            stat = os.stat(os.path.join(root, FINGERPRINTS_NAME))
+        except OSError:
+            self._paths, self._stat = frozenset(), None
+            return
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if key == self._stat:
+            return
+        try:
+            with open(os.path.join(root, FINGERPRINTS_NAME), "r") as f:
+                self._paths = frozenset(entry[2] for entry in json.load(f).values())
+        except (OSError, ValueError, IndexError, TypeError, AttributeError):
+            self._paths = frozenset()
+        self._stat = key
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a single byte range, None to ignore it, or False if unsatisfiable."""
+    match = RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def is_hidden(url_path):
+    """Check whether any segment of a request path is a dotfile, such as the build's .manifest.json."""
+    path = unquote(urlsplit(url_path).path)
+    return any(segment.startswith(".") for segment in path.split("/"))
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows (q > 0)."""
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    return accepted
 
 
 class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        if not getattr(self.server, "quiet", False):
+            super().log_message(format, *args)
+
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
@@ -12,19 +216,229 @@ class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200, "OK")
+        self.send_header("Content-Length", "0")
         self.end_headers()
 
+    def send_head(self):
+        # The build keeps its state in dotfiles next to the site; they are not part of it.
+        if is_hidden(self.path):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        return super().send_head()
+
+
+class CachingHTTPRequestHandler(CORSHTTPRequestHandler):
+    """Serves files over HTTP/1.1 keep-alive, from the shared FileCache where possible."""
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # keep-alive response waits on the client's delayed ACK.
+    disable_nagle_algorithm = True
+    cache = FileCache()
+    etags = ETagStore()
+    fingerprints = FingerprintStore()
+    # Symlink to a published build (see src/publish.py), or None to serve the
+    # working directory.
+    published = None
+
+    def pin_build(self):
+        """Serve this request from the build the published link points at now,
+        so a publish in the middle of it cannot mix two builds."""
+        if self.published is not None:
+            self.directory = os.path.realpath(self.published)
+
+    def do_GET(self):
+        self.pin_build()
+        if self.path == LIVE_RELOAD_PATH:
+            self.live_reload()
+            return
+        self.serve(send_body=True)
+
+    def live_reload(self):
+        """Send the current build id, then again every time a rebuild changes it."""
+        self.close_connection = True
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        last_id = None
+        last_sent = time.monotonic()
+        try:
+            while True:
+                try:
+                    with open(os.path.join(self.directory, BUILD_ID_NAME), "r") as f:
+                        build_id = f.read().strip()
+                except OSError:
+                    build_id = ""
+                if build_id != last_id:
+                    self.wfile.write(f"data: {build_id}\n\n".encode())
+                    last_id = build_id
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent > LIVE_RELOAD_KEEPALIVE:
+                    self.wfile.write(b": keep-alive\n\n")
+                    last_sent = time.monotonic()
+                time.sleep(LIVE_RELOAD_POLL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_HEAD(self):
+        self.pin_build()
+        self.serve(send_body=False)
+
+    def resolve(self):
+        """Return (path, stat) of the file to serve, or None to defer to SimpleHTTPRequestHandler."""
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split("?", 1)[0].endswith("/"):
+                return None
+            path = os.path.join(path, "index.html")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return path, stat
+
+    def serve(self, send_body):
+        resolved = None if is_hidden(self.path) else self.resolve()
+        if resolved is None:
+            # Redirects, directory listings and 404s.
+            f = self.send_head()
+            if f:
+                try:
+                    if send_body:
+                        self.copyfile(f, self.wfile)
+                finally:
+                    f.close()
+            return
+
+        path, stat = resolved
+        content_type = self.guess_type(path)
+        immutable = self.fingerprints.is_fingerprinted(self.directory, path)
+        path, stat, encoding, varies = self.negotiate(path, stat)
+        try:
+            etag = self.etags.get(self.directory, path, stat)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+
+        if self.not_modified(etag, stat):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            if varies:
+                self.send_header("Vary", "Accept-Encoding")
+            if immutable:
+                self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+            self.end_headers()
+            return
+
+        size = stat.st_size
+        byte_range = None
+        if "Range" in self.headers and self.if_range_matches(etag, last_modified):
+            byte_range = parse_range(self.headers["Range"], size)
+            if byte_range is False:
+                self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+        start, end = byte_range or (0, size - 1)
+
+        if byte_range:
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", content_type)
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if varies:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Content-Length", str(end - start + 1 if size else 0))
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("ETag", etag)
+        self.send_header("Accept-Ranges", "bytes")
+        if immutable:
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        self.end_headers()
+        if send_body and size:
+            self.send_body(path, stat, start, end - start + 1)
+
+    def negotiate(self, path, stat):
+        """Pick a fresh precompressed sibling the client accepts.
+
+        Returns (path, stat, encoding, varies), where varies says whether the
+        response depends on Accept-Encoding at all.
+        """
+        accepted = accepted_encodings(self.headers.get("Accept-Encoding", ""))
+        varies = False
+        for encoding, suffix in ENCODINGS:
+            try:
+                sibling = os.stat(path + suffix)
+            except OSError:
+                continue
+            if sibling.st_mtime_ns != stat.st_mtime_ns:
+                continue
+            varies = True
+            if encoding in accepted or "*" in accepted:
+                return path + suffix, sibling, encoding, True
+        return path, stat, None, varies
+
+    def not_modified(self, etag, stat):
+        """Evaluate If-None-Match, or If-Modified-Since when there is no If-None-Match."""
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return etag in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError, IndexError):
+            return False
+        if since is None:
+            return False
+        return int(stat.st_mtime) <= since.timestamp()
+
+    def if_range_matches(self, etag, last_modified):
+        if_range = self.headers.get("If-Range")
+        return if_range is None or if_range.strip() in (etag, last_modified)
+
+    def send_body(self, path, stat, offset, count):
+        """Send small files from the cache; large ones go through socket.sendfile, which uses
+        os.sendfile where the platform allows so the bytes never enter the Python heap."""
+        if stat.st_size <= self.cache.max_file_bytes:
+            data = self.cache.get(path, stat)
+            self.wfile.write(memoryview(data)[offset:offset + count])
+            return
+        with open(path, "rb") as f:
+            self.wfile.flush()
+            self.connection.sendfile(f, offset, count)
+
 
 def run(
-    server_class=HTTPServer,
-    handler_class=CORSHTTPRequestHandler,
+    server_class=ThreadingHTTPServer,
+    handler_class=CachingHTTPRequestHandler,
     port=8000,
     directory=None,
+    quiet=False,
 ):
-    if directory:  # Change the current working directory if directory is specified
+    if directory and os.path.islink(directory) and issubclass(handler_class, CachingHTTPRequestHandler):
+        # A published build: resolve the link per request to follow publishes and rollbacks.
+        handler_class.published = os.path.abspath(directory)
+    elif directory:  # Change the current working directory if directory is specified
         os.chdir(directory)
     server_address = ("", port)
     httpd = server_class(server_address, handler_class)
+    httpd.daemon_threads = True
+    httpd.quiet = quiet
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
     httpd.serve_forever()
 
@@ -35,6 +449,18 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--single-threaded", action="store_true",
+        help="Serve one request at a time with the plain HTTP/1.0 handler",
+    )
+    parser.add_argument(
+        "--cache-mb", type=int, default=64, help="Size of the in-memory file cache in MB"
+    )
+    parser.add_argument("--quiet", action="store_true", help="Do not log every request")
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    CachingHTTPRequestHandler.cache = FileCache(max_bytes=args.cache_mb * 1024 * 1024)
+    if args.single_threaded:
+        run(HTTPServer, CORSHTTPRequestHandler, port=args.port, directory=args.dir, quiet=args.quiet)
+    else:
+        run(port=args.port, directory=args.dir, quiet=args.quiet)
@@ -0,0 +1,110 @@
+"""
+This module contains the block cache: rendered HTML of markdown blocks keyed by their text.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import htmlnode
+import textnode
+
+
+def renderer_digest():
+    """Hash the parser and renderer sources so a code change invalidates stored fragments."""
+    digest = hashlib.blake2b(digest_size=16)
+    for module in (textnode, htmlnode):
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.digest()
+
+
+class BlockCache:
+    """LRU of rendered block HTML in memory, optionally backed by a sqlite file between builds.
+
+    The cache is thread-safe. When pickled for a worker process it drops its
+    memory and connection and reopens the same sqlite file on first use.
+    """
+    def __init__(self, max_entries=4096, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = []
+        self._db = None
+        self._salt = renderer_digest()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"max_entries": self.max_entries, "path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_entries"], state["path"])
+
+    def key(self, block, variant=b""):
+        # variant tells apart renderings of one block, such as under different
+        # fingerprinted asset urls (AssetUrls.digest).
+        return hashlib.blake2b(block.encode(), digest_size=16, key=self._salt + variant).digest()
+
+    def connection(self):
+        if self._db is None and self.path is not None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Imported here so builds without a disk store do not pay for it.
+            import sqlite3
+
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS blocks (key BLOB PRIMARY KEY, html TEXT NOT NULL)")
+        return self._db
+
+    def get(self, block, variant=b""):
+        """Return the cached HTML for block, or None."""
+        key = self.key(block, variant)
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None and self.connection() is not None:
+                row = self._db.execute("SELECT html FROM blocks WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    html = row[0]
+                    self._remember(key, html)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, block, html, variant=b""):
+        key = self.key(block, variant)
+        with self._lock:
+            self._remember(key, html)
+            if self.path is not None:
+                self._pending.append((key, html))
+
+    def _remember(self, key, html):
+        self._entries[key] = html
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self):
+        """Write fragments rendered since the last flush to the sqlite store."""
+        with self._lock:
+            if not self._pending or self.connection() is None:
+                return
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO blocks VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def summary(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate)"
@@ -0,0 +1,62 @@
+"""
+Thin client for the build daemon: send this command line to it and print the build's output.
+
+Run from the site root:  python src/client.py [--socket PATH] [build options]
+Falls back to building in this process when no daemon is listening.
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = ".build.sock"
+
+
+def request_build(socket_path, argv):
+    """Run a build in the daemon and return its exit code, or None if no daemon is listening."""
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(socket_path)
+    except (ConnectionRefusedError, FileNotFoundError):
+        conn.close()
+        return None
+
+    with conn, conn.makefile("rb") as replies:
+        conn.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n")
+        for line in replies:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+            else:
+                return message["exit"]
+    sys.stderr.write("Build daemon closed the connection\n")
+    return 1
+
+
+def parse_args(argv):
+    """Split argv into the daemon's socket path and the build options passed on to it."""
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    args, rest = parser.parse_known_args(argv)
+    return args.socket, rest
+
+
+def main(argv=None):
+    socket_path, argv = parse_args(sys.argv[1:] if argv is None else argv)
+
+    code = request_build(socket_path, argv)
+    if code is None:
+        sys.stderr.write(f"No build daemon on {socket_path}; building here\n")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from main import main as build
+
+        build(argv)
+        return
+    sys.exit(code)
+
+
+if __name__ == "__main__":
+    main()
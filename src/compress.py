@@ -0,0 +1,121 @@
+"""
+This module writes precompressed siblings of the compressible files in the output directory.
+"""
+import gzip
+import os
+
+from manifest import walk_output
+from util import COMPRESSED_SUFFIXES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt", ".map"}
+# Files smaller than this rarely shrink enough to be worth a second request path.
+MIN_SIZE = 256
+
+
+def gzip_compress(data):
+    # mtime=0 keeps the output identical across builds.
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def brotli_compress(data):
+    return brotli.compress(data, quality=11)
+
+
+def zstd_compress(data):
+    return zstandard.ZstdCompressor(level=19).compress(data)
+
+
+def available_encoders():
+    """Return {file suffix: compress function} for every encoding whose module is installed."""
+    encoders = {".gz": gzip_compress}
+    if brotli is not None:
+        encoders[".br"] = brotli_compress
+    if zstandard is not None:
+        encoders[".zst"] = zstd_compress
+    return encoders
+
+
+def is_compressible(rel_path, size):
+    return os.path.splitext(rel_path)[1] in COMPRESSIBLE_EXTENSIONS and size >= MIN_SIZE
+
+
+def is_fresh(sibling_path, stat):
+    """A sibling is fresh if it carries the source's mtime, which compress_file stamps on it."""
+    try:
+        return os.stat(sibling_path).st_mtime_ns == stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path, stat, encoders):
+    """Write every stale sibling of path and return how many were written."""
+    stale = {
+        suffix: compress for suffix, compress in encoders.items()
+        if not is_fresh(path + suffix, stat)
+    }
+    if not stale:
+        return 0
+
+    with open(path, "rb") as f:
+        data = f.read()
+    for suffix, compress in stale.items():
+        sibling_path = path + suffix
+        tmp_path = sibling_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compress(data))
+        os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp_path, sibling_path)
+    return len(stale)
+
+
+def compress_outputs(output_dir, jobs=1):
+    """Precompress changed compressible files in parallel and delete orphaned siblings.
+
+    Returns (siblings written, siblings removed).
+    """
+    encoders = available_encoders()
+    files = {}
+    siblings = []
+    for rel_path, entry in walk_output(output_dir):
+        base, suffix = os.path.splitext(rel_path)
+        # Only a compressed copy of a compressible type can be ours; a
+        # shipped archive such as data.tar.gz is left alone.
+        if suffix in COMPRESSED_SUFFIXES and os.path.splitext(base)[1] in COMPRESSIBLE_EXTENSIONS:
+            siblings.append((base, rel_path))
+        else:
+            files[rel_path] = entry.stat()
+
+    removed = 0
+    for base, rel_path in siblings:
+        source = files.get(base)
+        if source is None or not is_compressible(base, source.st_size):
+            os.remove(os.path.join(output_dir, rel_path))
+            removed += 1
+
+    # Only files with a stale sibling are handed to compress_file, so a
+    # no-op build neither reads any file nor starts a thread pool.
+    stale = [
+        (os.path.join(output_dir, rel_path), stat)
+        for rel_path, stat in files.items()
+        if is_compressible(rel_path, stat.st_size)
+        and not all(is_fresh(os.path.join(output_dir, rel_path) + suffix, stat) for suffix in encoders)
+    ]
+    if jobs <= 1 or len(stale) <= 1:
+        return sum(compress_file(path, stat, encoders) for path, stat in stale), removed
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    # zlib, brotli and zstd release the GIL while compressing, so threads scale.
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        written = sum(executor.map(lambda item: compress_file(item[0], item[1], encoders), stale))
+    return written, removed
@@ -0,0 +1,134 @@
+"""
+This module contains the build daemon: one warm generator process serving builds over a Unix socket.
+
+Compiled regexes, loaded templates, block caches and manifests stay in
+memory between builds, so a build requested with client.py skips
+interpreter startup and imports. Each request is a JSON line
+{"argv": [...], "cwd": "..."}; the reply is a JSON line per chunk of output,
+{"out": text} or {"err": text}, followed by {"exit": code}.
+"""
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+
+from client import DEFAULT_SOCKET
+
+# Options that do not make sense inside the daemon's build.
+REJECTED_OPTIONS = ("--watch", "--daemon", "--socket")
+
+
+class SocketWriter(io.TextIOBase):
+    """Text stream that forwards writes to the client as JSON lines, and drops them once it hangs up."""
+    def __init__(self, wfile, key):
+        self.wfile = wfile
+        self.key = key
+        self.connected = True
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text and self.connected:
+            try:
+                send(self.wfile, {self.key: text})
+            except OSError:
+                self.connected = False
+        return len(text)
+
+
+def send(wfile, message):
+    wfile.write(json.dumps(message).encode() + b"\n")
+    wfile.flush()
+
+
+class BuildHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            argv = list(request["argv"])
+            cwd = request["cwd"]
+        except (ValueError, KeyError, TypeError):
+            send(self.wfile, {"err": "Malformed build request\n"})
+            send(self.wfile, {"exit": 2})
+            return
+
+        stdout = SocketWriter(self.wfile, "out")
+        stderr = SocketWriter(self.wfile, "err")
+        code = self.server.run_build(argv, cwd, stdout, stderr)
+        if stdout.connected:
+            send(self.wfile, {"exit": code})
+
+
+class BuildDaemon(socketserver.UnixStreamServer):
+    """Serves one build at a time: builds change directory and redirect output process-wide."""
+    def __init__(self, socket_path):
+        self.block_caches = {}
+        super().__init__(socket_path, BuildHandler)
+
+    def run_build(self, argv, cwd, stdout, stderr):
+        from main import main
+
+        rejected = [arg for arg in argv if arg.split("=", 1)[0] in REJECTED_OPTIONS]
+        if rejected:
+            stderr.write(f"Not supported by the build daemon: {' '.join(rejected)}\n")
+            return 2
+
+        previous = os.getcwd()
+        try:
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                try:
+                    main(argv, self.block_caches)
+                except SystemExit as e:
+                    if isinstance(e.code, str):
+                        print(e.code, file=sys.stderr)
+                        return 1
+                    return e.code or 0
+                except Exception:
+                    traceback.print_exc()
+                    return 1
+            return 0
+        finally:
+            os.chdir(previous)
+
+    def server_close(self):
+        super().server_close()
+        for cache in self.block_caches.values():
+            cache.close()
+
+
+def remove_stale_socket(socket_path):
+    """Remove socket_path if nothing is listening on it; raise if a daemon already is."""
+    if not os.path.exists(socket_path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(socket_path)
+            return
+    raise RuntimeError(f"A build daemon is already listening on {socket_path}")
+
+
+def serve(socket_path=DEFAULT_SOCKET):
+    # Import the build pipeline now so the first request is as fast as the rest.
+    import main  # noqa: F401
+
+    remove_stale_socket(socket_path)
+    # Let a plain kill run the cleanup below as well.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = BuildDaemon(socket_path)
+    print(f"Build daemon listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
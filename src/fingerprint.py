@@ -0,0 +1,85 @@
+"""
+This module gives static assets content-hashed names so browsers may cache them forever.
+"""
+import json
+import os
+
+from manifest import hash_file, remove_empty_dirs
+from sync import place_file, walk_files
+
+# {asset path: [size, mtime_ns, fingerprinted path]}, paths relative to the
+# output directory with '/' separators. server.py reads it to find the
+# paths it may mark immutable.
+FINGERPRINTS_NAME = ".fingerprints.json"
+HASH_LENGTH = 10
+
+
+def fingerprinted_path(rel_path, digest):
+    """index.css -> index.<hash>.css"""
+    base, extension = os.path.splitext(rel_path)
+    return f"{base}.{digest[:HASH_LENGTH]}{extension}"
+
+
+def load_fingerprints(output_dir):
+    try:
+        with open(os.path.join(output_dir, FINGERPRINTS_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_fingerprints(output_dir, fingerprints):
+    path = os.path.join(output_dir, FINGERPRINTS_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(fingerprints, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def fingerprint_assets(static_dir, output_dir, link="copy"):
+    """Place a fingerprinted copy of every static asset in output_dir and return their urls.
+
+    The result maps each asset's url to its fingerprinted url, e.g.
+    {"/index.css": "/index.3b5d5c3712.css"}. Assets are only hashed again when
+    their size or mtime changed, and fingerprinted copies no asset maps to
+    any more are removed.
+    """
+    previous = load_fingerprints(output_dir)
+    fingerprints = {}
+    if os.path.isdir(static_dir):
+        for rel_path, entry in walk_files(static_dir):
+            rel_path = rel_path.replace(os.sep, "/")
+            stat = entry.stat()
+            known = previous.get(rel_path)
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                target = known[2]
+            else:
+                target = fingerprinted_path(rel_path, hash_file(entry.path))
+            dest_path = os.path.join(output_dir, target)
+            if not os.path.exists(dest_path):
+                os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+                place_file(entry.path, dest_path, link)
+            fingerprints[rel_path] = [stat.st_size, stat.st_mtime_ns, target]
+
+    live = {target for _, _, target in fingerprints.values()}
+    for _, _, target in previous.values():
+        dest_path = os.path.join(output_dir, target)
+        if target not in live and os.path.exists(dest_path):
+            os.remove(dest_path)
+            remove_empty_dirs(os.path.dirname(dest_path), output_dir)
+
+    os.makedirs(output_dir, exist_ok=True)
+    save_fingerprints(output_dir, fingerprints)
+    return {f"/{rel_path}": f"/{target}" for rel_path, (_, _, target) in fingerprints.items()}
+
+
+def remove_fingerprints(output_dir):
+    """Delete the fingerprinted copies of a build that used them, once fingerprinting is turned off."""
+    for _, _, target in load_fingerprints(output_dir).values():
+        dest_path = os.path.join(output_dir, target)
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+            remove_empty_dirs(os.path.dirname(dest_path), output_dir)
+    try:
+        os.remove(os.path.join(output_dir, FINGERPRINTS_NAME))
+    except FileNotFoundError:
+        pass
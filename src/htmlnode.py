@@ -2,32 +2,61 @@
 This module contains the HtmlNode class.
 """
 
+def props_to_tuple(props):
+    """Store props as a tuple of (key, value) pairs, which is far smaller than a dict."""
+    if props is None or isinstance(props, tuple):
+        return props
+    return tuple(props.items())
+
 class HtmlNode:
     """This class represents a node in the HTML tree."""
+    # Nodes are deliberately not shared flyweights: block_to_heading and
+    # block_to_blockquote rewrite leaf values in place, so a shared node would
+    # carry one page's edits into another. Tags are string literals, which
+    # Python interns already.
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children
-        self.props = props
+        self.props = props_to_tuple(props)
 
     def to_html(self):
         """This method should return a string that represents the HTML of the node."""
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        """This method should yield the HTML of the node as a sequence of string fragments."""
         raise NotImplementedError()
 
+    def write_html(self, writer, buffer_size=65536):
+        """Write the HTML of the node to anything with a write method, batching small fragments."""
+        pending = []
+        pending_size = 0
+        for fragment in self.iter_html():
+            pending.append(fragment)
+            pending_size += len(fragment)
+            if pending_size >= buffer_size:
+                writer.write("".join(pending))
+                pending = []
+                pending_size = 0
+        if pending:
+            writer.write("".join(pending))
+
     def props_to_html(self):
         """This method should return a string that represents the HTML attributes of the node."""
         if self.props is None:
             return ""
-        res = ""
-        for key, value in self.props.items():
-            res += f" {key}=\"{value}\""
-        return res
+        return "".join(f" {key}=\"{value}\"" for key, value in self.props)
 
     def __repr__(self):
         return f"HtmlNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
     
 class LeafNode(HtmlNode):
     """This class represents a leaf node in the HTML tree."""
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, props=None):
         super().__init__(tag, value, None, props)
 
@@ -37,23 +66,32 @@ class LeafNode(HtmlNode):
         if self.tag is None:
             return self.value
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+
+    def iter_html(self):
+        yield self.to_html()
     
 class ParentNode(HtmlNode):
     """This class represents a parent node in the HTML tree."""
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag, None, children, props)
 
-    def to_html(self):
-        if self.tag is None:
-            raise ValueError("Tag not provided")
-        if self.children is None:
-            raise ValueError("Children not provided")
-        res = ""
-
-        for child in self.children:
-            if child.tag is None:
-                res += child.value
+    def iter_html(self):
+        # Walk the tree with an explicit stack so deep trees neither recurse
+        # nor copy each subtree's HTML into its parent.
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif isinstance(node, ParentNode):
+                if node.tag is None:
+                    raise ValueError("Tag not provided")
+                if node.children is None:
+                    raise ValueError("Children not provided")
+                yield f"<{node.tag}{node.props_to_html()}>"
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
             else:
-                res += child.to_html()
-        return f"<{self.tag}{self.props_to_html()}>{res}</{self.tag}>"
-        
+                yield node.to_html()
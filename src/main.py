@@ -1,83 +1,655 @@
 """
 Main module
 """
-import os, shutil, re
+import os, io, sys, argparse, contextlib, datetime
 
 from textnode import (
-    markdown_to_html_node
+    block_to_html_node,
+    iter_markdown_blocks,
+    markdown_to_html_node,
+    as_asset_urls,
 )
+from page import describe, describe_blocks, extract_title, page_variables
+from blockcache import BlockCache
+from manifest import Manifest, OutputIndex
+from report import BuildReport, PageStats
+from compress import compress_outputs
+from fingerprint import fingerprint_assets, remove_fingerprints
+from sync import LINK_MODES, sync_tree
+from template import as_template, load_template
+from util import page_url
 
-def copy_content(src_path, dest_path="./public"):
-    if os.path.exists(dest_path):
-        shutil.rmtree(dest_path)
-    if not os.path.exists(src_path):
-        return
+def copy_content(src_path, dest_path="./public", checksum=False, link="copy"):
+    """Sync src_path into dest_path, copying only changed files, and return the SyncStats."""
+    return sync_tree(src_path, dest_path, checksum=checksum, link=link)
 
-    if os.path.isfile(src_path):
-        dest_dir = os.path.dirname(dest_path)
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
-        shutil.copy2(src_path, dest_path)
-    else:
-        if not os.path.exists(dest_path):
-            os.makedirs(dest_path)
-        for item in os.listdir(src_path):
-            src_item_path = os.path.join(src_path, item)
-            dest_item_path = os.path.join(dest_path, item)
-            copy_content(src_item_path, dest_item_path)
-
-def extract_title(markdown):
-    heading = re.search(r"(#{1} .*)", markdown)
-    if not heading:
-        raise Exception("No heading")
-    return heading.group(0).lstrip('# ')
-
-def generate_page(from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-
-    markdown_file = open(from_path, 'r')
-    markdown = markdown_file.read()
+class PageError(Exception):
+    """Raised when one or more pages fail to render in a parallel build."""
+
+
+def parse_shard(text):
+    """Parse --shard i/N into (i, N); shards are numbered from 1."""
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {text!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is not between 1 and {count}")
+    return index, count
+
+# Pages larger than this are rendered block by block instead of being read whole.
+STREAM_THRESHOLD = 32 << 20
+READ_SIZE = 1 << 16
+
+def read_chunks(markdown_file):
+    return iter(lambda: markdown_file.read(READ_SIZE), "")
+
+class MarkdownStream:
+    """Content of a page too large to hold in memory, rendered one block at a time as it is written."""
+    def __init__(self, path, cache=None, asset_urls=None):
+        self.path = path
+        self.cache = cache
+        self.asset_urls = as_asset_urls(asset_urls)
+
+    def write_html(self, writer):
+        writer.write("<div>")
+        with open(self.path, 'r') as markdown_file:
+            for block in iter_markdown_blocks(read_chunks(markdown_file)):
+                block_to_html_node(block, self.cache, asset_urls=self.asset_urls).write_html(writer)
+        writer.write("</div>")
+
+    def to_html(self):
+        buffer = io.StringIO()
+        self.write_html(buffer)
+        return buffer.getvalue()
+
+def read_large_page(from_path, cache=None, asset_urls=None):
+    """Return the variables of a page without reading it into memory.
+
+    The title and description come from scanning the start of the file; the
+    content is a MarkdownStream the template renders as it writes.
+    """
+    with open(from_path, 'r') as markdown_file:
+        title = None
+        for line in markdown_file:
+            # Same match as extract_title, which cannot cross a newline.
+            if "# " in line:
+                title = extract_title(line)
+                break
+        if title is None:
+            raise Exception("No heading")
+        markdown_file.seek(0)
+        description = describe_blocks(iter_markdown_blocks(read_chunks(markdown_file)))
+        modified = os.fstat(markdown_file.fileno()).st_mtime
+    return {
+        "Title": title,
+        "Content": MarkdownStream(from_path, cache, asset_urls),
+        "Date": datetime.date.fromtimestamp(modified).isoformat(),
+        "Description": description,
+    }
+
+def generate_page(from_path, template_path, dest_path, cache=None, report=None, asset_urls=None):
+    template = as_template(template_path)
+    print(f"Generating page from {from_path} to {dest_path} using {template.path}")
+    stats = PageStats(from_path) if report is not None else None
+    write_page(from_path, template, dest_path, cache, stats, asset_urls)
+    if report is not None:
+        report.add(stats)
+
+def read_page(from_path, cache=None, stats=None, asset_urls=None):
+    """Parse a markdown page into the variables its template is rendered with.
+
+    With a PageStats, the time spent on each step is charged to its stage.
+    Pages over STREAM_THRESHOLD bytes are left on disk; see read_large_page.
+    """
+    if os.path.getsize(from_path) > STREAM_THRESHOLD:
+        variables = read_large_page(from_path, cache, asset_urls)
+        if stats is not None:
+            stats.bytes_read += os.path.getsize(from_path)
+            stats.lap("read")
+        return variables
+
+    with open(from_path, 'r') as markdown_file:
+        markdown = markdown_file.read()
+        stat = os.fstat(markdown_file.fileno())
+    if stats is None:
+        return page_variables(markdown, datetime.date.fromtimestamp(stat.st_mtime), cache, asset_urls)
+
+    stats.bytes_read += stat.st_size
+    stats.lap("read")
     title = extract_title(markdown)
-    content = markdown_to_html_node(markdown).to_html()
+    stats.lap("title")
+    content = markdown_to_html_node(markdown, cache, stats.stages, asset_urls)
+    stats.lap()
+    description = describe(markdown)
+    stats.lap("description")
+    return {
+        "Title": title,
+        "Content": content,
+        "Date": datetime.date.fromtimestamp(stat.st_mtime).isoformat(),
+        "Description": description,
+    }
 
-    template_file = open(template_path, 'r+')
-    template = template_file.read()
+def write_page(from_path, template, dest_path, cache=None, stats=None, asset_urls=None):
+    template = as_template(template)
+    variables = read_page(from_path, cache, stats, asset_urls)
 
-    content_with_title = template.replace("{{ Title }}", title).replace("{{ Content }}", content)
+    if not os.path.exists(dest_path):
+        os.makedirs(dest_path, exist_ok=True)
 
-    dest_dir = os.path.dirname(dest_path)
-    if not os.path.exists(dest_dir):
-        os.makedirs(dest_dir)
-        
     complete_filename = os.path.join(dest_path, "index.html")
-    html_file = open(complete_filename, "w")
-    html_file.write(content_with_title)
-
-    markdown_file.close()
-    template_file.close()
-    html_file.close()
+    if stats is None or isinstance(variables["Content"], MarkdownStream):
+        with open(complete_filename, "w") as html_file:
+            template.render_to(html_file, variables)
+        if stats is not None:
+            stats.bytes_written += os.path.getsize(complete_filename)
+            stats.lap("render")
+        return
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
-    dest_dir = os.path.dirname(dest_dir_path)
+    # Serializing and templating in memory keeps them apart from writing in the report.
+    variables["Content"] = variables["Content"].to_html()
+    stats.lap("render")
+    html = template.render(variables)
+    stats.lap("template")
+    with open(complete_filename, "w") as html_file:
+        html_file.write(html)
+    stats.bytes_written += os.path.getsize(complete_filename)
+    stats.lap("write")
 
+def discover_pages(dir_path_content, dest_dir_path):
+    """Return (markdown path, destination directory) for every page, in a stable order."""
     if os.path.isfile(dir_path_content):
-        if not os.path.exists(dest_dir):
-            os.makedirs(dest_dir)
-        generate_page(dir_path_content, template_path, dest_dir)
+        return [(dir_path_content, os.path.dirname(dest_dir_path))]
+
+    pages = []
+    for file in sorted(os.listdir(dir_path_content)):
+        src_item_path = os.path.join(dir_path_content, file)
+        dest_item_path = os.path.join(dest_dir_path, file)
+        pages.extend(discover_pages(src_item_path, dest_item_path))
+    return pages
+
+def chunk_pages(pages, chunk_count):
+    """Split pages into about chunk_count chunks, keeping pages that share a destination together."""
+    groups = {}
+    for from_path, dest_path in pages:
+        groups.setdefault(dest_path, []).append((from_path, dest_path))
+    groups = list(groups.values())
+
+    size = max(1, -(-len(groups) // chunk_count))
+    return [
+        [page for group in groups[i:i + size] for page in group]
+        for i in range(0, len(groups), size)
+    ]
+
+def try_write_page(from_path, template, dest_path, cache=None, timed=False, asset_urls=None):
+    """Write one page and return (error message or None, PageStats or None) instead of raising."""
+    stats = PageStats(from_path) if timed else None
+    try:
+        write_page(from_path, template, dest_path, cache, stats, asset_urls)
+    except Exception as e:
+        return f"{type(e).__name__}: {e}", None
+    return None, stats
+
+def record_page(from_path, dest_path, template, error, stats, failures, on_rendered=None, report=None):
+    """Report the outcome of one page the same way whether it was rendered here or in a worker."""
+    if error is not None:
+        print(f"Error generating page from {from_path}: {error}", file=sys.stderr)
+        failures.append(from_path)
+        return
+    print(f"Generating page from {from_path} to {dest_path} using {template.path}")
+    if report is not None:
+        report.add(stats)
+    if on_rendered is not None:
+        on_rendered(from_path)
+
+# Each worker process keeps its own copy of the build's block cache and asset urls.
+_worker_cache = None
+_worker_asset_urls = None
+
+def init_worker(cache, asset_urls):
+    global _worker_cache, _worker_asset_urls
+    _worker_cache = cache
+    _worker_asset_urls = asset_urls
+
+def render_chunk(chunk, template, timed=False):
+    """Render a chunk of pages in a worker.
+
+    Returns (from, dest, error, PageStats or None) for each page plus the
+    block cache hits and misses the chunk added, so the parent can report
+    totals.
+    """
+    cache = _worker_cache
+    hits, misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    results = [
+        (from_path, dest_path, *try_write_page(from_path, template, dest_path, cache, timed, _worker_asset_urls))
+        for from_path, dest_path in chunk
+    ]
+    if cache is None:
+        return results, 0, 0
+    cache.flush()
+    return results, cache.hits - hits, cache.misses - misses
+
+def generate_pages_parallel(pages, template, jobs, on_rendered=None, cache=None, report=None, asset_urls=None):
+    """Render pages in a process pool and return the source paths that failed."""
+    chunks = chunk_pages(pages, jobs * 4)
+    failures = []
+
+    if cache is not None:
+        # Fragments rendered by this process must be on disk before workers look for them.
+        cache.flush()
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(
+        max_workers=jobs, initializer=init_worker, initargs=(cache, as_asset_urls(asset_urls)),
+    )
+    try:
+        timed = [report is not None] * len(chunks)
+        for results, hits, misses in executor.map(render_chunk, chunks, [template] * len(chunks), timed):
+            if cache is not None:
+                cache.hits += hits
+                cache.misses += misses
+            for from_path, dest_path, error, stats in results:
+                record_page(from_path, dest_path, template, error, stats, failures, on_rendered, report)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return failures
+
+def render_pages(pages, template, jobs=1, on_rendered=None, cache=None, report=None, asset_urls=None):
+    """Render pages serially or in a pool and return the source paths that failed.
+
+    A failing page is reported and skipped either way, so jobs never
+    changes how errors surface.
+    """
+    if jobs > 1 and len(pages) > 1:
+        return generate_pages_parallel(pages, template, jobs, on_rendered, cache, report, asset_urls)
+
+    failures = []
+    try:
+        for from_path, dest_path in pages:
+            error, stats = try_write_page(from_path, template, dest_path, cache, report is not None, asset_urls)
+            record_page(from_path, dest_path, template, error, stats, failures, on_rendered, report)
+    finally:
+        if cache is not None:
+            cache.flush()
+    return failures
+
+def generate_pages_recursive(
+    dir_path_content, template_path, dest_dir_path, jobs=1, incremental=False, cache=None, report=None,
+    search=False, asset_urls=None, shard=None, listings=False, page_size=20, sitemap=None,
+):
+    """Render every page under dir_path_content into dest_dir_path.
+
+    asset_urls maps static asset urls to fingerprinted ones; links and
+    images in pages and src and href attributes in the template are
+    rewritten to them. With shard, an (index, count) pair, only that
+    shard's pages are rendered and described in a shard manifest. With
+    listings, every section also gets listing pages of page_size entries.
+    With sitemap, the base url of the site, the sitemap and feed are
+    written as well; shards leave them to the merge.
+    """
+    pages = discover_pages(dir_path_content, dest_dir_path)
+    asset_urls = as_asset_urls(asset_urls)
+    template = load_template(template_path).with_asset_urls(asset_urls)
+    table = None
+    if listings or "Nav" in template.slots:
+        from navigation import bind_nav, collect_metadata
+
+        # One pass over every page, shards included, for what all pages share.
+        table = collect_metadata(pages, dir_path_content, dest_dir_path, jobs)
+        template = bind_nav(template, table)
+    if shard is not None:
+        from shard import select_pages
+
+        total = len(pages)
+        pages = select_pages(pages, dir_path_content, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(pages)} of {total} page(s)")
+    if not incremental:
+        failures = render_pages(pages, template, jobs, cache=cache, report=report, asset_urls=asset_urls)
     else:
-        files = os.listdir(dir_path_content)
-        for file in files:
-            if not os.path.exists(dest_dir):
-                os.makedirs(dest_dir)
-            src_item_path = os.path.join(dir_path_content, file)
-            dest_item_path = os.path.join(dest_dir_path, file)
-            generate_pages_recursive(src_item_path, template_path, dest_item_path)
+        failures = generate_pages_incremental(
+            pages, dir_path_content, template, dest_dir_path, jobs, cache, report, asset_urls,
+        )
+
+    if listings:
+        from navigation import write_listings
+
+        written = write_listings(table, template, dest_dir_path, page_size)
+        print(f"Wrote {written} listing page(s)")
+
+    if sitemap is not None and shard is None:
+        from navigation import iter_metadata
+        from sitemap import write_sitemaps
+
+        # Streamed in url order, the order a merge writes them in.
+        ordered = sorted(pages, key=lambda page: page_url(page[1], dest_dir_path))
+        urls, rewritten = write_sitemaps(
+            dest_dir_path, sitemap, iter_metadata(ordered, dir_path_content, dest_dir_path, jobs),
+        )
+        print(f"Sitemap: {urls} url(s), rewrote {rewritten} file(s)")
+
+    if shard is not None:
+        if not failures:
+            from shard import write_shard_manifest
+
+            analyzed = write_shard_manifest(
+                pages, dir_path_content, dest_dir_path, shard, template.digest, asset_urls, search, jobs,
+            )
+            print(f"Described {analyzed} page(s) in the shard manifest")
+    elif search:
+        from search import update_search_index
+
+        indexed = update_search_index(pages, dir_path_content, dest_dir_path, jobs, rebuild=not incremental)
+        print(f"Indexed {indexed} page(s) for search")
+
+    if failures:
+        raise PageError(f"{len(failures)} page(s) failed to render: {', '.join(failures)}")
 
+def generate_pages_incremental(
+    pages, dir_path_content, template, dest_dir_path, jobs=1, cache=None, report=None, asset_urls=None,
+):
+    """Render only pages whose source, template or output changed since the last build."""
+    manifest = Manifest.load(dest_dir_path)
+    entries = {}
+    for from_path, dest_path in pages:
+        key = os.path.relpath(from_path, dir_path_content)
+        output = os.path.relpath(os.path.join(dest_path, "index.html"), dest_dir_path)
+        entries[from_path] = (key, manifest.fingerprint(key, from_path), output)
 
-def main():
-    """Main function"""
-    generate_pages_recursive("./content", "./template.html", "./public")
+    for removed in manifest.start_build((key for key, _, _ in entries.values()), template.digest):
+        print(f"Removed stale page {removed}")
+    todo = [
+        (from_path, dest_path) for from_path, dest_path in pages
+        if not manifest.is_current(*entries[from_path])
+    ]
+    if len(todo) < len(pages):
+        print(f"Skipping {len(pages) - len(todo)} unchanged page(s)")
 
+    try:
+        return render_pages(
+            todo, template, jobs,
+            on_rendered=lambda from_path: manifest.record(*entries[from_path]),
+            cache=cache,
+            report=report,
+            asset_urls=asset_urls,
+        )
+    finally:
+        manifest.save()
+
+def index_outputs(dest_dir_path):
+    """Refresh the content hashes of the output directory and return the changed paths."""
+    index = OutputIndex.load(dest_dir_path)
+    changed = index.refresh()
+    index.save()
+    return changed
+
+
+def main(argv=None, block_caches=None):
+    """Main function
+
+    A long-running caller such as the build daemon passes a dict in which
+    block caches are kept open between builds.
+    """
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="Render pages in this many worker processes (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Ignore the build manifest and regenerate every page",
+    )
+    parser.add_argument(
+        "--checksum", action="store_true",
+        help="Compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--link", choices=LINK_MODES, default="copy",
+        help="How to place static files into the output directory",
+    )
+    parser.add_argument(
+        "--fingerprint", action="store_true",
+        help="Serve static files under content-hashed names and point pages and the template at them",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Build, then keep rebuilding changed pages and signal live reload",
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="Stay running and serve builds requested by client.py over a Unix socket",
+    )
+    parser.add_argument(
+        "--socket", metavar="PATH",
+        help="Socket the daemon listens on (default .build.sock)",
+    )
+    parser.add_argument(
+        "--block-cache", metavar="PATH",
+        help="Keep rendered markdown blocks in this sqlite file between builds",
+    )
+    parser.add_argument(
+        "--block-cache-size", type=int, default=4096, metavar="N",
+        help="Rendered blocks to keep in memory per process",
+    )
+    parser.add_argument(
+        "--search", action="store_true",
+        help="Build a client-side search index under search/ in the output",
+    )
+    sharding = parser.add_mutually_exclusive_group()
+    sharding.add_argument(
+        "--shard", type=parse_shard, metavar="I/N",
+        help="Render only shard I of N of the pages into shards/I-of-N, for merging with --merge",
+    )
+    sharding.add_argument(
+        "--merge", nargs="*", metavar="DIR",
+        help="Combine shard builds (default: every shard under shards/) into public",
+    )
+    parser.add_argument(
+        "--listings", action="store_true",
+        help="Write paginated listing pages under pages/ in every section",
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=20, metavar="N",
+        help="Entries per listing page",
+    )
+    parser.add_argument(
+        "--base-url", default="http://localhost:8888",
+        help="Absolute url the site is served from, for the sitemap and feed",
+    )
+    parser.add_argument(
+        "--sitemap", action="store_true",
+        help="Write sitemap.xml, indexing sitemap shards of up to 50,000 urls, and an Atom feed.xml "
+        "(a merge always writes them)",
+    )
+    parser.add_argument(
+        "--publish", nargs="?", const="site", metavar="LINK",
+        help="After the build, atomically point the symlink LINK (default site) at a snapshot of public",
+    )
+    parser.add_argument(
+        "--rollback", nargs="?", const="", metavar="BUILD",
+        help="Point the --publish link back at BUILD, or at the build published before the current one",
+    )
+    parser.add_argument(
+        "--keep", type=int, default=5, metavar="N",
+        help="Published builds to keep for rollback",
+    )
+    parser.add_argument(
+        "--report", metavar="PATH",
+        help="Write a JSON report of per-page stage timings, bytes and peak memory",
+    )
+    parser.add_argument(
+        "--slowest", type=int, default=10, metavar="N",
+        help="How many of the slowest pages to list in the report",
+    )
+    parser.add_argument(
+        "--profile", metavar="PATH",
+        help="Run the build under cProfile and dump pstats here (workers are not profiled)",
+    )
+    parser.add_argument(
+        "--quiet", "-q", action="store_true",
+        help="Print nothing but errors",
+    )
+    args = parser.parse_args(argv)
+    if args.shard is not None and args.publish is not None:
+        parser.error("--publish needs a whole site; use it with --merge instead of --shard")
+    if args.listings and (args.shard is not None or args.merge is not None):
+        parser.error("--listings is not supported with --shard or --merge")
+    if args.sitemap and args.shard is not None:
+        parser.error("--sitemap is not supported with --shard; the merge writes the sitemap")
+    jobs = args.jobs or os.cpu_count() or 1
+
+    if args.watch:
+        watch(parser, args)
+        return
+
+    if args.daemon:
+        from daemon import DEFAULT_SOCKET, serve
+
+        serve(args.socket or DEFAULT_SOCKET)
+        return
+
+    if args.rollback is not None:
+        from publish import PUBLISH_LINK, PublishError, rollback
+
+        link = args.publish or PUBLISH_LINK
+        try:
+            build_id = rollback(link, args.rollback or None)
+        except PublishError as e:
+            sys.exit(str(e))
+        print(f"Rolled {link} back to build {build_id}")
+        return
+
+    report = BuildReport(args.slowest) if args.report else None
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        if profiler is not None:
+            profiler.enable()
+        try:
+            build(args, jobs, report, block_caches)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(args.profile)
+                print(f"Wrote profile to {args.profile}")
+            if report is not None:
+                report.save(args.report)
+                print(f"Wrote build report to {args.report}")
+
+def watch(parser, args):
+    """Build, then rebuild on every change until interrupted, with the options the watch supports."""
+    from watch import UNSUPPORTED_OPTIONS, Watcher
+
+    unsupported = []
+    for option in UNSUPPORTED_OPTIONS:
+        dest = option[2:].replace("-", "_")
+        if getattr(args, dest) != parser.get_default(dest):
+            unsupported.append(option)
+    if unsupported:
+        parser.error(f"not supported with --watch: {' '.join(unsupported)}")
+
+    cache = BlockCache(args.block_cache_size, args.block_cache)
+    watcher = Watcher(
+        "./content", "./template.html", "./static", "./public",
+        fingerprint=args.fingerprint, checksum=args.checksum, link=args.link, cache=cache,
+    )
+    with contextlib.ExitStack() as stack:
+        if args.quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            cache.close()
+
+def place_static(args, dest_dir_path="./public", sync=True):
+    """Sync static files into dest_dir_path and return the fingerprinted asset urls, if any."""
+    if sync:
+        stats = copy_content("./static", dest_dir_path, checksum=args.checksum, link=args.link)
+        print(f"Synced static files: {stats}")
+    if not args.fingerprint:
+        remove_fingerprints(dest_dir_path)
+        return None
+    asset_urls = fingerprint_assets("./static", dest_dir_path, args.link)
+    print(f"Fingerprinted {len(asset_urls)} static file(s)")
+    return asset_urls
+
+def merge(args, jobs):
+    """Combine the shard builds named by --merge into ./public."""
+    from shard import ShardError, find_shards, merge_shards
+
+    asset_urls = place_static(args)
+    try:
+        merge_shards(
+            args.merge or find_shards(), "./public", args.link, asset_urls,
+            args.base_url, args.search, jobs, rebuild=args.force,
+        )
+        written, removed = compress_outputs("./public", jobs)
+        print(f"Precompressed {written} file(s), removed {removed} stale")
+    except ShardError as e:
+        sys.exit(str(e))
+    finally:
+        index_outputs("./public")
+    if args.publish:
+        publish_output(args)
+
+def publish_output(args):
+    """Publish ./public at the --publish link."""
+    from publish import PublishError, publish
+
+    try:
+        build_id, added = publish("./public", args.publish, keep=args.keep)
+    except PublishError as e:
+        sys.exit(str(e))
+    print(f"Published build {build_id} at {args.publish} ({added} new blob(s))")
+
+def build(args, jobs, report=None, block_caches=None):
+    if args.merge is not None:
+        merge(args, jobs)
+        return
+    dest_dir_path = "./public"
+    if args.shard is not None:
+        from shard import shard_dir
+
+        dest_dir_path = os.path.join(".", shard_dir(*args.shard))
+    # Shards only fingerprint static files, for their urls; the merge places them.
+    asset_urls = place_static(args, dest_dir_path, sync=args.shard is None)
+
+    if block_caches is None:
+        cache = BlockCache(args.block_cache_size, args.block_cache)
+    else:
+        key = (os.getcwd(), args.block_cache, args.block_cache_size)
+        cache = block_caches.get(key)
+        if cache is None:
+            cache = block_caches[key] = BlockCache(args.block_cache_size, args.block_cache)
+        cache.hits = cache.misses = 0
+    try:
+        generate_pages_recursive(
+            "./content", "./template.html", dest_dir_path, jobs,
+            incremental=not args.force, cache=cache, report=report, search=args.search,
+            asset_urls=asset_urls, shard=args.shard, listings=args.listings, page_size=args.page_size,
+            sitemap=args.base_url if args.sitemap else None,
+        )
+        print(f"Block cache: {cache.summary()}")
+        if args.shard is None:
+            written, removed = compress_outputs(dest_dir_path, jobs)
+            print(f"Precompressed {written} file(s), removed {removed} stale")
+    except PageError as e:
+        sys.exit(str(e))
+    finally:
+        if block_caches is None:
+            cache.close()
+        else:
+            cache.flush()
+        index_outputs(dest_dir_path)
+    if args.publish:
+        publish_output(args)
 
 if __name__ == "__main__":
     main()
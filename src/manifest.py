@@ -0,0 +1,222 @@
+"""
+This module contains the build manifests used for incremental builds.
+"""
+import hashlib
+import json
+import os
+
+MANIFEST_NAME = ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Entries of the manifests this process last loaded or saved, by path, with
+# the file's stat at the time, so a long-running process such as the build
+# daemon does not parse an unchanged manifest again.
+_recent = {}
+
+
+def hash_file(path):
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """Maps each source of the last build to its content hash and output path.
+
+    Entries are keyed by source path relative to the content directory and
+    store the output path relative to the output directory. The file's size
+    and mtime are kept next to the hash so unchanged sources are recognised
+    from a stat call without being read again.
+    """
+    def __init__(self, output_dir, template_hash=None, pages=None):
+        self.output_dir = output_dir
+        self.template_hash = template_hash
+        self.pages = pages if pages is not None else {}
+
+    @property
+    def path(self):
+        return os.path.join(self.output_dir, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, output_dir):
+        """Load the manifest in output_dir, or return an empty one if it is missing or unreadable."""
+        path = os.path.abspath(os.path.join(output_dir, MANIFEST_NAME))
+        try:
+            with open(path, "r") as f:
+                stat = os.fstat(f.fileno())
+                recent = _recent.get(path)
+                if recent and recent[0] == (stat.st_size, stat.st_mtime_ns):
+                    # Entries are replaced rather than changed in place, so a shallow copy is enough.
+                    return cls(output_dir, recent[1], dict(recent[2]))
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(output_dir)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(output_dir)
+        manifest = cls(output_dir, data.get("template"), data.get("pages", {}))
+        manifest.remember(stat)
+        return manifest
+
+    def save(self):
+        """Write the manifest atomically so an interrupted build never leaves half a file."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        data = {"version": MANIFEST_VERSION, "template": self.template_hash, "pages": self.pages}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.remember(os.stat(self.path))
+
+    def remember(self, stat):
+        _recent[os.path.abspath(self.path)] = (
+            (stat.st_size, stat.st_mtime_ns), self.template_hash, dict(self.pages),
+        )
+
+    def set_template(self, template_hash):
+        """Record the template hash, forgetting every page if the template changed."""
+        if template_hash != self.template_hash:
+            self.pages = {}
+        self.template_hash = template_hash
+
+    def start_build(self, keys, template_hash):
+        """Delete the outputs of sources not in keys, then record the template; return the removed paths.
+
+        Stale outputs go first: set_template forgets every page when the
+        template changed, and with them the record of what to delete.
+        """
+        removed = self.remove_stale(keys)
+        self.set_template(template_hash)
+        return removed
+
+    def fingerprint(self, key, source_path):
+        """Return the entry to record for source_path, hashing only if its stat changed."""
+        stat = os.stat(source_path)
+        entry = self.pages.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            source_hash = entry["hash"]
+        else:
+            source_hash = hash_file(source_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": source_hash}
+
+    def is_current(self, key, fingerprint, output):
+        """Check that the source is unchanged since it last produced output, and output still exists."""
+        entry = self.pages.get(key)
+        return (
+            entry is not None
+            and entry["hash"] == fingerprint["hash"]
+            and entry["output"] == output
+            and os.path.exists(os.path.join(self.output_dir, output))
+        )
+
+    def record(self, key, fingerprint, output):
+        self.pages[key] = dict(fingerprint, output=output)
+
+    def remove_stale(self, keys):
+        """Forget sources not in keys and delete outputs no remaining source produces.
+
+        An output that a remaining source shares may still hold the removed
+        source's page, so the remaining sources are forgotten too and render again.
+        """
+        keys = set(keys)
+        stale = [key for key in self.pages if key not in keys]
+        live_outputs = {}
+        for key, entry in self.pages.items():
+            if key in keys:
+                live_outputs.setdefault(entry["output"], []).append(key)
+
+        removed = []
+        for key in stale:
+            output = self.pages.pop(key)["output"]
+            if output in live_outputs:
+                for live_key in live_outputs[output]:
+                    self.pages.pop(live_key, None)
+                continue
+            output_path = os.path.join(self.output_dir, output)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                removed.append(output_path)
+                remove_empty_dirs(os.path.dirname(output_path), self.output_dir)
+        return removed
+
+
+def remove_empty_dirs(path, root):
+    """Remove path and its parents while they are empty, stopping at root."""
+    root = os.path.abspath(root)
+    path = os.path.abspath(path)
+    while path != root and path.startswith(root + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
+
+
+OUTPUT_INDEX_NAME = ".outputs.json"
+
+
+class OutputIndex:
+    """Content hashes of every file in the output directory, for ETags and change detection.
+
+    Maps each output path (relative, with '/' separators) to [size, mtime_ns,
+    sha256]. Dotfiles, such as the manifests themselves, are not indexed.
+    """
+    def __init__(self, output_dir, files=None):
+        self.output_dir = output_dir
+        self.files = files if files is not None else {}
+
+    @property
+    def path(self):
+        return os.path.join(self.output_dir, OUTPUT_INDEX_NAME)
+
+    @classmethod
+    def load(cls, output_dir):
+        try:
+            with open(os.path.join(output_dir, OUTPUT_INDEX_NAME), "r") as f:
+                return cls(output_dir, json.load(f))
+        except (OSError, ValueError):
+            return cls(output_dir)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.files, f, separators=(",", ":"), sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """Rehash files whose size or mtime changed and drop deleted ones; return the changed paths."""
+        files = {}
+        changed = []
+        for rel_path, entry in walk_output(self.output_dir):
+            stat = entry.stat()
+            known = self.files.get(rel_path)
+            if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+                files[rel_path] = known
+                continue
+            files[rel_path] = [stat.st_size, stat.st_mtime_ns, hash_file(entry.path)]
+            if not known or known[2] != files[rel_path][2]:
+                changed.append(rel_path)
+        self.files = files
+        return changed
+
+    def lookup(self, rel_path, stat):
+        """Return the recorded hash for rel_path if the file still matches its recorded stat."""
+        known = self.files.get(rel_path)
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        return None
+
+
+def walk_output(root, rel_path=""):
+    """Yield (relative path, os.DirEntry) for every non-dot file under root."""
+    with os.scandir(os.path.join(root, rel_path)) as entries:
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            child = f"{rel_path}/{entry.name}" if rel_path else entry.name
+            if entry.is_dir():
+                yield from walk_output(root, child)
+            else:
+                yield child, entry
@@ -0,0 +1,284 @@
+"""
+This module collects site-wide page metadata once per build and renders navigation and listings from it.
+
+The metadata table holds one PageMeta per page, sorted by url, so the pages
+of any section form one contiguous run of it. It is cached in .pages.json
+in the output directory as {source: [size, mtime_ns, title, words]}, and
+only sources whose stat changed are read again. iter_metadata streams the
+same records in page order for stages that do not need the whole table.
+
+Templates with a {{ Nav }} slot get the nav fragment bound in as a literal
+(see Template.bind), so it is rendered once per build rather than once per
+page. Listing pages go to <section>/pages/, <section>/pages/2/ and so on.
+"""
+import bisect
+import collections
+import datetime
+import hashlib
+import html
+import io
+import os
+import re
+
+from manifest import remove_empty_dirs
+from page import extract_title
+from textnode import iter_markdown_blocks
+from util import COMPRESSED_SUFFIXES, map_pages, page_url, read_json, write_json
+
+METADATA_NAME = ".pages.json"
+LISTINGS_NAME = ".listings.json"
+LISTING_DIR = "pages"
+PAGE_SIZE = 20
+# Directories with fewer pages than this, counting their own, get no listing.
+MIN_SECTION_PAGES = 2
+
+# Words are whitespace-separated tokens with a letter or digit in them, so
+# markup such as "#", "*" or "```" is not counted.
+WORD_PATTERN = re.compile(r"\S*\w\S*")
+
+PageMeta = collections.namedtuple("PageMeta", ("url", "title", "mtime_ns", "words"))
+
+
+def page_metadata(path):
+    """Return (title, word count) of a markdown file, reading it block by block."""
+    title = None
+    words = 0
+    with open(path, "r") as f:
+        for block in iter_markdown_blocks(iter(lambda: f.read(1 << 16), "")):
+            if title is None:
+                try:
+                    title = extract_title(block)
+                except Exception:
+                    pass
+            words += len(WORD_PATTERN.findall(block))
+    return title, words
+
+
+def iter_metadata(pages, dir_path_content, dest_dir_path, jobs=1):
+    """Yield the PageMeta of each page in order, reading only sources whose stat changed.
+
+    The cache is saved once every page has been yielded.
+    """
+    path = os.path.join(dest_dir_path, METADATA_NAME)
+    previous = read_json(path, {})
+    entries = {}
+    todo = []
+    for from_path, _ in pages:
+        key = os.path.relpath(from_path, dir_path_content)
+        stat = os.stat(from_path)
+        entry = previous.get(key)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            entries[key] = entry
+        else:
+            entries[key] = [stat.st_size, stat.st_mtime_ns, None, 0]
+            todo.append(key)
+
+    # map_pages reads the changed sources in page order, so they are taken
+    # from it one at a time as the pages come up.
+    unread = set(todo)
+    read = map_pages(page_metadata, [os.path.join(dir_path_content, key) for key in todo], jobs)
+    for from_path, dest_path in pages:
+        key = os.path.relpath(from_path, dir_path_content)
+        entry = entries[key]
+        if key in unread:
+            unread.discard(key)
+            entry[2:] = next(read)
+        url = page_url(dest_path, dest_dir_path)
+        yield PageMeta(url, entry[2] or url, entry[1], entry[3])
+
+    if todo or len(entries) != len(previous):
+        os.makedirs(dest_dir_path, exist_ok=True)
+        write_json(path, entries)
+
+
+def read_page_meta(from_path, dest_path, dest_dir_path):
+    """Return the PageMeta of one page, reading its source."""
+    title, words = page_metadata(from_path)
+    url = page_url(dest_path, dest_dir_path)
+    return PageMeta(url, title or url, os.stat(from_path).st_mtime_ns, words)
+
+
+def collect_metadata(pages, dir_path_content, dest_dir_path, jobs=1):
+    """Return the PageMeta of every page, sorted by url."""
+    return metadata_table(iter_metadata(pages, dir_path_content, dest_dir_path, jobs))
+
+
+def metadata_table(metadata):
+    """Return the table for PageMeta given in page order: sorted by url, one page per url."""
+    return list(last_per_url(sorted(metadata, key=lambda meta: meta.url)))
+
+
+def last_per_url(metadata):
+    """Yield the PageMeta of a url-sorted stream, keeping the last of pages that share a url.
+
+    Pages sharing a destination overwrite each other in page order, so the
+    last one is the page on disk. The sitemap applies the same rule.
+    """
+    previous = None
+    for meta in metadata:
+        if previous is not None and meta.url != previous.url:
+            yield previous
+        previous = meta
+    if previous is not None:
+        yield previous
+
+
+def section_range(table, url):
+    """Return the (start, end) indices of the pages at or below url in the sorted table."""
+    start = bisect.bisect_left(table, (url,))
+    # Every url below this one extends it, and nothing else sorts between them.
+    end = bisect.bisect_left(table, (url[:-1] + chr(ord("/") + 1),))
+    return start, end
+
+
+def render_nav(table):
+    """Render the whole site as nested lists, each page under the nearest page above it."""
+    children = {}
+    roots = []
+    stack = []
+    for meta in table:
+        while stack and not meta.url.startswith(stack[-1].url):
+            stack.pop()
+        (children.setdefault(stack[-1].url, []) if stack else roots).append(meta)
+        stack.append(meta)
+
+    parts = ['<nav class="site-nav">']
+
+    def render_list(items):
+        parts.append("<ul>")
+        for meta in items:
+            parts.append(f'<li><a href="{html.escape(meta.url)}">{html.escape(meta.title)}</a>')
+            if meta.url in children:
+                render_list(children[meta.url])
+            parts.append("</li>")
+        parts.append("</ul>")
+
+    if roots:
+        render_list(roots)
+    parts.append("</nav>")
+    return "".join(parts)
+
+
+def bind_nav(template, table):
+    """Return template with its Nav slot filled from table, or template itself if it has none."""
+    if "Nav" not in template.slots:
+        return template
+    return template.bind({"Nav": render_nav(table)})
+
+
+def listing_url(section, number):
+    return f"{section}{LISTING_DIR}/" if number == 1 else f"{section}{LISTING_DIR}/{number}/"
+
+
+class Listing:
+    """The Content of one listing page: a run of the metadata table, written without building nodes."""
+    def __init__(self, table, start, end, previous_url=None, next_url=None):
+        self.table = table
+        self.start = start
+        self.end = end
+        self.previous_url = previous_url
+        self.next_url = next_url
+
+    def write_html(self, writer):
+        writer.write('<ul class="listing">')
+        for i in range(self.start, self.end):
+            meta = self.table[i]
+            date = format_date(meta.mtime_ns)
+            writer.write(
+                f'<li><a href="{html.escape(meta.url)}">{html.escape(meta.title)}</a> '
+                f'<time datetime="{date}">{date}</time> <span>{meta.words} words</span></li>'
+            )
+        writer.write("</ul>")
+        if self.previous_url or self.next_url:
+            writer.write('<nav class="pagination">')
+            if self.previous_url:
+                writer.write(f'<a rel="prev" href="{html.escape(self.previous_url)}">Previous</a>')
+            if self.next_url:
+                writer.write(f'<a rel="next" href="{html.escape(self.next_url)}">Next</a>')
+            writer.write("</nav>")
+
+    def to_html(self):
+        buffer = io.StringIO()
+        self.write_html(buffer)
+        return buffer.getvalue()
+
+    def digest(self, template, title):
+        """Hash everything the rendered page depends on, to skip rewriting it unchanged."""
+        digest = hashlib.sha256(f"{template.digest}\0{title}\0{self.previous_url}\0{self.next_url}".encode())
+        for i in range(self.start, self.end):
+            digest.update(repr(tuple(self.table[i])).encode())
+        return digest.hexdigest()
+
+
+def format_date(mtime_ns):
+    return datetime.date.fromtimestamp(mtime_ns / 1e9).isoformat()
+
+
+def sections(table):
+    """Yield the url of every directory that holds at least MIN_SECTION_PAGES pages."""
+    counts = {}
+    for meta in table:
+        url = meta.url
+        while True:
+            counts[url] = counts.get(url, 0) + 1
+            if url == "/":
+                break
+            url = url[:url.rstrip("/").rfind("/") + 1]
+    for url in sorted(counts):
+        if counts[url] >= MIN_SECTION_PAGES:
+            yield url
+
+
+def write_listings(table, template, dest_dir_path, page_size=PAGE_SIZE):
+    """Write paginated listing pages for every section and return how many were written.
+
+    Pages whose inputs are unchanged since the last build are left alone,
+    and listing pages no section produces any more are removed.
+    """
+    state_path = os.path.join(dest_dir_path, LISTINGS_NAME)
+    previous = read_json(state_path, {})
+    current = {}
+    written = 0
+    for section in sections(table):
+        start, end = section_range(table, section)
+        if any(table[i].url.startswith(section + LISTING_DIR + "/") for i in range(start, end)):
+            print(f"Skipping the listing of {section}: a page already uses {section}{LISTING_DIR}/")
+            continue
+        section_meta = table[start] if table[start].url == section else None
+        section_title = section_meta.title if section_meta else section
+        count = -(-(end - start) // page_size)
+        for number in range(1, count + 1):
+            first = start + (number - 1) * page_size
+            listing = Listing(
+                table, first, min(first + page_size, end),
+                listing_url(section, number - 1) if number > 1 else None,
+                listing_url(section, number + 1) if number < count else None,
+            )
+            title = section_title if number == 1 else f"{section_title} (page {number})"
+            output = listing_url(section, number).lstrip("/") + "index.html"
+            digest = listing.digest(template, title)
+            current[output] = digest
+            output_path = os.path.join(dest_dir_path, output)
+            if previous.get(output) == digest and os.path.exists(output_path):
+                continue
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            newest = max(table[i].mtime_ns for i in range(listing.start, listing.end))
+            with open(output_path, "w") as f:
+                template.render_to(f, {
+                    "Title": title,
+                    "Content": listing,
+                    "Date": format_date(newest),
+                    "Description": "",
+                })
+            written += 1
+
+    for output in previous:
+        if output in current:
+            continue
+        output_path = os.path.join(dest_dir_path, output)
+        for path in (output_path, *(output_path + suffix for suffix in COMPRESSED_SUFFIXES)):
+            if os.path.exists(path):
+                os.remove(path)
+        remove_empty_dirs(os.path.dirname(output_path), dest_dir_path)
+    write_json(state_path, current)
+    return written
@@ -0,0 +1,52 @@
+"""
+This module turns the markdown of one page into the variables its template is rendered with.
+
+It needs only the parser, so library code such as renderer.py can use it
+without importing the command line in main.py.
+"""
+import html
+import re
+
+from textnode import (
+    BLOCK_TYPE_PARAGRAPH,
+    TEXT_TYPE_IMAGE,
+    block_to_block_type,
+    markdown_to_blocks,
+    markdown_to_html_node,
+    text_to_textnodes,
+)
+
+
+def extract_title(markdown):
+    heading = re.search(r"(#{1} .*)", markdown)
+    if not heading:
+        raise Exception("No heading")
+    return heading.group(0).lstrip('# ')
+
+
+def describe(markdown, limit=160):
+    """Return the plain text of the first paragraph, cut at a word boundary, for meta tags."""
+    return describe_blocks(markdown_to_blocks(markdown), limit)
+
+def describe_blocks(blocks, limit=160):
+    for block in blocks:
+        if block_to_block_type(block) != BLOCK_TYPE_PARAGRAPH:
+            continue
+        words = "".join(
+            node.text for node in text_to_textnodes(block) if node.text_type != TEXT_TYPE_IMAGE
+        ).split()
+        text = " ".join(words)
+        if len(text) > limit:
+            text = text[:limit].rsplit(" ", 1)[0] + "…"
+        return html.escape(text)
+    return ""
+
+
+def page_variables(markdown, date, cache=None, asset_urls=None):
+    """Return the variables a page's template is rendered with."""
+    return {
+        "Title": extract_title(markdown),
+        "Content": markdown_to_html_node(markdown, cache, asset_urls=asset_urls),
+        "Date": date.isoformat(),
+        "Description": describe(markdown),
+    }
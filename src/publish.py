@@ -0,0 +1,168 @@
+"""
+This module publishes the output directory atomically from a content-addressed store.
+
+    .publish/objects/<ab>/<sha256>   one read-only blob per distinct file content
+    .publish/trees/<build>.json      {path: [size, mtime_ns, sha256]} of a published build
+    .publish/builds/<build>/         that build's files, hard links to their blobs
+    .publish/history.json            published build ids, oldest first
+
+A build's id is derived from its tree, so publishing an unchanged site
+changes nothing. The served path is a symlink to builds/<build> that is
+replaced with os.replace: a server sees either the old build or the new
+one, never a half-written site, and a rollback only moves the link. Blobs
+are written once, so disk use grows with distinct contents rather than
+with the number of builds.
+"""
+import hashlib
+import json
+import os
+import shutil
+
+from fingerprint import FINGERPRINTS_NAME
+from manifest import OUTPUT_INDEX_NAME, OutputIndex, hash_file
+from sync import place_file
+from util import read_json, write_json
+
+STORE_DIR = ".publish"
+PUBLISH_LINK = "site"
+KEEP_BUILDS = 5
+# Dotfiles of the output directory that server.py reads, published along
+# with the site. The output index is written for each build instead.
+PUBLISHED_DOTFILES = (FINGERPRINTS_NAME,)
+
+
+class PublishError(Exception):
+    """Raised when a build cannot be published or rolled back."""
+
+
+class Store:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def blob_path(self, digest):
+        return self.path("objects", digest[:2], digest)
+
+    def add(self, src_path, digest):
+        """Store src_path as the blob for digest unless it is already there; return whether it was added."""
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Never hardlink: the build rewrites its outputs in place.
+        place_file(src_path, path, "reflink")
+        os.chmod(path, 0o444)
+        return True
+
+    def load_history(self):
+        return read_json(self.path("history.json"), [])
+
+    def save_history(self, history):
+        write_json(self.path("history.json"), history, sort_keys=True)
+
+
+def current_build(link):
+    """Return the id of the build link points at, or None."""
+    if not os.path.islink(link):
+        return None
+    return os.path.basename(os.readlink(link))
+
+
+def point_link(link, build_dir):
+    """Atomically make link a symlink to build_dir."""
+    if os.path.lexists(link) and not os.path.islink(link):
+        raise PublishError(f"{link} exists and is not a symlink; move it out of the way to publish there")
+    target = os.path.relpath(build_dir, os.path.dirname(os.path.abspath(link)))
+    tmp_link = link + ".tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(target, tmp_link)
+    os.replace(tmp_link, link)
+
+
+def publish(output_dir, link=PUBLISH_LINK, store=None, keep=KEEP_BUILDS):
+    """Publish output_dir at link and return (build id, blobs added).
+
+    Contents are hashed through the output index, so only files changed
+    since the last build are read.
+    """
+    store = store or Store()
+    index = OutputIndex.load(output_dir)
+    index.refresh()
+    files = dict(index.files)
+    for name in PUBLISHED_DOTFILES:
+        path = os.path.join(output_dir, name)
+        if os.path.exists(path):
+            files[name] = [None, None, hash_file(path)]
+
+    tree = {}
+    added = 0
+    # Sorted, so a file's blob is stored before those of its precompressed siblings.
+    for rel_path, (_, _, digest) in sorted(files.items()):
+        added += store.add(os.path.join(output_dir, rel_path), digest)
+        # Served files carry the blob's stat, which the output index must match.
+        stat = os.stat(store.blob_path(digest))
+        tree[rel_path] = [stat.st_size, stat.st_mtime_ns, digest]
+
+    build_id = hashlib.sha256(
+        json.dumps({rel_path: entry[2] for rel_path, entry in tree.items()}, sort_keys=True).encode()
+    ).hexdigest()[:16]
+    build_dir = store.path("builds", build_id)
+    if not os.path.isdir(build_dir):
+        tmp_dir = build_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for rel_path, (_, _, digest) in tree.items():
+            dest_path = os.path.join(tmp_dir, rel_path)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            os.link(store.blob_path(digest), dest_path)
+        write_json(os.path.join(tmp_dir, OUTPUT_INDEX_NAME), tree, sort_keys=True)
+        write_json(store.path("trees", build_id + ".json"), tree, sort_keys=True)
+        os.rename(tmp_dir, build_dir)
+
+    point_link(link, build_dir)
+    history = [entry for entry in store.load_history() if entry != build_id] + [build_id]
+    store.save_history(prune(store, history, build_id, keep))
+    return build_id, added
+
+
+def rollback(link=PUBLISH_LINK, build_id=None, store=None):
+    """Point link back at build_id, or at the build published before the current one; return its id."""
+    store = store or Store()
+    history = store.load_history()
+    current = current_build(link)
+    if build_id is None:
+        if current not in history or history.index(current) == 0:
+            raise PublishError("No earlier build to roll back to")
+        build_id = history[history.index(current) - 1]
+    build_dir = store.path("builds", build_id)
+    if not os.path.isdir(build_dir):
+        raise PublishError(f"No published build {build_id}; kept builds: {', '.join(history)}")
+    point_link(link, build_dir)
+    return build_id
+
+
+def prune(store, history, current, keep):
+    """Delete builds beyond the keep most recent and blobs no remaining build links to; return the history kept."""
+    kept = history[-keep:] if keep > 0 else []
+    if current not in kept:
+        kept.append(current)
+    removed = [build_id for build_id in history if build_id not in kept]
+    for build_id in removed:
+        shutil.rmtree(store.path("builds", build_id), ignore_errors=True)
+        try:
+            os.remove(store.path("trees", build_id + ".json"))
+        except FileNotFoundError:
+            pass
+
+    if removed:
+        objects = store.path("objects")
+        for prefix in os.listdir(objects):
+            with os.scandir(os.path.join(objects, prefix)) as entries:
+                for entry in entries:
+                    # A blob's only remaining link is its own.
+                    if entry.stat().st_nlink == 1:
+                        os.remove(entry.path)
+    return [build_id for build_id in history if build_id in kept]
@@ -0,0 +1,151 @@
+"""
+This module renders markdown held in memory, for embedding the generator in another program.
+
+    renderer = Renderer(Template.from_string("<title>{{ Title }}</title>{{ Content }}"))
+    html = renderer.render("# Hello")
+    for page in renderer.render_batch(pages, jobs=4):
+        ...
+
+A Renderer keeps one compiled template and block cache across calls and
+may be shared between threads. Batch mode spreads pages over a process
+pool that stays up until close(), so its warm workers serve later batches
+as well. Pass the asset urls from fingerprint_assets to point images and
+links at fingerprinted assets, as a build with --fingerprint does.
+"""
+import collections
+import datetime
+import threading
+from itertools import islice
+
+from blockcache import BlockCache
+from page import page_variables
+from template import as_template
+from textnode import as_asset_urls
+
+# Pages sent to a worker at a time, and chunks kept in flight per worker.
+CHUNK_SIZE = 32
+CHUNKS_IN_FLIGHT = 2
+
+RenderedPage = collections.namedtuple("RenderedPage", ("path", "html", "error"))
+
+
+class Renderer:
+    """Renders (path, markdown) pairs into pages of one template without touching the filesystem."""
+    def __init__(self, template, cache=None, jobs=1, asset_urls=None):
+        self.asset_urls = as_asset_urls(asset_urls)
+        self.template = as_template(template).with_asset_urls(self.asset_urls)
+        self.owns_cache = cache is None
+        self.cache = BlockCache() if cache is None else cache
+        self.jobs = jobs
+        # {jobs: [pool, batches using it]}
+        self._executors = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def render(self, markdown, date=None):
+        """Return the page for markdown as an HTML string, raising if it cannot be rendered.
+
+        date fills the template's Date and defaults to today.
+        """
+        variables = page_variables(markdown, date or datetime.date.today(), self.cache, self.asset_urls)
+        return self.template.render(variables)
+
+    def render_page(self, path, markdown):
+        try:
+            return RenderedPage(path, self.render(markdown), None)
+        except Exception as e:
+            return RenderedPage(path, None, f"{type(e).__name__}: {e}")
+
+    def render_pages(self, pages):
+        """Yield a RenderedPage for each (path, markdown) pair, in order, as soon as it is rendered."""
+        for path, markdown in pages:
+            yield self.render_page(path, markdown)
+
+    def render_batch(self, pages, jobs=None):
+        """Like render_pages, spread over a pool of jobs worker processes.
+
+        pages is consumed lazily and only a few chunks per worker are in
+        flight, so memory stays bounded however many pages come in.
+        """
+        jobs = jobs or self.jobs
+        if jobs <= 1:
+            yield from self.render_pages(pages)
+            return
+
+        executor = self.acquire_executor(jobs)
+        try:
+            pages = iter(pages)
+            pending = collections.deque()
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < jobs * CHUNKS_IN_FLIGHT:
+                    chunk = list(islice(pages, CHUNK_SIZE))
+                    if chunk:
+                        pending.append(executor.submit(render_chunk, chunk))
+                    else:
+                        exhausted = True
+                if not pending:
+                    return
+                yield from pending.popleft().result()
+        finally:
+            self.release_executor(jobs)
+
+    def acquire_executor(self, jobs):
+        """Return a pool of jobs workers for one batch, started on first use.
+
+        Pools of other sizes are stopped once no batch is using them, so a
+        batch running in another thread keeps its pool until it is done.
+        """
+        with self._lock:
+            for size, (executor, batches) in list(self._executors.items()):
+                if size != jobs and not batches:
+                    executor.shutdown()
+                    del self._executors[size]
+            if jobs not in self._executors:
+                from concurrent.futures import ProcessPoolExecutor
+
+                executor = ProcessPoolExecutor(
+                    max_workers=jobs, initializer=init_worker,
+                    initargs=(self.template, self.cache, self.asset_urls),
+                )
+                self._executors[jobs] = [executor, 0]
+            entry = self._executors[jobs]
+            entry[1] += 1
+            return entry[0]
+
+    def release_executor(self, jobs):
+        with self._lock:
+            entry = self._executors.get(jobs)
+            if entry is not None:
+                entry[1] -= 1
+
+    def close(self):
+        """Stop the worker pools and write the block cache out."""
+        with self._lock:
+            for executor, _ in self._executors.values():
+                executor.shutdown()
+            self._executors.clear()
+        if self.owns_cache:
+            self.cache.close()
+        else:
+            self.cache.flush()
+
+
+# The Renderer of a worker process, with its own copy of the block cache.
+_worker = None
+
+
+def init_worker(template, cache, asset_urls):
+    global _worker
+    _worker = Renderer(template, cache, asset_urls=asset_urls)
+
+
+def render_chunk(chunk):
+    results = [_worker.render_page(path, markdown) for path, markdown in chunk]
+    _worker.cache.flush()
+    return results
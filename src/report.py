@@ -0,0 +1,106 @@
+"""
+This module contains the build report: per-page stage timings, byte counts and peak memory.
+"""
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+STAGES = ("read", "title", "description", "blocks", "inline", "render", "template", "write")
+
+
+class PageStats:
+    """Seconds per stage and bytes read and written for one page.
+
+    lap(stage) charges the time since the previous lap to stage, so a
+    page is timed by calling it once after each step.
+    """
+    __slots__ = ("path", "stages", "bytes_read", "bytes_written", "_last")
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._last = time.perf_counter()
+
+    def lap(self, stage=None):
+        """Charge the time since the last lap to stage; None skips time already recorded."""
+        now = time.perf_counter()
+        if stage is not None:
+            self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    @property
+    def total(self):
+        return sum(self.stages.values())
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "seconds": round(self.total, 6),
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+
+    def __getstate__(self):
+        return self.path, self.stages, self.bytes_read, self.bytes_written
+
+    def __setstate__(self, state):
+        self.path, self.stages, self.bytes_read, self.bytes_written = state
+        self._last = time.perf_counter()
+
+
+def peak_memory():
+    """Return the peak resident set size in bytes of this process and its finished workers."""
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux reports kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BuildReport:
+    """Collects PageStats from a build and writes them out as JSON."""
+    def __init__(self, slowest=10):
+        self.slowest = slowest
+        self.pages = []
+        self.started = time.perf_counter()
+
+    def add(self, stats):
+        self.pages.append(stats)
+
+    def to_dict(self):
+        totals = {}
+        for stats in self.pages:
+            for stage, seconds in stats.stages.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        by_time = sorted(self.pages, key=lambda stats: stats.total, reverse=True)
+        return {
+            "pages": len(self.pages),
+            "seconds": round(time.perf_counter() - self.started, 6),
+            "stages": {stage: round(totals[stage], 6) for stage in STAGES if stage in totals},
+            "bytes_read": sum(stats.bytes_read for stats in self.pages),
+            "bytes_written": sum(stats.bytes_written for stats in self.pages),
+            "peak_memory_bytes": peak_memory(),
+            "slowest": [stats.to_dict() for stats in by_time[:self.slowest]],
+            "page_timings": [stats.to_dict() for stats in self.pages],
+        }
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
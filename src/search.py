@@ -0,0 +1,336 @@
+"""
+This module builds the client-side search index.
+
+The index lives under search/ in the output directory:
+
+    search/meta.json          format version and shard sizes
+    search/terms/<hex>.json   {term: [id gap, weight, id gap, weight, ...]} for
+                              every term whose first two characters hex-encode
+                              to <hex>; postings are sorted by page id and the
+                              ids delta-encoded
+    search/docs/<n>.json      {id: [url, title]} for ids n * DOCS_PER_SHARD onwards
+    search/search.js          defines siteSearch(query, limit), which fetches
+                              only the shards the query's terms fall in
+
+Page ids stay stable between builds, so an incremental update re-tokenizes
+changed pages and rewrites just the shards they touch. Postings of changed
+pages are spilled to per-shard temporary files and merged one shard at a
+time, so memory holds one shard rather than the whole index.
+"""
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from manifest import hash_file
+from textnode import (
+    BLOCK_TYPE_CODE,
+    BLOCK_TYPE_HEADING,
+    block_to_block_type,
+    iter_markdown_blocks,
+    text_to_textnodes,
+)
+from util import map_pages, page_url, read_json, write_json
+
+SEARCH_DIR = "search"
+SEARCH_STATE_NAME = ".search.json"
+SEARCH_VERSION = 1
+DOCS_PER_SHARD = 1000
+PREFIX_LENGTH = 2
+HEADING_WEIGHT = 5
+# Postings buffered in memory before they are appended to the spill files.
+SPILL_BUFFER = 100_000
+
+TERM_PATTERN = re.compile(r"\w+")
+TITLE_PATTERN = re.compile(r"# .*")
+
+LOOKUP_SCRIPT = """\
+(() => {
+  const root = new URL(".", document.currentScript.src).pathname;
+  const cache = new Map();
+  const load = (path) => {
+    if (!cache.has(path)) cache.set(path, fetch(root + path).then((r) => (r.ok ? r.json() : {})));
+    return cache.get(path);
+  };
+  const hex = (text) => Array.from(new TextEncoder().encode(text), (b) => b.toString(16).padStart(2, "0")).join("");
+  const shard = (term, length) => `terms/${hex(Array.from(term).slice(0, length).join(""))}.json`;
+
+  async function scores(term, prefix, length) {
+    const postings = await load(shard(term, length));
+    const found = new Map();
+    for (const [key, list] of Object.entries(postings)) {
+      if (key !== term && !(prefix && key.startsWith(term))) continue;
+      let id = 0;
+      for (let i = 0; i < list.length; i += 2) {
+        id += list[i];
+        found.set(id, (found.get(id) || 0) + list[i + 1]);
+      }
+    }
+    return found;
+  }
+
+  window.siteSearch = async (query, limit = 20) => {
+    const meta = await load("meta.json");
+    const terms = (query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu) || [])
+      .filter((term) => Array.from(term).length >= meta.prefix_length);
+    if (!terms.length) return [];
+    // The last term may be half typed, so it also matches longer terms.
+    const lists = await Promise.all(terms.map((term, i) => scores(term, i === terms.length - 1, meta.prefix_length)));
+    let total = lists[0];
+    for (const other of lists.slice(1)) {
+      total = new Map([...total].filter(([id]) => other.has(id)).map(([id, score]) => [id, score + other.get(id)]));
+    }
+    const top = [...total].sort((a, b) => b[1] - a[1]).slice(0, limit);
+    return Promise.all(top.map(async ([id, score]) => {
+      const [url, title] = (await load(`docs/${Math.floor(id / meta.docs_per_shard)}.json`))[id];
+      return { url, title, score };
+    }));
+  };
+})();
+"""
+
+
+def tokenize(text):
+    return [term for term in TERM_PATTERN.findall(text.lower()) if len(term) >= PREFIX_LENGTH]
+
+
+def page_terms(path):
+    """Return (title, {term: weight}) for a markdown file, reading it block by block.
+
+    Terms come from the text of every TextNode outside code blocks; terms in
+    headings count HEADING_WEIGHT times.
+    """
+    title = None
+    weights = {}
+    with open(path, "r") as f:
+        for block in iter_markdown_blocks(iter(lambda: f.read(1 << 16), "")):
+            if title is None:
+                heading = TITLE_PATTERN.search(block)
+                if heading:
+                    title = heading.group(0).lstrip("# ").strip()
+            block_type = block_to_block_type(block)
+            if block_type == BLOCK_TYPE_CODE:
+                continue
+            weight = HEADING_WEIGHT if block_type == BLOCK_TYPE_HEADING else 1
+            for node in text_to_textnodes(block):
+                for term in tokenize(node.text):
+                    weights[term] = weights.get(term, 0) + weight
+    return title, weights
+
+
+def shard_name(term):
+    return term[:PREFIX_LENGTH].encode().hex()
+
+
+class SpillFiles:
+    """Per-shard append-only files of (term, id, weight) lines, buffered in memory."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.buffers = {}
+        self.buffered = 0
+
+    def add(self, shard, term, page_id, weight):
+        self.buffers.setdefault(shard, []).append(f"{json.dumps(term)}\t{page_id}\t{weight}\n")
+        self.buffered += 1
+        if self.buffered >= SPILL_BUFFER:
+            self.flush()
+
+    def flush(self):
+        for shard, lines in self.buffers.items():
+            with open(os.path.join(self.directory, shard), "a") as f:
+                f.writelines(lines)
+        self.buffers = {}
+        self.buffered = 0
+
+    def read(self, shard):
+        """Yield (term, id, weight) spilled for shard."""
+        try:
+            f = open(os.path.join(self.directory, shard), "r")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                term, page_id, weight = line.split("\t")
+                yield json.loads(term), int(page_id), int(weight)
+
+
+def decode_postings(encoded):
+    page_id = 0
+    postings = []
+    for i in range(0, len(encoded), 2):
+        page_id += encoded[i]
+        postings.append((page_id, encoded[i + 1]))
+    return postings
+
+
+def encode_postings(postings):
+    encoded = []
+    previous = 0
+    for page_id, weight in sorted(postings):
+        encoded.append(page_id - previous)
+        encoded.append(weight)
+        previous = page_id
+    return encoded
+
+
+class SearchIndex:
+    """The search index of an output directory and the state needed to update it.
+
+    The state file maps each source, relative to the content directory, to
+    its page id, fingerprint and the term shards it contributed to.
+    """
+    def __init__(self, dest_dir_path):
+        self.dest_dir_path = dest_dir_path
+        self.root = os.path.join(dest_dir_path, SEARCH_DIR)
+        state = read_json(os.path.join(dest_dir_path, SEARCH_STATE_NAME), {})
+        meta = read_json(os.path.join(self.root, "meta.json"), {})
+        if state.get("version") != SEARCH_VERSION or meta.get("version") != SEARCH_VERSION:
+            state = {}
+        self.pages = state.get("pages", {})
+        self.next_id = state.get("next_id", 0)
+        self.free_ids = state.get("free_ids", [])
+
+    def save(self):
+        state = {
+            "version": SEARCH_VERSION, "pages": self.pages,
+            "next_id": self.next_id, "free_ids": self.free_ids,
+        }
+        write_json(os.path.join(self.dest_dir_path, SEARCH_STATE_NAME), state)
+
+    def fingerprint(self, key, path):
+        stat = os.stat(path)
+        entry = self.pages.get(key)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["size"], entry["mtime_ns"], entry["hash"]
+        return stat.st_size, stat.st_mtime_ns, hash_file(path)
+
+    def allocate_id(self):
+        if self.free_ids:
+            return self.free_ids.pop()
+        self.next_id += 1
+        return self.next_id - 1
+
+    def update(self, pages, dir_path_content, jobs=1, analyzed=None):
+        """Re-index new and changed pages and drop removed ones; return how many were indexed.
+
+        analyzed, if given, maps each source key to ((size, mtime_ns, hash),
+        title, load_terms) computed elsewhere, such as in shard builds, and
+        no source is read. load_terms returns the page's {term: weight} and
+        is called only for pages that are re-indexed, one at a time.
+        """
+        current = {}
+        todo = []
+        for from_path, dest_path in pages:
+            key = os.path.relpath(from_path, dir_path_content)
+            if analyzed is None:
+                size, mtime_ns, digest = self.fingerprint(key, from_path)
+            else:
+                size, mtime_ns, digest = analyzed[key][0]
+            current[key] = from_path
+            entry = self.pages.get(key)
+            if entry is None or entry["hash"] != digest:
+                todo.append((key, from_path, dest_path, size, mtime_ns, digest))
+            else:
+                entry["size"], entry["mtime_ns"] = size, mtime_ns
+
+        stale_ids = set()
+        term_shards = set()
+        doc_shards = set()
+        for key in [key for key in self.pages if key not in current]:
+            entry = self.pages.pop(key)
+            stale_ids.add(entry["id"])
+            self.free_ids.append(entry["id"])
+            term_shards.update(entry["shards"])
+            doc_shards.add(entry["id"] // DOCS_PER_SHARD)
+        if not todo and not stale_ids and os.path.isdir(self.root):
+            self.save()
+            return 0
+
+        os.makedirs(os.path.join(self.root, "terms"), exist_ok=True)
+        os.makedirs(os.path.join(self.root, "docs"), exist_ok=True)
+        if analyzed is None:
+            terms = map_pages(page_terms, [item[1] for item in todo], jobs)
+        else:
+            terms = ((analyzed[item[0]][1], analyzed[item[0]][2]()) for item in todo)
+        docs = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            spill = SpillFiles(tmp)
+            for (key, from_path, dest_path, size, mtime_ns, digest), (title, weights) in zip(todo, terms):
+                entry = self.pages.get(key)
+                if entry is not None:
+                    page_id = entry["id"]
+                    stale_ids.add(page_id)
+                    term_shards.update(entry["shards"])
+                else:
+                    page_id = self.allocate_id()
+                shards = set()
+                for term, weight in weights.items():
+                    shard = shard_name(term)
+                    shards.add(shard)
+                    spill.add(shard, term, page_id, weight)
+                term_shards |= shards
+                url = page_url(dest_path, self.dest_dir_path)
+                docs[page_id] = [url, title or url]
+                doc_shards.add(page_id // DOCS_PER_SHARD)
+                self.pages[key] = {
+                    "id": page_id, "size": size, "mtime_ns": mtime_ns, "hash": digest,
+                    "shards": sorted(shards),
+                }
+            spill.flush()
+
+            for shard in term_shards:
+                self.merge_terms(shard, stale_ids, spill.read(shard))
+        for shard in doc_shards:
+            self.merge_docs(shard, stale_ids, docs)
+
+        write_json(os.path.join(self.root, "meta.json"), {
+            "version": SEARCH_VERSION, "prefix_length": PREFIX_LENGTH, "docs_per_shard": DOCS_PER_SHARD,
+        })
+        with open(os.path.join(self.root, "search.js"), "w") as f:
+            f.write(LOOKUP_SCRIPT)
+        self.save()
+        return len(todo)
+
+    def merge_terms(self, shard, stale_ids, added):
+        path = os.path.join(self.root, "terms", shard + ".json")
+        postings = {}
+        for term, encoded in read_json(path, {}).items():
+            kept = [posting for posting in decode_postings(encoded) if posting[0] not in stale_ids]
+            if kept:
+                postings[term] = kept
+        for term, page_id, weight in added:
+            postings.setdefault(term, []).append((page_id, weight))
+        if postings:
+            write_json(path, {term: encode_postings(postings[term]) for term in sorted(postings)})
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def merge_docs(self, shard, stale_ids, docs):
+        path = os.path.join(self.root, "docs", f"{shard}.json")
+        entries = {
+            page_id: doc for page_id, doc in read_json(path, {}).items() if int(page_id) not in stale_ids
+        }
+        first = shard * DOCS_PER_SHARD
+        for page_id in range(first, first + DOCS_PER_SHARD):
+            if page_id in docs:
+                entries[str(page_id)] = docs[page_id]
+        if entries:
+            write_json(path, dict(sorted(entries.items(), key=lambda item: int(item[0]))))
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.pages = {}
+        self.next_id = 0
+        self.free_ids = []
+
+
+def update_search_index(pages, dir_path_content, dest_dir_path, jobs=1, rebuild=False, analyzed=None):
+    """Bring the search index in dest_dir_path up to date with pages and return how many were indexed."""
+    index = SearchIndex(dest_dir_path)
+    if rebuild or not index.pages:
+        # No usable state: start over rather than merge into shards we cannot account for.
+        index.clear()
+    return index.update(pages, dir_path_content, jobs, analyzed)
@@ -0,0 +1,272 @@
+"""
+This module splits a build across machines and merges the pieces back together.
+
+A shard build (--shard i/N) renders the pages whose source path hashes to
+shard i of N into shards/<i>-of-<N>/ and describes them in .shard.json:
+
+    {"version": 2, "shard": [i, N], "template": digest, "assets": {url: fingerprinted url},
+     "pages": {source: {"size", "mtime_ns", "hash", "output", "title", "terms"}}}
+
+Sources are relative to the content directory and outputs to the shard
+directory. With --search, each page's {term: weight} is one line of
+.shard-terms.jsonl and "terms" is the [offset, length] of that line;
+without it, "terms" is null. Keeping the weights out of the manifest
+means the merge reads them one page at a time, and only for pages the
+search index has to re-index.
+
+The merge (--merge) copies the pages of every shard into the output
+directory, refusing outputs claimed by more than one source, and writes
+the sitemap, feed and search index from the shard manifests alone, so no
+markdown is parsed twice.
+"""
+import hashlib
+import json
+import os
+
+from manifest import Manifest
+from navigation import PageMeta
+from page import extract_title
+from search import page_terms, update_search_index
+from sitemap import write_sitemaps
+from sync import place_file
+from textnode import iter_markdown_blocks
+from util import map_pages, page_url, read_json, write_json
+
+SHARD_DIR = "shards"
+SHARD_MANIFEST_NAME = ".shard.json"
+SHARD_TERMS_NAME = ".shard-terms.jsonl"
+SHARD_VERSION = 2
+
+
+class ShardError(Exception):
+    """Raised when shard builds cannot be merged."""
+
+
+def shard_dir(index, count):
+    return os.path.join(SHARD_DIR, f"{index}-of-{count}")
+
+
+def shard_of(key, count):
+    """Return the shard, numbered from 1, that a source path belongs to out of count."""
+    digest = hashlib.blake2b(key.replace(os.sep, "/").encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+def select_pages(pages, dir_path_content, index, count):
+    """Keep the pages of shard index of count; every machine picks the same ones."""
+    return [
+        (from_path, dest_path) for from_path, dest_path in pages
+        if shard_of(os.path.relpath(from_path, dir_path_content), count) == index
+    ]
+
+
+def page_title(path):
+    """Return (title, None) for a markdown file: the page_terms result of a shard built without search."""
+    with open(path, "r") as f:
+        for block in iter_markdown_blocks(iter(lambda: f.read(1 << 16), "")):
+            try:
+                return extract_title(block), None
+            except Exception:
+                continue
+    return None, None
+
+
+def write_shard_manifest(
+    pages, dir_path_content, dest_dir_path, shard, template_digest, asset_urls=None, search=False, jobs=1,
+):
+    """Describe a shard's pages in its .shard.json and return how many pages were read for it.
+
+    Titles and terms of pages whose source hash is unchanged are kept from
+    the previous build; their terms are copied from the old terms file.
+    """
+    path = os.path.join(dest_dir_path, SHARD_MANIFEST_NAME)
+    terms_path = os.path.join(dest_dir_path, SHARD_TERMS_NAME)
+    previous = read_json(path, {})
+    if previous.get("version") != SHARD_VERSION:
+        previous = {}
+    known = Manifest(dest_dir_path, pages=previous.get("pages", {}))
+    has_terms = os.path.exists(terms_path)
+
+    entries = {}
+    todo = []
+    for from_path, dest_path in pages:
+        key = os.path.relpath(from_path, dir_path_content)
+        entry = known.fingerprint(key, from_path)
+        entry["output"] = os.path.relpath(os.path.join(dest_path, "index.html"), dest_dir_path)
+        old = known.pages.get(key)
+        if old and old["hash"] == entry["hash"] and (not search or (old["terms"] is not None and has_terms)):
+            entry["title"] = old["title"]
+            entry["terms"] = old["terms"] if search else None
+        else:
+            todo.append(key)
+            entry["title"] = entry["terms"] = None
+        entries[key] = entry
+
+    analyze = page_terms if search else page_title
+    analyzed = map_pages(analyze, [os.path.join(dir_path_content, key) for key in todo], jobs)
+    unread = set(todo)
+    old_terms = open(terms_path, "rb") if search and has_terms else None
+    new_terms = open(terms_path + ".tmp", "wb") if search else None
+    try:
+        # Changed pages come from map_pages in page order, and every page's
+        # terms are written out before the next is looked at.
+        for from_path, _ in pages:
+            key = os.path.relpath(from_path, dir_path_content)
+            entry = entries[key]
+            if key in unread:
+                unread.discard(key)
+                entry["title"], weights = next(analyzed)
+                line = None if weights is None else json.dumps(weights, ensure_ascii=False).encode() + b"\n"
+            elif search:
+                old_terms.seek(entry["terms"][0])
+                line = old_terms.read(entry["terms"][1])
+            else:
+                line = None
+            if new_terms is not None:
+                entry["terms"] = [new_terms.tell(), len(line)]
+                new_terms.write(line)
+    finally:
+        if old_terms is not None:
+            old_terms.close()
+        if new_terms is not None:
+            new_terms.close()
+    if search:
+        os.replace(terms_path + ".tmp", terms_path)
+    elif os.path.exists(terms_path):
+        os.remove(terms_path)
+
+    write_json(path, {
+        "version": SHARD_VERSION, "shard": list(shard), "template": template_digest,
+        "assets": asset_urls or {}, "pages": entries,
+    })
+    return len(todo)
+
+
+class ShardTerms:
+    """Reads the search terms of single pages back from the terms files of shard builds."""
+    def __init__(self):
+        self.files = {}
+
+    def loader(self, directory, terms):
+        """Return a function reading the {term: weight} a manifest entry's terms point at."""
+        return lambda: self.read(directory, terms)
+
+    def read(self, directory, terms):
+        f = self.files.get(directory)
+        if f is None:
+            f = self.files[directory] = open(os.path.join(directory, SHARD_TERMS_NAME), "rb")
+        f.seek(terms[0])
+        return json.loads(f.read(terms[1]))
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+def find_shards(root=SHARD_DIR):
+    """Return the shard build directories under root."""
+    try:
+        names = sorted(os.listdir(root))
+    except FileNotFoundError:
+        names = []
+    dirs = [
+        os.path.join(root, name) for name in names
+        if os.path.isfile(os.path.join(root, name, SHARD_MANIFEST_NAME))
+    ]
+    if not dirs:
+        raise ShardError(f"No shard builds found under {root}")
+    return dirs
+
+
+def load_shards(shard_dirs, asset_urls=None):
+    """Load the manifests of shard_dirs and check they make up one complete, consistent build."""
+    manifests = []
+    for directory in shard_dirs:
+        manifest = read_json(os.path.join(directory, SHARD_MANIFEST_NAME), {})
+        if manifest.get("version") != SHARD_VERSION:
+            raise ShardError(f"{directory} holds no shard build")
+        manifests.append(manifest)
+
+    count = manifests[0]["shard"][1]
+    found = sorted(manifest["shard"][0] for manifest in manifests)
+    if any(manifest["shard"][1] != count for manifest in manifests) or found != list(range(1, count + 1)):
+        shards = ", ".join(f"{index}/{total}" for index, total in sorted(m["shard"] for m in manifests))
+        raise ShardError(f"Expected shards 1/{count} to {count}/{count}, found {shards}")
+    if len({manifest["template"] for manifest in manifests}) > 1:
+        raise ShardError("Shards were built from different templates or static files")
+    if any(manifest["assets"] != (asset_urls or {}) for manifest in manifests):
+        raise ShardError("Shards were built with other static files or without the same --fingerprint")
+    return manifests
+
+
+def merge_shards(
+    shard_dirs, dest_dir_path, link="copy", asset_urls=None, base_url="", search=False, jobs=1, rebuild=False,
+):
+    """Merge shard builds into dest_dir_path and return how many pages were copied.
+
+    Pages whose source is unchanged since the last merge are left in place.
+    """
+    manifests = load_shards(shard_dirs, asset_urls)
+
+    sources = {}
+    outputs = {}
+    collisions = []
+    for directory, manifest in zip(shard_dirs, manifests):
+        for key, entry in manifest["pages"].items():
+            other = outputs.get(entry["output"])
+            if other is not None:
+                collisions.append(f"{entry['output']}: {other} and {key} ({directory})")
+            outputs[entry["output"]] = f"{key} ({directory})"
+            sources[key] = (directory, entry)
+    if collisions:
+        raise ShardError("Pages would overwrite each other: " + "; ".join(collisions))
+    if search and any(entry["terms"] is None for _, entry in sources.values()):
+        raise ShardError("Shards were built without --search")
+
+    manifest = Manifest.load(dest_dir_path)
+    for removed in manifest.start_build(sources, manifests[0]["template"]):
+        print(f"Removed stale page {removed}")
+    copied = 0
+    try:
+        for key, (directory, entry) in sorted(sources.items()):
+            fingerprint = {"size": entry["size"], "mtime_ns": entry["mtime_ns"], "hash": entry["hash"]}
+            if manifest.is_current(key, fingerprint, entry["output"]):
+                continue
+            dest_path = os.path.join(dest_dir_path, entry["output"])
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            place_file(os.path.join(directory, entry["output"]), dest_path, link)
+            manifest.record(key, fingerprint, entry["output"])
+            copied += 1
+    finally:
+        manifest.save()
+    print(f"Merged {len(manifests)} shard(s): copied {copied} of {len(sources)} page(s)")
+
+    pages = sorted(
+        (page_url(os.path.join(dest_dir_path, os.path.dirname(entry["output"])), dest_dir_path), key, entry)
+        for key, (_, entry) in sources.items()
+    )
+    urls, rewritten = write_sitemaps(
+        dest_dir_path, base_url,
+        (PageMeta(url, entry["title"] or url, entry["mtime_ns"], 0) for url, _, entry in pages),
+    )
+    print(f"Sitemap: {urls} url(s), rewrote {rewritten} file(s)")
+
+    if search:
+        shard_terms = ShardTerms()
+        analyzed = {
+            key: (
+                (entry["size"], entry["mtime_ns"], entry["hash"]), entry["title"],
+                shard_terms.loader(directory, entry["terms"]),
+            )
+            for key, (directory, entry) in sources.items()
+        }
+        try:
+            indexed = update_search_index(
+                [(key, os.path.join(dest_dir_path, os.path.dirname(entry["output"]))) for _, key, entry in pages],
+                os.curdir, dest_dir_path, jobs, rebuild, analyzed,
+            )
+        finally:
+            shard_terms.close()
+        print(f"Indexed {indexed} page(s) for search")
+    return copied
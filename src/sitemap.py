@@ -0,0 +1,190 @@
+"""
+This module writes the sitemap and the Atom feed of the output directory.
+
+Pages stream through once. Their urls go into sitemap-1.xml, sitemap-2.xml
+and so on, URLS_PER_SHARD at a time, and sitemap.xml indexes the shards.
+The feed keeps only the FEED_SIZE newest pages on a heap, so memory holds
+at most one shard rather than the whole site. .sitemap.json holds a digest
+per file. A shard's digest is taken from its urls before anything is
+written, so a shard whose pages did not change is not written at all and
+incremental builds only touch the shards whose pages changed.
+"""
+import datetime
+import hashlib
+import heapq
+import os
+from xml.sax.saxutils import escape
+
+from navigation import last_per_url
+from util import COMPRESSED_SUFFIXES, read_json, write_json
+
+SITEMAP_NAME = "sitemap.xml"
+SHARD_NAME = "sitemap-{}.xml"
+FEED_NAME = "feed.xml"
+SITEMAP_STATE_NAME = ".sitemap.json"
+DEFAULT_BASE_URL = "http://localhost:8888"
+# The sitemap protocol's limit on urls per file.
+URLS_PER_SHARD = 50_000
+FEED_SIZE = 20
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+
+
+def escape_attribute(value):
+    """Escape value for a double-quoted XML attribute."""
+    return escape(value, {'"': "&quot;"})
+
+
+def w3c_date(mtime_ns):
+    return datetime.date.fromtimestamp(mtime_ns / 1e9).isoformat()
+
+
+def atom_time(mtime_ns):
+    moment = datetime.datetime.fromtimestamp(mtime_ns // 1_000_000_000, datetime.timezone.utc)
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def write_parts(path, parts):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.writelines(parts)
+    os.replace(tmp_path, path)
+
+
+def write_if_changed(path, text, previous):
+    """Write text to path unless it already holds it; return (digest, whether it was written)."""
+    digest = hashlib.sha256(text.encode()).hexdigest()
+    if digest == previous and os.path.exists(path):
+        return digest, False
+    write_parts(path, (text,))
+    return digest, True
+
+
+class Shard:
+    """The url lines of one sitemap shard, hashed as they are added."""
+    def __init__(self, path):
+        self.path = path
+        self.lines = []
+        self.count = 0
+        self.newest = 0
+        self.digest = hashlib.sha256()
+
+    def add(self, loc, mtime_ns):
+        line = f"<url><loc>{escape(loc)}</loc><lastmod>{w3c_date(mtime_ns)}</lastmod></url>\n"
+        self.lines.append(line)
+        self.digest.update(line.encode())
+        self.count += 1
+        self.newest = max(self.newest, mtime_ns)
+
+    def finish(self, previous):
+        """Write the shard unless it already holds these urls; return whether it was written."""
+        lines, self.lines = self.lines, None
+        if self.digest.hexdigest() == previous and os.path.exists(self.path):
+            return False
+        write_parts(self.path, (
+            f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NAMESPACE}">\n',
+            *lines,
+            "</urlset>\n",
+        ))
+        return True
+
+
+def write_sitemaps(
+    dest_dir_path, base_url, metadata, urls_per_shard=URLS_PER_SHARD, feed_size=FEED_SIZE, author=None,
+):
+    """Write the sitemap shards, their index and the feed for metadata; return (urls, files rewritten).
+
+    metadata is an iterable of PageMeta sorted by url, consumed once. Of
+    pages sharing a url the last is kept, as in navigation.
+    """
+    base_url = base_url.rstrip("/")
+    os.makedirs(dest_dir_path, exist_ok=True)
+    state_path = os.path.join(dest_dir_path, SITEMAP_STATE_NAME)
+    previous = read_json(state_path, {})
+    state = {"base_url": base_url, "shards": {}}
+    if previous.get("base_url") != base_url:
+        previous = {}
+    old_shards = previous.get("shards", {})
+
+    shards = []
+    shard = None
+    newest = []
+    site_title = None
+    urls = 0
+    rewritten = 0
+    for meta in last_per_url(metadata):
+        if shard is None or shard.count == urls_per_shard:
+            if shard is not None:
+                rewritten += shard.finish(old_shards.get(os.path.basename(shard.path)))
+            shard = Shard(os.path.join(dest_dir_path, SHARD_NAME.format(len(shards) + 1)))
+            shards.append(shard)
+        shard.add(base_url + meta.url, meta.mtime_ns)
+        entry = (meta.mtime_ns, meta.url, meta.title)
+        if len(newest) < feed_size:
+            heapq.heappush(newest, entry)
+        elif feed_size:
+            heapq.heappushpop(newest, entry)
+        if meta.url == "/":
+            site_title = meta.title
+        urls += 1
+    if shard is not None:
+        rewritten += shard.finish(old_shards.get(os.path.basename(shard.path)))
+
+    index = [f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NAMESPACE}">\n']
+    for shard in shards:
+        name = os.path.basename(shard.path)
+        state["shards"][name] = shard.digest.hexdigest()
+        index.append(
+            f"<sitemap><loc>{escape(f'{base_url}/{name}')}</loc>"
+            f"<lastmod>{w3c_date(shard.newest)}</lastmod></sitemap>\n"
+        )
+    index.append("</sitemapindex>\n")
+    state["index"], written = write_if_changed(
+        os.path.join(dest_dir_path, SITEMAP_NAME), "".join(index), previous.get("index"),
+    )
+    rewritten += written
+
+    state["feed"], written = write_if_changed(
+        os.path.join(dest_dir_path, FEED_NAME),
+        render_feed(base_url, site_title or base_url, sorted(newest, reverse=True), author),
+        previous.get("feed"),
+    )
+    rewritten += written
+
+    for name in old_shards:
+        if name in state["shards"]:
+            continue
+        path = os.path.join(dest_dir_path, name)
+        for stale in (path, *(path + suffix for suffix in COMPRESSED_SUFFIXES)):
+            if os.path.exists(stale):
+                os.remove(stale)
+    write_json(state_path, state)
+    return urls, rewritten
+
+
+def render_feed(base_url, title, entries, author=None):
+    """Render an Atom feed of entries, (mtime_ns, url, title) tuples, newest first.
+
+    Atom requires an author; the feed names author, or the site title when
+    there is none, and its entries inherit it.
+    """
+    updated = atom_time(entries[0][0]) if entries else atom_time(0)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        f'<feed xmlns="{ATOM_NAMESPACE}">\n',
+        f"<title>{escape(title)}</title>\n",
+        f"<author><name>{escape(author or title)}</name></author>\n",
+        f"<id>{escape(base_url)}/</id>\n",
+        f'<link href="{escape_attribute(base_url)}/"/>\n',
+        f'<link rel="self" href="{escape_attribute(base_url)}/{FEED_NAME}"/>\n',
+        f"<updated>{updated}</updated>\n",
+    ]
+    for mtime_ns, url, entry_title in entries:
+        link = base_url + url
+        parts.append(
+            f'<entry><title>{escape(entry_title)}</title><link href="{escape_attribute(link)}"/>'
+            f"<id>{escape(link)}</id><updated>{atom_time(mtime_ns)}</updated></entry>\n"
+        )
+    parts.append("</feed>\n")
+    return "".join(parts)
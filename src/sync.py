@@ -0,0 +1,168 @@
+"""
+This module syncs static assets into the output directory.
+"""
+import json
+import os
+import shutil
+
+from manifest import hash_file, remove_empty_dirs
+
+SYNC_STATE_NAME = ".assets.json"
+LINK_MODES = ("copy", "hardlink", "reflink")
+
+# ioctl request number for FICLONE on Linux (btrfs, xfs, ...).
+FICLONE = 0x40049409
+
+
+class SyncStats:
+    """Counts of what a sync did."""
+    __slots__ = ("copied", "copied_bytes", "skipped", "skipped_bytes", "removed")
+
+    def __init__(self):
+        self.copied = 0
+        self.copied_bytes = 0
+        self.skipped = 0
+        self.skipped_bytes = 0
+        self.removed = 0
+
+    def __repr__(self):
+        return (
+            f"{self.copied} copied ({self.copied_bytes} B), "
+            f"{self.skipped} skipped ({self.skipped_bytes} B), "
+            f"{self.removed} removed"
+        )
+
+
+def walk_files(src_path, rel_path=""):
+    """Yield (relative path, os.DirEntry) for every file under src_path using os.scandir."""
+    with os.scandir(src_path) as entries:
+        for entry in entries:
+            child = os.path.join(rel_path, entry.name)
+            if entry.is_dir(follow_symlinks=True):
+                yield from walk_files(entry.path, child)
+            else:
+                yield child, entry
+
+
+def is_unchanged(src_stat, dest_path, src_path, checksum):
+    """Check whether dest_path already holds the contents of src_path."""
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if dest_stat.st_size != src_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(src_path) == hash_file(dest_path)
+    return dest_stat.st_mtime_ns == src_stat.st_mtime_ns
+
+
+def reflink(src_path, dest_path):
+    """Clone src_path into dest_path sharing extents, raising OSError where unsupported."""
+    import fcntl
+
+    with open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dest_path)
+
+
+def place_file(src_path, dest_path, link):
+    """Put src_path at dest_path by hardlink, reflink or copy, replacing dest atomically."""
+    tmp_path = dest_path + ".sync-tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        if link == "hardlink":
+            os.link(src_path, tmp_path)
+        elif link == "reflink":
+            reflink(src_path, tmp_path)
+        else:
+            shutil.copy2(src_path, tmp_path)
+    except (OSError, ImportError):
+        if link == "copy":
+            raise
+        # Different filesystem or no clone support: fall back to a plain copy.
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        shutil.copy2(src_path, tmp_path)
+
+    os.replace(tmp_path, dest_path)
+
+
+def load_synced(dest_path):
+    try:
+        with open(os.path.join(dest_path, SYNC_STATE_NAME), "r") as f:
+            return set(json.load(f))
+    except (OSError, ValueError):
+        return set()
+
+
+def save_synced(dest_path, synced):
+    state_path = os.path.join(dest_path, SYNC_STATE_NAME)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(sorted(synced), f, indent=1)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def sync_tree(src_path, dest_path, checksum=False, link="copy", delete=True):
+    """Make dest_path mirror src_path, copying only new or changed files.
+
+    Files are compared by size and mtime, or by content hash with checksum.
+    With delete, files a previous sync put into dest_path that no longer
+    exist in src_path are removed; other files in dest_path (such as
+    generated pages) are left alone.
+    """
+    if link not in LINK_MODES:
+        raise ValueError(f"Invalid link mode: {link}")
+
+    stats = SyncStats()
+    if not os.path.exists(src_path):
+        return stats
+
+    if os.path.isfile(src_path):
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        src_stat = os.stat(src_path)
+        if is_unchanged(src_stat, dest_path, src_path, checksum):
+            stats.skipped += 1
+            stats.skipped_bytes += src_stat.st_size
+        else:
+            place_file(src_path, dest_path, link)
+            stats.copied += 1
+            stats.copied_bytes += src_stat.st_size
+        return stats
+
+    os.makedirs(dest_path, exist_ok=True)
+    previous = load_synced(dest_path)
+    synced = set()
+    made_dirs = set()
+
+    for rel_path, entry in walk_files(src_path):
+        synced.add(rel_path)
+        src_stat = entry.stat()
+        dest_file = os.path.join(dest_path, rel_path)
+        if is_unchanged(src_stat, dest_file, entry.path, checksum):
+            stats.skipped += 1
+            stats.skipped_bytes += src_stat.st_size
+            continue
+
+        dest_dir = os.path.dirname(dest_file)
+        if dest_dir not in made_dirs:
+            os.makedirs(dest_dir, exist_ok=True)
+            made_dirs.add(dest_dir)
+        place_file(entry.path, dest_file, link)
+        stats.copied += 1
+        stats.copied_bytes += src_stat.st_size
+
+    if delete:
+        for rel_path in previous - synced:
+            stale_path = os.path.join(dest_path, rel_path)
+            try:
+                os.remove(stale_path)
+            except FileNotFoundError:
+                continue
+            stats.removed += 1
+            remove_empty_dirs(os.path.dirname(stale_path), dest_path)
+
+    save_synced(dest_path, synced)
+    return stats
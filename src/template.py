@@ -0,0 +1,177 @@
+"""
+This module contains the compiled page template.
+"""
+import hashlib
+import json
+import os
+import re
+
+SLOT_PATTERN = re.compile(r"\{\{\s*(>\s*)?([\w./-]+)\s*\}\}")
+URL_ATTRIBUTE_PATTERN = re.compile(r"""(\b(?:src|href)\s*=\s*["'])([^"']*)""")
+
+
+class TemplateError(Exception):
+    """Raised when a template cannot be compiled."""
+
+
+class Template:
+    """A template compiled into literal segments and named slots.
+
+    `{{ Name }}` is a slot filled from the variables passed to render, and
+    `{{> file.html }}` includes another template file, relative to the
+    including one, at compile time. Literals are plain strings and slots are
+    1-tuples, so a compiled template pickles cheaply for worker processes.
+    """
+    __slots__ = ("path", "segments", "dependencies", "digest")
+
+    def __init__(self, path, segments, dependencies, digest):
+        self.path = path
+        self.segments = segments
+        self.dependencies = dependencies
+        self.digest = digest
+
+    @classmethod
+    def compile(cls, path):
+        digest = hashlib.sha256()
+        dependencies = []
+        segments = compile_file(os.path.abspath(path), digest, dependencies, ())
+        return cls(path, merge_literals(segments), dependencies, digest.hexdigest())
+
+    @classmethod
+    def from_string(cls, text, path="<string>"):
+        """Compile template text held in memory; includes are resolved relative to path's directory."""
+        digest = hashlib.sha256()
+        dependencies = []
+        segments = compile_text(text, os.path.abspath(path), digest, dependencies, ())
+        return cls(path, merge_literals(segments), dependencies, digest.hexdigest())
+
+    @property
+    def slots(self):
+        return [segment[0] for segment in self.segments if isinstance(segment, tuple)]
+
+    def render(self, variables):
+        """Return the rendered template as one string."""
+        return "".join(
+            segment if isinstance(segment, str) else render_value(variables.get(segment[0], ""))
+            for segment in self.segments
+        )
+
+    def render_to(self, writer, variables):
+        """Write the rendered template to writer, streaming HtmlNode values without building them first."""
+        for segment in self.segments:
+            if isinstance(segment, str):
+                writer.write(segment)
+                continue
+            value = variables.get(segment[0], "")
+            if hasattr(value, "write_html"):
+                value.write_html(writer)
+            else:
+                writer.write(str(value))
+
+    def with_asset_urls(self, urls):
+        """Return a copy whose literal src and href attributes point at fingerprinted asset urls.
+
+        The digest covers the urls too, so pages are rebuilt when an asset changes.
+        """
+        if not urls:
+            return self
+        segments = [rewrite_urls(segment, urls) if isinstance(segment, str) else segment for segment in self.segments]
+        digest = hashlib.sha256((self.digest + json.dumps(urls, sort_keys=True)).encode()).hexdigest()
+        return Template(self.path, segments, self.dependencies, digest)
+
+    def bind(self, variables):
+        """Return a copy with the slots named in variables rendered into literals once.
+
+        Pages rendered with the copy get those values without serializing them
+        again, and the digest covers them, so pages are rebuilt when they change.
+        """
+        values = {name: render_value(value) for name, value in variables.items()}
+        segments = merge_literals([
+            values[segment[0]] if isinstance(segment, tuple) and segment[0] in values else segment
+            for segment in self.segments
+        ])
+        digest = hashlib.sha256((self.digest + json.dumps(values, sort_keys=True)).encode()).hexdigest()
+        return Template(self.path, segments, self.dependencies, digest)
+
+    def is_fresh(self):
+        """Check that no file this template was compiled from has changed since."""
+        for path, mtime_ns, size in self.dependencies:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return False
+            if stat.st_mtime_ns != mtime_ns or stat.st_size != size:
+                return False
+        return True
+
+
+def rewrite_urls(text, urls):
+    """Replace every src or href attribute value in text that urls maps."""
+    return URL_ATTRIBUTE_PATTERN.sub(lambda match: match.group(1) + urls.get(match.group(2), match.group(2)), text)
+
+
+def render_value(value):
+    if hasattr(value, "to_html"):
+        return value.to_html()
+    return str(value)
+
+
+def compile_file(path, digest, dependencies, including):
+    if path in including:
+        raise TemplateError(f"Template include cycle: {' -> '.join(including + (path,))}")
+
+    stat = os.stat(path)
+    with open(path, "r") as f:
+        text = f.read()
+    dependencies.append((path, stat.st_mtime_ns, stat.st_size))
+    return compile_text(text, path, digest, dependencies, including)
+
+
+def compile_text(text, path, digest, dependencies, including):
+    digest.update(text.encode())
+    segments = []
+    position = 0
+    for match in SLOT_PATTERN.finditer(text):
+        segments.append(text[position:match.start()])
+        if match.group(1):
+            partial_path = os.path.join(os.path.dirname(path), match.group(2))
+            segments.extend(compile_file(partial_path, digest, dependencies, including + (path,)))
+        else:
+            segments.append((match.group(2),))
+        position = match.end()
+    segments.append(text[position:])
+    return segments
+
+
+def merge_literals(segments):
+    """Join adjacent literals (left behind by includes) and drop empty ones."""
+    merged = []
+    for segment in segments:
+        if isinstance(segment, str):
+            if not segment:
+                continue
+            if merged and isinstance(merged[-1], str):
+                merged[-1] += segment
+                continue
+        merged.append(segment)
+    return merged
+
+
+_cache = {}
+
+
+def load_template(path):
+    """Return the compiled template for path, reusing it until one of its files changes."""
+    key = os.path.abspath(path)
+    template = _cache.get(key)
+    if template is None or not template.is_fresh():
+        template = Template.compile(path)
+        _cache[key] = template
+    return template
+
+
+def as_template(template):
+    """Accept a compiled Template or a template path."""
+    if isinstance(template, Template):
+        return template
+    return load_template(template)
@@ -0,0 +1,84 @@
+"""
+Test the BlockCache class.
+"""
+import os
+import pickle
+import unittest
+
+from blockcache import BlockCache
+from testutil import TempDirTestCase
+from textnode import markdown_to_html_node
+
+MARKDOWN = """# Heading
+
+A paragraph with **bold**, *italic* and a [link](/majesty).
+
+* one
+* two
+
+```
+code
+```
+
+A paragraph with **bold**, *italic* and a [link](/majesty)."""
+
+
+class TestBlockCache(TempDirTestCase):
+    """Test the BlockCache class."""
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "blocks.sqlite")
+
+    def test_rendered_html_unchanged(self):
+        """Test that cached and uncached rendering produce the same HTML."""
+        cache = BlockCache()
+        expected = markdown_to_html_node(MARKDOWN).to_html()
+        self.assertEqual(markdown_to_html_node(MARKDOWN, cache).to_html(), expected)
+        self.assertEqual(markdown_to_html_node(MARKDOWN, cache).to_html(), expected)
+
+    def test_hit_counts(self):
+        """Test that repeated blocks are hits and new blocks are misses."""
+        cache = BlockCache()
+        markdown_to_html_node(MARKDOWN, cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        markdown_to_html_node(MARKDOWN, cache)
+        self.assertEqual((cache.hits, cache.misses), (6, 4))
+        self.assertEqual(cache.summary(), "6 hits, 4 misses (60.0% hit rate)")
+
+    def test_lru_eviction(self):
+        """Test that the least recently used block is evicted first."""
+        cache = BlockCache(max_entries=2)
+        cache.put("a", "<p>a</p>")
+        cache.put("b", "<p>b</p>")
+        cache.get("a")
+        cache.put("c", "<p>c</p>")
+        self.assertEqual(cache.get("a"), "<p>a</p>")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "<p>c</p>")
+
+    def test_persists_between_instances(self):
+        """Test that flushed blocks are found by a later cache on the same file."""
+        cache = BlockCache(path=self.path)
+        markdown_to_html_node(MARKDOWN, cache)
+        cache.close()
+
+        cache = BlockCache(path=self.path)
+        markdown_to_html_node(MARKDOWN, cache)
+        self.assertEqual(cache.misses, 0)
+        cache.close()
+
+    def test_pickle(self):
+        """Test that a pickled cache reopens its file and starts empty in memory."""
+        cache = BlockCache(max_entries=8, path=self.path)
+        cache.put("a", "<p>a</p>")
+        cache.flush()
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(copy.max_entries, 8)
+        self.assertEqual(copy.get("a"), "<p>a</p>")
+        self.assertEqual((copy.hits, copy.misses), (1, 0))
+        cache.close()
+        copy.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Test the compress_outputs function.
+"""
+import gzip
+import os
+import unittest
+
+from compress import MIN_SIZE, compress_outputs
+from testutil import TempDirTestCase
+
+
+class TestCompress(TempDirTestCase):
+    """Test the compress_outputs function."""
+    def setUp(self):
+        super().setUp()
+        self.output_dir = self.tmp.name
+        self.page = self.write("majesty/index.html", "<p>majesty</p>" * 100)
+        self.write("index.css", "body {}" * 100)
+        self.write("tiny.html", "<p></p>")
+        self.write("images/photo.png", "png" * 1000)
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.output_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_compress_outputs(self):
+        """Test that compressible files get a gzip sibling and others do not."""
+        written, removed = compress_outputs(self.output_dir, jobs=2)
+        self.assertEqual(removed, 0)
+        self.assertGreaterEqual(written, 2)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>majesty</p>" * 100)
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "index.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "tiny.html.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "images", "photo.png.gz")))
+        self.assertEqual(os.stat(self.page + ".gz").st_mtime_ns, os.stat(self.page).st_mtime_ns)
+
+    def test_only_changed_files(self):
+        """Test that a second run only recompresses the file that changed."""
+        compress_outputs(self.output_dir)
+        self.assertEqual(compress_outputs(self.output_dir), (0, 0))
+
+        self.write("index.css", "body { color: red }" * 100)
+        written, _ = compress_outputs(self.output_dir)
+        self.assertEqual(written, len([name for name in os.listdir(self.output_dir) if name.startswith("index.css.")]))
+
+    def test_deterministic(self):
+        """Test that recompressing identical content yields identical bytes."""
+        compress_outputs(self.output_dir)
+        with open(self.page + ".gz", "rb") as f:
+            first = f.read()
+        os.remove(self.page + ".gz")
+        compress_outputs(self.output_dir)
+        with open(self.page + ".gz", "rb") as f:
+            self.assertEqual(f.read(), first)
+
+    def test_removes_orphans(self):
+        """Test that siblings of deleted sources are removed, but shipped archives are kept."""
+        archive = self.write("downloads/data.tar.gz", "archive")
+        compress_outputs(self.output_dir)
+        os.remove(self.page)
+        self.write("index.css", "x" * (MIN_SIZE - 1))
+
+        _, removed = compress_outputs(self.output_dir)
+        self.assertGreaterEqual(removed, 2)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "index.css.gz")))
+        self.assertTrue(os.path.exists(archive))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Test the build daemon and its client.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+from client import DEFAULT_SOCKET, parse_args, request_build
+from testutil import TempDirTestCase, write_file
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestBuildDaemon(TempDirTestCase):
+    """Test builds requested from a daemon running in another process."""
+    def setUp(self):
+        super().setUp()
+        self.site = self.tmp.name
+        write_file(os.path.join(self.site, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        write_file(os.path.join(self.site, "content", "index.md"), "# Home\n\nHello **there**.")
+        write_file(os.path.join(self.site, "static", "index.css"), "body {}")
+
+        self.socket = os.path.join(self.site, "daemon.sock")
+        self.daemon = subprocess.Popen(
+            [sys.executable, os.path.join(SRC, "main.py"), "--daemon", "--socket", self.socket],
+            cwd=self.site, stdout=subprocess.DEVNULL,
+        )
+        self.addCleanup(self.stop)
+        deadline = time.monotonic() + 10
+        while not os.path.exists(self.socket):
+            self.assertLess(time.monotonic(), deadline, "daemon did not start")
+            time.sleep(0.02)
+
+    def stop(self):
+        self.daemon.terminate()
+        self.daemon.wait()
+
+    def build(self, *argv):
+        previous = os.getcwd()
+        os.chdir(self.site)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()) as err:
+                code = request_build(self.socket, list(argv))
+        finally:
+            os.chdir(previous)
+        return code, out.getvalue(), err.getvalue()
+
+    def test_builds(self):
+        """Test that builds run in the client's directory and keep the block cache warm"""
+        code, out, _ = self.build("--force")
+        self.assertEqual(code, 0)
+        self.assertIn("Generating page", out)
+        with open(os.path.join(self.site, "public", "index.html")) as f:
+            self.assertEqual(f.read(), "<title>Home</title><div><h1>Home</h1><p>Hello <b>there</b>.</p></div>")
+
+        code, out, _ = self.build()
+        self.assertEqual(code, 0)
+        self.assertIn("Block cache: 2 hits, 0 misses", out)
+
+        code, out, _ = self.build()
+        self.assertIn("Skipping 1 unchanged page(s)", out)
+
+    def test_errors(self):
+        """Test that failures and unsupported options are reported with an exit code"""
+        code, _, err = self.build("--watch")
+        self.assertEqual(code, 2)
+        self.assertIn("--watch", err)
+
+        write_file(os.path.join(self.site, "content", "index.md"), "no heading")
+        write_file(os.path.join(self.site, "content", "other.md"), "no heading either")
+        code, _, err = self.build("--jobs", "2", "--force")
+        self.assertEqual(code, 1)
+        self.assertIn("failed to render", err)
+
+    def test_stopped_daemon(self):
+        """Test that the socket is removed on shutdown and the client reports no daemon"""
+        self.stop()
+        self.assertFalse(os.path.exists(self.socket))
+        self.assertIsNone(request_build(self.socket, []))
+
+
+class TestClient(unittest.TestCase):
+    """Test the client's command line."""
+    def test_parse_args(self):
+        """Test that --socket is taken from anywhere in argv and everything else is passed on"""
+        self.assertEqual(parse_args(["--force"]), (DEFAULT_SOCKET, ["--force"]))
+        self.assertEqual(parse_args(["--force", "--socket", "x", "-j", "2"]), ("x", ["--force", "-j", "2"]))
+        self.assertEqual(parse_args(["--socket=x", "--search"]), ("x", ["--search"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Test asset fingerprinting.
+"""
+import contextlib
+import io
+import os
+import unittest
+
+from blockcache import BlockCache
+from fingerprint import FINGERPRINTS_NAME, fingerprint_assets, remove_fingerprints
+from main import generate_pages_recursive
+from manifest import hash_file
+from template import Template
+from testutil import TempDirTestCase, write_file
+from textnode import TEXT_TYPE_IMAGE, TEXT_TYPE_LINK, AssetUrls, TextNode, markdown_to_html_node, text_node_to_html_node
+
+
+class TestFingerprint(TempDirTestCase):
+    """Test fingerprint_assets and the rewriting of asset urls."""
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "photo.png"), "png")
+
+    def test_fingerprint_assets(self):
+        """Test that assets get content-hashed copies and stale copies are removed"""
+        css_hash = hash_file(os.path.join(self.static, "index.css"))[:10]
+        urls = fingerprint_assets(self.static, self.public)
+        self.assertEqual(urls["/index.css"], f"/index.{css_hash}.css")
+        self.assertTrue(urls["/images/photo.png"].startswith("/images/photo."))
+        with open(os.path.join(self.public, f"index.{css_hash}.css")) as f:
+            self.assertEqual(f.read(), "body {}")
+
+        self.assertEqual(fingerprint_assets(self.static, self.public), urls)
+
+        write_file(os.path.join(self.static, "index.css"), "body { color: red }")
+        changed = fingerprint_assets(self.static, self.public)
+        self.assertNotEqual(changed["/index.css"], urls["/index.css"])
+        self.assertFalse(os.path.exists(os.path.join(self.public, f"index.{css_hash}.css")))
+
+        remove_fingerprints(self.public)
+        self.assertEqual(os.listdir(self.public), [])
+        self.assertFalse(os.path.exists(os.path.join(self.public, FINGERPRINTS_NAME)))
+
+    def test_rewrite_template(self):
+        """Test that src and href attributes in template literals are rewritten and the digest changes"""
+        path = os.path.join(self.tmp.name, "template.html")
+        write_file(path, '<link href="/index.css"><img src=\'/a.png\'><a href="/other">{{ Content }}</a>')
+        template = Template.compile(path)
+        rewritten = template.with_asset_urls({"/index.css": "/index.1.css", "/a.png": "/a.2.png"})
+        self.assertEqual(
+            rewritten.render({"Content": "x"}),
+            '<link href="/index.1.css"><img src=\'/a.2.png\'><a href="/other">x</a>',
+        )
+        self.assertNotEqual(rewritten.digest, template.digest)
+        self.assertIs(template.with_asset_urls({}), template)
+
+    def test_rewrite_text_nodes(self):
+        """Test that image and link urls are rewritten and cached blocks are keyed by the urls"""
+        urls = AssetUrls({"/a.png": "/a.1.png"})
+        self.assertEqual(
+            text_node_to_html_node(TextNode("a", TEXT_TYPE_IMAGE, "/a.png"), urls).to_html(),
+            '<img src="/a.1.png" alt="a"></img>',
+        )
+        self.assertEqual(
+            text_node_to_html_node(TextNode("b", TEXT_TYPE_LINK, "/b.png"), urls).to_html(),
+            '<a href="/b.png">b</a>',
+        )
+        self.assertEqual(
+            text_node_to_html_node(TextNode("a", TEXT_TYPE_IMAGE, "/a.png")).to_html(),
+            '<img src="/a.png" alt="a"></img>',
+        )
+
+        # One cache serves both mappings without mixing up their fragments.
+        cache = BlockCache()
+        self.assertNotEqual(cache.key("![a](/a.png)", urls.digest), cache.key("![a](/a.png)"))
+        for _ in range(2):
+            self.assertIn("/a.1.png", markdown_to_html_node("![a](/a.png)", cache, asset_urls=urls).to_html())
+            self.assertNotIn("/a.1.png", markdown_to_html_node("![a](/a.png)", cache).to_html())
+        self.assertEqual(cache.hits, 2)
+
+    def test_generate_pages(self):
+        """Test that serial and parallel builds point pages and the template at fingerprinted assets"""
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        write_file(template, '<link href="/index.css">{{ Content }}')
+        for i in range(3):
+            write_file(os.path.join(content, f"page{i}", "index.md"), f"# Page {i}\n\n![photo](/images/photo.png)")
+        urls = fingerprint_assets(self.static, self.public)
+
+        for jobs in (1, 3):
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content, template, self.public, jobs, asset_urls=urls)
+            with open(os.path.join(self.public, "page2", "index.html")) as f:
+                html = f.read()
+            self.assertIn(f'href="{urls["/index.css"]}"', html)
+            self.assertIn(f'src="{urls["/images/photo.png"]}"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 """
 Test the HtmlNode class.
 """
+import io
 import unittest
 
 from htmlnode import HtmlNode, LeafNode, ParentNode
@@ -87,6 +88,39 @@ class TestHtmlNode(unittest.TestCase):
         self.assertEqual(node.to_html(), "<p><b>Bold text</b>Normal text<i>italic text</i>Normal text</p>")
         self.assertEqual(node2.to_html(), "<html><b class=\"text-white\">Bold text</b>Normal text<i>italic text</i><body>Normal text</body></html>")
 
+    def test_write_html(self):
+        """Test that write_html streams the same HTML as to_html."""
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("b", "Bold text"), LeafNode(None, "Normal text")]),
+                LeafNode("a", "link", {"href": "https://www.boot.dev"}),
+            ],
+        )
+        writer = io.StringIO()
+        node.write_html(writer, buffer_size=1)
+        self.assertEqual(writer.getvalue(), node.to_html())
+        self.assertEqual("".join(node.iter_html()), node.to_html())
+
+    def test_deep_tree(self):
+        """Test that serializing a very deep tree does not recurse."""
+        node = LeafNode(None, "leaf")
+        for _ in range(10000):
+            node = ParentNode("span", [node])
+        self.assertEqual(node.to_html(), "<span>" * 10000 + "leaf" + "</span>" * 10000)
+
+    def test_parent_node_no_children(self):
+        """Test that a parent without children raises when serialized."""
+        node = ParentNode("div", [ParentNode("p", None)])
+        self.assertRaises(ValueError, node.to_html)
+
+    def test_slots(self):
+        """Test that nodes are slotted and store props as tuples."""
+        node = LeafNode("a", "link", {"href": "https://www.boot.dev"})
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(ParentNode("p", [node]), "__dict__"))
+        self.assertEqual(node.props, (("href", "https://www.boot.dev"),))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,12 +1,19 @@
 """
 Test the Main class.
 """
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import time
 import unittest
+from unittest import mock
 
 from textnode import TextNode
 from htmlnode import LeafNode
 
-from main import (
+from textnode import (
     text_node_to_html_node,
     split_nodes_delimiter,
     extract_markdown_images,
@@ -15,8 +22,13 @@ from main import (
     split_nodes_link,
     text_to_textnodes,
     markdown_to_blocks,
-    block_to_block_type
+    block_to_block_type,
+    markdown_to_html_node
 )
+import main
+from main import PageError, discover_pages, generate_pages_recursive
+from report import BuildReport
+from testutil import TempDirTestCase, read_file, write_file
 
 
 class TestMain(unittest.TestCase):
@@ -120,6 +132,34 @@ class TestMain(unittest.TestCase):
             ]
         )
 
+    def test_text_to_textnodes_literal_delimiters(self):
+        """Test that unmatched delimiters and markup inside code stay literal"""
+        self.assertEqual(text_to_textnodes("2 * 3 = 6"), [TextNode("2 * 3 = 6", "text")])
+        self.assertEqual(text_to_textnodes("run `a*b*c` now"), [
+                TextNode("run ", "text"),
+                TextNode("a*b*c", "code"),
+                TextNode(" now", "text"),
+            ]
+        )
+        self.assertEqual(text_to_textnodes("[broken](link\n) [ok](x)"), [
+                TextNode("[broken](link\n) ", "text"),
+                TextNode("ok", "link", "x"),
+            ]
+        )
+
+    def test_text_to_textnodes_scales_linearly(self):
+        """Test that tokenizing grows linearly with the number of links"""
+        def elapsed(links):
+            text = "see [link](https://example.com) and " * links
+            start = time.perf_counter()
+            nodes = text_to_textnodes(text)
+            self.assertEqual(len(nodes), links * 2 + 1)
+            return time.perf_counter() - start
+
+        small = min(elapsed(1_000) for _ in range(3))
+        large = min(elapsed(10_000) for _ in range(3))
+        self.assertLess(large, small * 30)
+
     def test_markdown_to_blocks(self):
         """Test the markdown_to_blocks function"""
         markdown = """
@@ -191,5 +231,211 @@ class TestMain(unittest.TestCase):
 
         self.assertEqual(block_types, ["heading", "paragraph", "unordered_list", "ordered_list", "code", "quote", "unordered_list"])
 
+    def test_ordered_list_numbering(self):
+        """Test that ordered lists must be numbered from 1 without gaps"""
+        self.assertEqual(block_to_block_type("1. first\n2. second\n3. third"), "ordered_list")
+        self.assertEqual(block_to_block_type("1. first\n3. third"), "paragraph")
+        self.assertEqual(block_to_block_type("2. second"), "paragraph")
+
+    def test_markdown_to_html_node(self):
+        """Test that each block is rendered by the builder for its type"""
+        markdown = "# Title\n\nSome *text*\n\n* one\n* two\n\n1. first\n2. second"
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            "<div><h1>Title</h1><p>Some <i>text</i></p>"
+            "<ul><li>one</li><li>two</li></ul><ol><li>first</li><li>second</li></ol></div>",
+        )
+
+TEMPLATE = "<title>{{ Title }}</title><article>{{ Content }}</article>"
+
+
+def read_tree(root):
+    """Return {relative path: bytes} for every file under root"""
+    tree = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root)] = f.read()
+    return tree
+
+
+class TestGeneratePages(TempDirTestCase):
+    """Test page discovery and serial/parallel generation."""
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        write_file(self.template, TEMPLATE)
+        for i in range(12):
+            write_file(
+                os.path.join(self.content, f"section{i % 3}", f"page{i}", "index.md"),
+                f"# Page {i}\n\nSome **bold** text and a [link](/page{i}).",
+            )
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n* one\n* two")
+
+    def build(self, jobs):
+        public = os.path.join(self.tmp.name, f"public-{jobs}")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content, self.template, public, jobs)
+        return public
+
+    def test_discover_pages(self):
+        """Test that pages are discovered in sorted order with their destination directories"""
+        public = os.path.join(self.tmp.name, "public")
+        pages = discover_pages(self.content, public)
+        self.assertEqual(len(pages), 13)
+        self.assertEqual(pages[0], (os.path.join(self.content, "index.md"), public))
+        self.assertEqual(pages, sorted(pages))
+
+    def test_parallel_matches_serial(self):
+        """Test that a parallel build is byte-identical to a serial build"""
+        serial = read_tree(self.build(1))
+        parallel = read_tree(self.build(4))
+        self.assertEqual(len(serial), 13)
+        self.assertEqual(serial, parallel)
+
+    def test_page_error(self):
+        """Test that a failing page is reported without stopping the other pages, serially or not"""
+        write_file(os.path.join(self.content, "broken", "index.md"), "no heading here")
+        for jobs in (1, 3):
+            with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                with self.assertRaises(PageError) as error:
+                    self.build(jobs)
+            self.assertIn("broken", str(error.exception))
+            self.assertIn("No heading", stderr.getvalue())
+            self.assertEqual(len(read_tree(os.path.join(self.tmp.name, f"public-{jobs}"))), 13)
+
+    def test_incremental_build(self):
+        """Test that an incremental build skips, rebuilds and removes the right pages"""
+        public = os.path.join(self.tmp.name, "public")
+
+        def build():
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                generate_pages_recursive(self.content, self.template, public, incremental=True)
+            return out.getvalue().count("Generating page")
+
+        self.assertEqual(build(), 13)
+        first = read_tree(public)
+        self.assertEqual(build(), 0)
+
+        write_file(os.path.join(self.content, "section0", "page0", "index.md"), "# Changed")
+        os.remove(os.path.join(self.content, "section1", "page1", "index.md"))
+        self.assertEqual(build(), 1)
+        tree = read_tree(public)
+        self.assertNotIn(os.path.join("section1", "page1", "index.html"), tree)
+        self.assertIn("<title>Changed</title>", tree[os.path.join("section0", "page0", "index.html")].decode())
+
+        write_file(self.template, TEMPLATE + "<footer></footer>")
+        self.assertEqual(build(), 12)
+        self.assertNotEqual(read_tree(public)["index.html"], first["index.html"])
+
+    def test_incremental_shared_output(self):
+        """Test that deleting a page that shared an output rebuilds the page that remains"""
+        public = os.path.join(self.tmp.name, "public")
+        write_file(os.path.join(self.content, "new.md"), "# New")
+        for _ in range(2):
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(self.content, self.template, public, incremental=True)
+            self.assertIn("<title>New</title>", read_file(os.path.join(public, "index.html")))
+
+        os.remove(os.path.join(self.content, "new.md"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content, self.template, public, incremental=True)
+        self.assertIn("<title>Home</title>", read_file(os.path.join(public, "index.html")))
+
+    def test_build_report(self):
+        """Test that a timed build reports every page and writes the same output"""
+        for jobs in (1, 3):
+            report = BuildReport(slowest=2)
+            public = os.path.join(self.tmp.name, f"public-report-{jobs}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(self.content, self.template, public, jobs, report=report)
+            self.assertEqual(read_tree(public), read_tree(self.build(1)))
+
+            data = report.to_dict()
+            self.assertEqual(data["pages"], 13)
+            self.assertEqual(len(data["page_timings"]), 13)
+            self.assertEqual(len(data["slowest"]), 2)
+            self.assertGreaterEqual(data["slowest"][0]["seconds"], data["slowest"][1]["seconds"])
+            self.assertEqual(
+                set(data["stages"]),
+                {"read", "title", "description", "blocks", "inline", "render", "template", "write"},
+            )
+            self.assertEqual(data["bytes_written"], sum(len(html) for html in read_tree(public).values()))
+
+    def test_streamed_pages_match(self):
+        """Test that pages rendered block by block are identical to pages read whole"""
+        write_file(self.template, "{{ Title }}|{{ Date }}|{{ Description }}|{{ Content }}")
+        write_file(
+            os.path.join(self.content, "index.md"),
+            "Intro with no heading.\n\n\n\n## Sub **title**\n\n* one\n* two\n\n```\ncode\n```",
+        )
+        with mock.patch.object(main, "READ_SIZE", 3), mock.patch.object(main, "STREAM_THRESHOLD", 0):
+            streamed = read_tree(self.build(1))
+        os.rename(os.path.join(self.tmp.name, "public-1"), os.path.join(self.tmp.name, "streamed"))
+        self.assertEqual(streamed, read_tree(self.build(1)))
+        self.assertIn(b"Sub **title**|", streamed["index.html"])
+
+    def test_page_variables(self):
+        """Test that Date and Description are available to the template"""
+        write_file(self.template, "{{ Date }}|{{ Description }}")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nA \"quoted\" *intro*\nparagraph.\n\nMore.")
+        noon = 86400 * 365 + 43200
+        os.utime(os.path.join(self.content, "index.md"), (noon, noon))
+        public = self.build(1)
+        with open(os.path.join(public, "index.html")) as f:
+            self.assertEqual(f.read(), "1971-01-01|A &quot;quoted&quot; intro paragraph.")
+
+
+class TestAdversarialBlocks(unittest.TestCase):
+    """Pathological documents must render in bounded time."""
+    TIME_LIMIT = 10
+
+    def assert_renders_within_limit(self, build_markdown):
+        """Render the markdown built by the snippet in a subprocess killed at TIME_LIMIT"""
+        script = (
+            "from textnode import markdown_to_html_node\n"
+            f"markdown = {build_markdown}\n"
+            "markdown_to_html_node(markdown).to_html()\n"
+        )
+        try:
+            subprocess.run(
+                [sys.executable, "-c", script],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                check=True,
+                timeout=self.TIME_LIMIT,
+            )
+        except subprocess.TimeoutExpired:
+            self.fail(f"rendering took longer than {self.TIME_LIMIT}s: {build_markdown}")
+
+    def test_unterminated_fence(self):
+        """Test a 100k-line fenced block that is never closed"""
+        self.assert_renders_within_limit("'```\\n' + 'x = 1\\n' * 100_000")
+
+    def test_long_ordered_list(self):
+        """Test a 100k-item ordered list"""
+        self.assert_renders_within_limit("'\\n'.join(f'{i}. item' for i in range(1, 100_001))")
+
+    def test_long_ordered_list_broken_at_end(self):
+        """Test a 100k-item ordered list whose last number is wrong"""
+        self.assert_renders_within_limit("'\\n'.join(f'{i}. item' for i in range(1, 100_001)) + '\\n1. again'")
+
+    def test_many_fences(self):
+        """Test a block made of nothing but fence markers"""
+        self.assert_renders_within_limit("'`' * 300_000")
+
+    def test_unclosed_brackets(self):
+        """Test a line full of link openers that never close"""
+        self.assert_renders_within_limit("'[a](' * 100_000")
+
+    def test_block_types(self):
+        """Test classification of adversarial blocks"""
+        self.assertEqual(block_to_block_type("```\n" + "x\n" * 100_000), "paragraph")
+        self.assertEqual(block_to_block_type("```\n" + "x\n" * 100_000 + "```"), "code")
+        self.assertEqual(block_to_block_type("```"), "paragraph")
+        self.assertEqual(block_to_block_type("\n".join(f"{i}. item" for i in range(1, 100_001))), "ordered_list")
+
+
 if __name__ == "__main__":
     unittest.main()
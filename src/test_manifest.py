@@ -0,0 +1,153 @@
+"""
+Test the Manifest class.
+"""
+import os
+import unittest
+
+from manifest import Manifest, MANIFEST_NAME, OutputIndex, hash_file
+from testutil import TempDirTestCase
+
+
+class TestManifest(TempDirTestCase):
+    """Test the Manifest class."""
+    def setUp(self):
+        super().setUp()
+        self.output_dir = os.path.join(self.tmp.name, "public")
+        self.source = os.path.join(self.tmp.name, "index.md")
+        with open(self.source, "w") as f:
+            f.write("# Home")
+
+    def test_save_and_load(self):
+        """Test that a saved manifest loads back with the same entries."""
+        manifest = Manifest(self.output_dir)
+        manifest.set_template("abc")
+        fingerprint = manifest.fingerprint("index.md", self.source)
+        manifest.record("index.md", fingerprint, "index.html")
+        manifest.save()
+
+        loaded = Manifest.load(self.output_dir)
+        self.assertEqual(loaded.template_hash, "abc")
+        self.assertEqual(loaded.pages, manifest.pages)
+        self.assertEqual(loaded.pages["index.md"]["hash"], hash_file(self.source))
+
+    def test_reload_in_same_process(self):
+        """Test that a remembered manifest is copied, and re-read once the file changes."""
+        manifest = Manifest(self.output_dir)
+        manifest.record("index.md", manifest.fingerprint("index.md", self.source), "index.html")
+        manifest.save()
+
+        loaded = Manifest.load(self.output_dir)
+        loaded.remove_stale([])
+        self.assertIn("index.md", Manifest.load(self.output_dir).pages)
+
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), "w") as f:
+            f.write('{"version": 1, "template": "def", "pages": {}}')
+        self.assertEqual(Manifest.load(self.output_dir).template_hash, "def")
+
+    def test_load_missing_or_corrupt(self):
+        """Test that a missing or corrupt manifest loads as empty."""
+        self.assertEqual(Manifest.load(self.output_dir).pages, {})
+        os.makedirs(self.output_dir)
+        with open(os.path.join(self.output_dir, MANIFEST_NAME), "w") as f:
+            f.write("{not json")
+        self.assertEqual(Manifest.load(self.output_dir).pages, {})
+
+    def test_template_change_forgets_pages(self):
+        """Test that a new template hash invalidates every page."""
+        manifest = Manifest(self.output_dir, "abc", {"index.md": {}})
+        manifest.set_template("abc")
+        self.assertEqual(len(manifest.pages), 1)
+        manifest.set_template("def")
+        self.assertEqual(manifest.pages, {})
+
+    def test_fingerprint_reuses_hash(self):
+        """Test that an unchanged stat reuses the recorded hash instead of rehashing."""
+        manifest = Manifest(self.output_dir)
+        fingerprint = manifest.fingerprint("index.md", self.source)
+        manifest.record("index.md", dict(fingerprint, hash="recorded"), "index.html")
+        self.assertEqual(manifest.fingerprint("index.md", self.source)["hash"], "recorded")
+
+    def test_is_current(self):
+        """Test that a page is current only if its hash matches and its output exists."""
+        manifest = Manifest(self.output_dir)
+        fingerprint = manifest.fingerprint("index.md", self.source)
+        manifest.record("index.md", fingerprint, "index.html")
+        self.assertFalse(manifest.is_current("index.md", fingerprint, "index.html"))
+
+        os.makedirs(self.output_dir)
+        open(os.path.join(self.output_dir, "index.html"), "w").close()
+        self.assertTrue(manifest.is_current("index.md", fingerprint, "index.html"))
+        self.assertFalse(manifest.is_current("index.md", dict(fingerprint, hash="new"), "index.html"))
+
+    def test_remove_stale(self):
+        """Test that outputs of deleted sources are removed along with empty directories."""
+        output = os.path.join(self.output_dir, "old", "index.html")
+        os.makedirs(os.path.dirname(output))
+        open(output, "w").close()
+        manifest = Manifest(self.output_dir, pages={
+            "old/index.md": {"output": "old/index.html"},
+            "index.md": {"output": "index.html"},
+        })
+
+        self.assertEqual(manifest.remove_stale(["index.md"]), [output])
+        self.assertEqual(list(manifest.pages), ["index.md"])
+        self.assertFalse(os.path.exists(os.path.dirname(output)))
+        self.assertTrue(os.path.exists(self.output_dir))
+
+    def test_remove_stale_shared_output(self):
+        """Test that sources sharing a removed source's output are forgotten so they render again."""
+        output = os.path.join(self.output_dir, "index.html")
+        os.makedirs(self.output_dir)
+        open(output, "w").close()
+        manifest = Manifest(self.output_dir, pages={
+            "index.md": {"output": "index.html"},
+            "new.md": {"output": "index.html"},
+            "about.md": {"output": "about/index.html"},
+        })
+
+        self.assertEqual(manifest.remove_stale(["index.md", "about.md"]), [])
+        self.assertTrue(os.path.exists(output))
+        self.assertEqual(list(manifest.pages), ["about.md"])
+
+    def test_start_build_with_new_template(self):
+        """Test that a template change still removes the outputs of deleted sources."""
+        output = os.path.join(self.output_dir, "old", "index.html")
+        os.makedirs(os.path.dirname(output))
+        open(output, "w").close()
+        manifest = Manifest(self.output_dir, "abc", {"old/index.md": {"output": "old/index.html"}})
+
+        self.assertEqual(manifest.start_build([], "def"), [output])
+        self.assertFalse(os.path.exists(output))
+        self.assertEqual((manifest.template_hash, manifest.pages), ("def", {}))
+
+
+class TestOutputIndex(TempDirTestCase):
+    """Test the OutputIndex class."""
+    def setUp(self):
+        super().setUp()
+        self.output_dir = self.tmp.name
+        os.makedirs(os.path.join(self.output_dir, "majesty"))
+        for name in ("index.html", "majesty/index.html", ".manifest.json"):
+            with open(os.path.join(self.output_dir, name), "w") as f:
+                f.write(name)
+
+    def test_refresh(self):
+        """Test that refresh hashes new files, skips dotfiles and reports only real changes."""
+        index = OutputIndex(self.output_dir)
+        self.assertEqual(sorted(index.refresh()), ["index.html", "majesty/index.html"])
+        index.save()
+
+        index = OutputIndex.load(self.output_dir)
+        self.assertEqual(index.refresh(), [])
+
+        path = os.path.join(self.output_dir, "index.html")
+        with open(path, "w") as f:
+            f.write("changed")
+        os.remove(os.path.join(self.output_dir, "majesty", "index.html"))
+        self.assertEqual(index.refresh(), ["index.html"])
+        self.assertEqual(list(index.files), ["index.html"])
+        self.assertEqual(index.lookup("index.html", os.stat(path)), hash_file(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
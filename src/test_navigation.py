@@ -0,0 +1,104 @@
+"""
+Test site metadata, navigation and listing pages.
+"""
+import contextlib
+import io
+import os
+import unittest
+
+from main import generate_pages_recursive
+from navigation import (
+    METADATA_NAME,
+    PageMeta,
+    collect_metadata,
+    page_metadata,
+    render_nav,
+    section_range,
+    sections,
+    write_listings,
+)
+from template import Template
+from testutil import TempDirTestCase, read_file, write_file
+from util import write_json
+
+
+def meta(url, title=None):
+    return PageMeta(url, title or url, 0, 1)
+
+
+class TestNavigation(TempDirTestCase):
+    """Test the metadata table and what is rendered from it."""
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        write_file(self.template, "{{ Nav }}<h1>{{ Title }}</h1>{{ Content }}")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome home.")
+        for name in ("a", "b", "c"):
+            write_file(os.path.join(self.content, "blog", name, "index.md"), f"# Post {name}\n\n* one *two*")
+
+    def build(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            generate_pages_recursive(self.content, self.template, self.public, incremental=True, **kwargs)
+        return out.getvalue()
+
+    def test_page_metadata(self):
+        """Test that titles and words are counted without markup, and unchanged pages are not read again"""
+        self.assertEqual(page_metadata(os.path.join(self.content, "blog", "a", "index.md")), ("Post a", 4))
+        pages = [(os.path.join(self.content, "index.md"), self.public)]
+        self.assertEqual(collect_metadata(pages, self.content, self.public)[0][:2], ("/", "Home"))
+
+        path = os.path.join(self.public, METADATA_NAME)
+        stat = os.stat(pages[0][0])
+        write_json(path, {"index.md": [stat.st_size, stat.st_mtime_ns, "Remembered", 7]})
+        self.assertEqual(collect_metadata(pages, self.content, self.public), [("/", "Remembered", stat.st_mtime_ns, 7)])
+
+    def test_nav_and_sections(self):
+        """Test that pages nest under the nearest page above them and sections are contiguous"""
+        table = sorted([meta("/"), meta("/blog/"), meta("/blog/a/"), meta("/blog-x/"), meta("/docs/a/"), meta("/docs/b/")])
+        self.assertEqual(
+            render_nav(table),
+            '<nav class="site-nav"><ul><li><a href="/">/</a><ul>'
+            '<li><a href="/blog-x/">/blog-x/</a></li>'
+            '<li><a href="/blog/">/blog/</a><ul><li><a href="/blog/a/">/blog/a/</a></li></ul></li>'
+            '<li><a href="/docs/a/">/docs/a/</a></li><li><a href="/docs/b/">/docs/b/</a></li>'
+            "</ul></li></ul></nav>",
+        )
+        self.assertEqual([table[i].url for i in range(*section_range(table, "/blog/"))], ["/blog/", "/blog/a/"])
+        self.assertEqual(list(sections(table)), ["/", "/blog/", "/docs/"])
+
+    def test_listings(self):
+        """Test that listings are paginated, left alone when unchanged and removed when stale"""
+        table = [PageMeta(f"/blog/{i}/", f"Post {i}", 0, 10) for i in range(5)]
+        template = Template.from_string("<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(write_listings(table, template, self.public, page_size=2), 6)
+        second = read_file(os.path.join(self.public, "blog", "pages", "2", "index.html"))
+        self.assertIn("<h1>/blog/ (page 2)</h1>", second)
+        self.assertIn('<a href="/blog/2/">Post 2</a>', second)
+        self.assertIn('<a rel="prev" href="/blog/pages/">Previous</a>', second)
+        self.assertIn('<a rel="next" href="/blog/pages/3/">Next</a>', second)
+        self.assertNotIn("Post 4", second)
+
+        self.assertEqual(write_listings(table, template, self.public, page_size=2), 0)
+        self.assertEqual(write_listings(table[:2], template, self.public, page_size=2), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "pages", "2")))
+
+    def test_build(self):
+        """Test that every page shows the nav and removing a page updates the others"""
+        out = self.build(listings=True, page_size=2)
+        self.assertIn("Wrote 4 listing page(s)", out)
+        home = read_file(os.path.join(self.public, "index.html"))
+        self.assertIn('<a href="/blog/c/">Post c</a>', home)
+        self.assertIn("<h1>Home</h1>", read_file(os.path.join(self.public, "pages", "index.html")))
+        self.assertIn("Skipping 4 unchanged page(s)", self.build(listings=True, page_size=2))
+
+        os.remove(os.path.join(self.content, "blog", "c", "index.md"))
+        out = self.build(listings=True, page_size=2)
+        self.assertIn("Removed stale page", out)
+        self.assertNotIn("Post c", read_file(os.path.join(self.public, "blog", "a", "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "pages", "2")))
+
+
+if __name__ == "__main__":
+    unittest.main()
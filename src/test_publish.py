@@ -0,0 +1,83 @@
+"""
+Test atomic publishing from the content-addressed store.
+"""
+import json
+import os
+import unittest
+
+from manifest import OUTPUT_INDEX_NAME
+from publish import PublishError, Store, current_build, publish, rollback
+from testutil import TempDirTestCase, read_file, write_file
+
+
+class TestPublish(TempDirTestCase):
+    """Test publish and rollback."""
+    def setUp(self):
+        super().setUp()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.link = os.path.join(self.tmp.name, "site")
+        self.store = Store(os.path.join(self.tmp.name, ".publish"))
+        write_file(os.path.join(self.public, "index.html"), "<h1>Home</h1>")
+        write_file(os.path.join(self.public, "blog", "index.html"), "<h1>Blog</h1>")
+        write_file(os.path.join(self.public, ".manifest.json"), "{}")
+
+    def publish(self, keep=5):
+        return publish(self.public, self.link, self.store, keep)
+
+    def test_publish(self):
+        """Test that builds are snapshots sharing unchanged files and republishing is a no-op"""
+        first, added = self.publish()
+        self.assertEqual(added, 2)
+        self.assertEqual(current_build(self.link), first)
+        self.assertEqual(read_file(os.path.join(self.link, "blog", "index.html")), "<h1>Blog</h1>")
+        self.assertFalse(os.path.exists(os.path.join(self.link, ".manifest.json")))
+        index = json.loads(read_file(os.path.join(self.link, OUTPUT_INDEX_NAME)))
+        self.assertEqual(index["index.html"][1], os.stat(os.path.join(self.link, "index.html")).st_mtime_ns)
+
+        self.assertEqual(self.publish(), (first, 0))
+
+        write_file(os.path.join(self.public, "index.html"), "<h1>Changed</h1>")
+        second, added = self.publish()
+        self.assertNotEqual(second, first)
+        self.assertEqual(added, 1)
+        self.assertEqual(read_file(os.path.join(self.link, "index.html")), "<h1>Changed</h1>")
+        builds = os.path.join(self.store.root, "builds")
+        self.assertTrue(os.path.samefile(
+            os.path.join(builds, first, "blog", "index.html"), os.path.join(builds, second, "blog", "index.html"),
+        ))
+        self.assertEqual(read_file(os.path.join(builds, first, "index.html")), "<h1>Home</h1>")
+
+    def test_rollback(self):
+        """Test rolling back to the previous build or a named one"""
+        first, _ = self.publish()
+        write_file(os.path.join(self.public, "index.html"), "<h1>Changed</h1>")
+        second, _ = self.publish()
+
+        self.assertEqual(rollback(self.link, store=self.store), first)
+        self.assertEqual(read_file(os.path.join(self.link, "index.html")), "<h1>Home</h1>")
+        with self.assertRaises(PublishError):
+            rollback(self.link, store=self.store)
+        self.assertEqual(rollback(self.link, second, self.store), second)
+        with self.assertRaises(PublishError):
+            rollback(self.link, "0" * 16, self.store)
+
+    def test_prune(self):
+        """Test that old builds and the blobs only they used are removed"""
+        first, _ = self.publish(keep=1)
+        blob = self.store.blob_path(json.loads(read_file(os.path.join(self.link, OUTPUT_INDEX_NAME)))["index.html"][2])
+        write_file(os.path.join(self.public, "index.html"), "<h1>Changed</h1>")
+        second, _ = self.publish(keep=1)
+        self.assertEqual(self.store.load_history(), [second])
+        self.assertFalse(os.path.exists(os.path.join(self.store.root, "builds", first)))
+        self.assertFalse(os.path.exists(blob))
+        self.assertEqual(read_file(os.path.join(self.link, "blog", "index.html")), "<h1>Blog</h1>")
+
+    def test_directory_in_the_way(self):
+        """Test that a real directory at the link path is left alone"""
+        os.makedirs(self.link)
+        with self.assertRaises(PublishError):
+            self.publish()
+
+
+if __name__ == "__main__":
+    unittest.main()
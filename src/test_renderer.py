@@ -0,0 +1,109 @@
+"""
+Test the in-memory Renderer.
+"""
+import contextlib
+import datetime
+import io
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from blockcache import BlockCache
+from main import generate_page
+from renderer import Renderer
+from template import Template
+
+TEMPLATE = "<title>{{ Title }}</title><p>{{ Date }}</p>{{ Content }}"
+
+
+def page(i):
+    return f"# Page {i}\n\nShared **paragraph**.\n\n* item {i}"
+
+
+class TestRenderer(unittest.TestCase):
+    """Test rendering pages held in memory."""
+    def setUp(self):
+        self.renderer = Renderer(Template.from_string(TEMPLATE))
+        self.addCleanup(self.renderer.close)
+
+    def test_render(self):
+        """Test that a page renders as generate_page would write it"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "index.md")
+            with open(source, "w") as f:
+                f.write(page(1))
+            template = os.path.join(tmp, "template.html")
+            with open(template, "w") as f:
+                f.write(TEMPLATE)
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_page(source, template, tmp)
+            with open(os.path.join(tmp, "index.html")) as f:
+                expected = f.read()
+        self.assertEqual(self.renderer.render(page(1), datetime.date.today()), expected)
+
+    def test_errors(self):
+        """Test that render raises and the page iterators report errors per page"""
+        with self.assertRaises(Exception):
+            self.renderer.render("no heading")
+        pages = list(self.renderer.render_pages([("a", "no heading"), ("b", page(2))]))
+        self.assertEqual([result.path for result in pages], ["a", "b"])
+        self.assertIn("No heading", pages[0].error)
+        self.assertIsNone(pages[1].error)
+        self.assertIn("<li>item 2</li>", pages[1].html)
+
+    def test_shared_cache(self):
+        """Test that calls and threads share the block cache and agree on the output"""
+        pages = [(str(i), page(i % 5)) for i in range(50)]
+        expected = [self.renderer.render(markdown) for _, markdown in pages]
+        hits = self.renderer.cache.hits
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            rendered = list(executor.map(lambda item: self.renderer.render(item[1]), pages))
+        self.assertEqual(rendered, expected)
+        self.assertGreater(self.renderer.cache.hits, hits)
+
+    def test_render_batch(self):
+        """Test that a batch spread over worker processes keeps the input order"""
+        pages = [(str(i), page(i)) for i in range(100)]
+        expected = [result.html for result in self.renderer.render_pages(pages)]
+        for _ in range(2):
+            results = list(self.renderer.render_batch(iter(pages), jobs=2))
+            self.assertEqual([result.path for result in results], [path for path, _ in pages])
+            self.assertEqual([result.html for result in results], expected)
+
+    def test_asset_urls(self):
+        """Test that the template and pages point at fingerprinted assets, in batches too"""
+        urls = {"/index.css": "/index.1.css", "/a.png": "/a.2.png"}
+        template = Template.from_string('<link href="/index.css">{{ Content }}')
+        with Renderer(template, asset_urls=urls) as renderer:
+            html = renderer.render("# A\n\n![a](/a.png)")
+            self.assertIn('href="/index.1.css"', html)
+            self.assertIn('src="/a.2.png"', html)
+            batch = list(renderer.render_batch([("a", "# A\n\n![a](/a.png)")], jobs=2))
+            self.assertEqual(batch[0].html, html)
+        self.assertIn('src="/a.png"', self.renderer.render("# A\n\n![a](/a.png)"))
+
+    def test_concurrent_batches(self):
+        """Test that a batch with other jobs does not stop the pool of a batch running in another thread"""
+        pages = [(str(i), page(i)) for i in range(100)]
+        expected = [result.html for result in self.renderer.render_pages(pages)]
+        running = self.renderer.render_batch(iter(pages), jobs=2)
+        first = next(running)
+        other = [result.html for result in self.renderer.render_batch(pages[:10], jobs=3)]
+        self.assertEqual(other, expected[:10])
+        self.assertEqual([first.html] + [result.html for result in running], expected)
+
+    def test_external_cache(self):
+        """Test that a cache passed in is flushed, not closed"""
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = BlockCache(path=os.path.join(tmp, "blocks.sqlite"))
+            with Renderer(Template.from_string(TEMPLATE), cache) as renderer:
+                renderer.render(page(1))
+            cache.close()
+            stored = BlockCache(path=cache.path)
+            self.assertEqual(stored.get("Shared **paragraph**."), "<p>Shared <b>paragraph</b>.</p>")
+            stored.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
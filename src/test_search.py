@@ -0,0 +1,107 @@
+"""
+Test the search index.
+"""
+import json
+import os
+import unittest
+from unittest import mock
+
+import search
+from main import discover_pages
+from search import SEARCH_DIR, decode_postings, encode_postings, page_terms, shard_name, update_search_index
+from testutil import TempDirTestCase, write_file
+
+
+class TestSearchIndex(TempDirTestCase):
+    """Test building and updating the search index."""
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        for i in range(6):
+            write_file(
+                os.path.join(self.content, f"page{i}", "index.md"),
+                f"# Page {i}\n\nShared words and a [link](/x) to page{i}.\n\n```\ncodeonly\n```",
+            )
+
+    def update(self, jobs=1, rebuild=False):
+        pages = discover_pages(self.content, self.public)
+        return update_search_index(pages, self.content, self.public, jobs, rebuild)
+
+    def lookup(self, term):
+        """Return {url: weight} for a term, as the lookup script would."""
+        terms = self.read(os.path.join("terms", shard_name(term) + ".json"))
+        postings = decode_postings(terms.get(term, []))
+        docs = {}
+        for page_id, weight in postings:
+            shard = self.read(os.path.join("docs", f"{page_id // search.DOCS_PER_SHARD}.json"))
+            docs[shard[str(page_id)][0]] = weight
+        return docs
+
+    def read(self, rel_path):
+        with open(os.path.join(self.public, SEARCH_DIR, rel_path)) as f:
+            return json.load(f)
+
+    def test_page_terms(self):
+        """Test that headings weigh more and code blocks are skipped"""
+        title, weights = page_terms(os.path.join(self.content, "page1", "index.md"))
+        self.assertEqual(title, "Page 1")
+        self.assertEqual(weights["page"], search.HEADING_WEIGHT)
+        self.assertEqual(weights["page1"], 1)
+        self.assertEqual(weights["link"], 1)
+        self.assertNotIn("codeonly", weights)
+        self.assertNotIn("x", weights)
+
+    def test_postings_roundtrip(self):
+        """Test that postings are sorted and delta-encoded"""
+        encoded = encode_postings([(7, 1), (2, 3), (40, 2)])
+        self.assertEqual(encoded, [2, 3, 5, 1, 33, 2])
+        self.assertEqual(decode_postings(encoded), [(2, 3), (7, 1), (40, 2)])
+
+    def test_build(self):
+        """Test that every page is indexed with its url and title"""
+        self.assertEqual(self.update(), 6)
+        self.assertEqual(len(self.lookup("shared")), 6)
+        self.assertEqual(self.lookup("page3"), {"/page3/": 1})
+        self.assertIn("/page0/", self.lookup("page"))
+        self.assertTrue(os.path.exists(os.path.join(self.public, SEARCH_DIR, "search.js")))
+
+    def test_incremental_update(self):
+        """Test that only changed pages are re-indexed and removed pages disappear"""
+        self.update()
+        shared = os.path.join(self.public, SEARCH_DIR, "terms", shard_name("shared") + ".json")
+        before = os.stat(shared).st_mtime_ns
+        self.assertEqual(self.update(), 0)
+
+        write_file(os.path.join(self.content, "page2", "index.md"), "# Page 2\n\nRewritten entirely.")
+        os.remove(os.path.join(self.content, "page4", "index.md"))
+        self.assertEqual(self.update(), 1)
+        self.assertEqual(self.lookup("rewritten"), {"/page2/": 1})
+        self.assertEqual(set(self.lookup("shared")), {"/page0/", "/page1/", "/page3/", "/page5/"})
+        self.assertEqual(self.lookup("page4"), {})
+        self.assertNotEqual(os.stat(shared).st_mtime_ns, before)
+
+        write_file(os.path.join(self.content, "page6", "index.md"), "# Page 6\n\nNew page.")
+        self.assertEqual(self.update(), 1)
+        self.assertEqual(self.lookup("new"), {"/page6/": 1})
+        self.assertEqual(self.update(rebuild=True), 6)
+        self.assertEqual(self.lookup("new"), {"/page6/": 1})
+
+    def test_spilled_and_parallel_match(self):
+        """Test that spilling postings and tokenizing in workers give the same index"""
+        self.update()
+        expected = {
+            name: self.read(os.path.join("terms", name))
+            for name in os.listdir(os.path.join(self.public, SEARCH_DIR, "terms"))
+        }
+        with mock.patch.object(search, "SPILL_BUFFER", 3):
+            self.update(jobs=3, rebuild=True)
+        actual = {
+            name: self.read(os.path.join("terms", name))
+            for name in os.listdir(os.path.join(self.public, SEARCH_DIR, "terms"))
+        }
+        self.assertEqual(actual, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
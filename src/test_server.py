@@ -0,0 +1,255 @@
+"""
+Test server.py, the development and production file server.
+"""
+import functools
+import gzip
+import http.client
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from fingerprint import fingerprint_assets
+from server import (
+    BUILD_ID_NAME,
+    IMMUTABLE_CACHE_CONTROL,
+    LIVE_RELOAD_PATH,
+    CachingHTTPRequestHandler,
+    ETagStore,
+    FileCache,
+    FingerprintStore,
+    ThreadingHTTPServer,
+    accepted_encodings,
+    is_hidden,
+    parse_range,
+)
+from testutil import TempDirTestCase, write_file
+
+
+def handler_with(headers):
+    """Return a request handler that has only the given request headers, for its header logic."""
+    handler = CachingHTTPRequestHandler.__new__(CachingHTTPRequestHandler)
+    handler.headers = headers
+    return handler
+
+
+class TestFileCache(TempDirTestCase):
+    """Test the FileCache class."""
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "a.txt")
+        write_file(self.path, "first")
+
+    def test_invalidation(self):
+        """Test that a file is read once and again after it changes"""
+        cache = FileCache()
+        self.assertEqual(cache.get(self.path, os.stat(self.path)), b"first")
+        self.assertEqual(cache.get(self.path, os.stat(self.path)), b"first")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        write_file(self.path, "second")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(cache.get(self.path, os.stat(self.path)), b"second")
+        self.assertEqual(cache.misses, 2)
+
+    def test_limits(self):
+        """Test that large files are not kept and the oldest entries are evicted"""
+        cache = FileCache(max_bytes=10, max_file_bytes=6)
+        big = os.path.join(self.tmp.name, "big.txt")
+        write_file(big, "x" * 7)
+        cache.get(big, os.stat(big))
+        self.assertEqual(cache.size, 0)
+
+        other = os.path.join(self.tmp.name, "b.txt")
+        write_file(other, "other!")
+        cache.get(self.path, os.stat(self.path))
+        cache.get(other, os.stat(other))
+        self.assertEqual(cache.size, 6)
+        cache.get(other, os.stat(other))
+        cache.get(self.path, os.stat(self.path))
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+
+class TestETagStore(TempDirTestCase):
+    """Test the ETagStore class."""
+    def test_computed_etags_are_capped(self):
+        """Test that hashed ETags are kept for the most recently used files only"""
+        etags = ETagStore(max_computed=2)
+        paths = [os.path.join(self.tmp.name, f"{i}.txt") for i in range(3)]
+        for i, path in enumerate(paths):
+            write_file(path, str(i))
+        first = etags.get(self.tmp.name, paths[0], os.stat(paths[0]))
+        etags.get(self.tmp.name, paths[1], os.stat(paths[1]))
+        self.assertEqual(etags.get(self.tmp.name, paths[0], os.stat(paths[0])), first)
+        etags.get(self.tmp.name, paths[2], os.stat(paths[2]))
+        self.assertEqual(list(etags._computed), [paths[0], paths[2]])
+
+
+class TestHeaders(unittest.TestCase):
+    """Test the parsing of Range, Accept-Encoding and conditional request headers."""
+    def test_is_hidden(self):
+        """Test that a dot-prefixed segment anywhere in the path hides it, however it is encoded"""
+        self.assertTrue(is_hidden("/.manifest.json"))
+        self.assertTrue(is_hidden("/static/.fingerprints.json?x=1"))
+        self.assertTrue(is_hidden("/%2Eoutputs.json"))
+        self.assertFalse(is_hidden("/index.css"))
+        self.assertFalse(is_hidden("/a.b/?q=.x"))
+
+    def test_parse_range(self):
+        """Test single, suffix, multiple and unsatisfiable byte ranges"""
+        self.assertEqual(parse_range("bytes=0-4", 10), (0, 4))
+        self.assertEqual(parse_range("bytes=2-100", 10), (2, 9))
+        self.assertEqual(parse_range("bytes=7-", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-3", 10), (7, 9))
+        self.assertEqual(parse_range("bytes=-20", 10), (0, 9))
+        self.assertIsNone(parse_range("bytes=0-1,4-5", 10))
+        self.assertIsNone(parse_range("bytes=5-2", 10))
+        self.assertIsNone(parse_range("bytes=-", 10))
+        self.assertIsNone(parse_range("items=0-1", 10))
+        self.assertIs(parse_range("bytes=10-", 10), False)
+        self.assertIs(parse_range("bytes=-0", 10), False)
+
+    def test_accepted_encodings(self):
+        """Test that q=0 and malformed weights refuse a coding and * is kept"""
+        self.assertEqual(accepted_encodings("gzip, br;q=0.5"), {"gzip", "br"})
+        self.assertEqual(accepted_encodings("gzip;q=0, BR"), {"br"})
+        self.assertEqual(accepted_encodings("zstd;q=oops, *"), {"*"})
+        self.assertEqual(accepted_encodings("*;q=0"), set())
+
+    def test_not_modified(self):
+        """Test If-None-Match first, then If-Modified-Since"""
+        stat = os.stat_result((0, 0, 0, 0, 0, 0, 0, 0, 1_000_000_000, 0))
+        etag = '"abc"'
+        self.assertTrue(handler_with({"If-None-Match": '"x", W/"abc"'}).not_modified(etag, stat))
+        self.assertTrue(handler_with({"If-None-Match": "*"}).not_modified(etag, stat))
+        self.assertFalse(handler_with({
+            "If-None-Match": '"x"', "If-Modified-Since": "Sun, 09 Sep 2001 01:46:40 GMT",
+        }).not_modified(etag, stat))
+        self.assertTrue(handler_with({"If-Modified-Since": "Sun, 09 Sep 2001 01:46:40 GMT"}).not_modified(etag, stat))
+        self.assertFalse(handler_with({"If-Modified-Since": "Sun, 09 Sep 2001 01:46:39 GMT"}).not_modified(etag, stat))
+        self.assertFalse(handler_with({"If-Modified-Since": "yesterday"}).not_modified(etag, stat))
+        self.assertFalse(handler_with({}).not_modified(etag, stat))
+
+    def test_if_range_matches(self):
+        """Test that If-Range must name the current ETag or Last-Modified date"""
+        last_modified = "Sun, 09 Sep 2001 01:46:40 GMT"
+        self.assertTrue(handler_with({}).if_range_matches('"abc"', last_modified))
+        self.assertTrue(handler_with({"If-Range": '"abc"'}).if_range_matches('"abc"', last_modified))
+        self.assertTrue(handler_with({"If-Range": last_modified}).if_range_matches('"abc"', last_modified))
+        self.assertFalse(handler_with({"If-Range": '"old"'}).if_range_matches('"abc"', last_modified))
+
+
+class TestServer(TempDirTestCase):
+    """Test CachingHTTPRequestHandler on an ephemeral port."""
+    def setUp(self):
+        super().setUp()
+        self.site = os.path.join(self.tmp.name, "site")
+        write_file(os.path.join(self.site, "index.html"), "<h1>Home</h1>")
+        write_file(os.path.join(self.site, "page.txt"), "0123456789")
+        write_file(os.path.join(self.site, "static", "index.css"), "body { color: red }")
+        self.urls = fingerprint_assets(os.path.join(self.site, "static"), self.site)
+        self.serve(self.site)
+
+    def serve(self, directory, published=None):
+        handler = type("Handler", (CachingHTTPRequestHandler,), {
+            "cache": FileCache(),
+            "etags": ETagStore(),
+            "fingerprints": FingerprintStore(),
+            "published": published,
+        })
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(handler, directory=directory))
+        self.server.daemon_threads = True
+        self.server.quiet = True
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def request(self, path, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=10)
+        self.addCleanup(connection.close)
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+    def test_conditional_and_range_requests(self):
+        """Test 200, 304, 206 and 416 responses"""
+        response, body = self.request("/page.txt")
+        self.assertEqual((response.status, body), (200, b"0123456789"))
+        etag = response.getheader("ETag")
+        self.assertEqual(self.request("/page.txt", {"If-None-Match": etag})[0].status, 304)
+
+        response, body = self.request("/page.txt", {"Range": "bytes=-3"})
+        self.assertEqual((response.status, body), (206, b"789"))
+        self.assertEqual(response.getheader("Content-Range"), "bytes 7-9/10")
+        response, body = self.request("/page.txt", {"Range": "bytes=2-4", "If-Range": '"stale"'})
+        self.assertEqual((response.status, body), (200, b"0123456789"))
+        response, _ = self.request("/page.txt", {"Range": "bytes=20-"})
+        self.assertEqual((response.status, response.getheader("Content-Range")), (416, "bytes */10"))
+
+    def test_build_dotfiles_are_not_served(self):
+        """Test that the build's state files in the output root answer 404"""
+        write_file(os.path.join(self.site, ".manifest.json"), "{}")
+        for path in ("/.manifest.json", "/.fingerprints.json", "/%2Emanifest.json"):
+            self.assertEqual(self.request(path)[0].status, 404)
+        self.assertEqual(self.request("/page.txt")[0].status, 200)
+
+    def test_precompressed(self):
+        """Test that a fresh compressed sibling is served to clients that accept it, with Vary"""
+        path = os.path.join(self.site, "index.html")
+        with open(path + ".gz", "wb") as f:
+            f.write(gzip.compress(b"<h1>Home</h1>"))
+        stat = os.stat(path)
+        os.utime(path + ".gz", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        response, body = self.request("/", {"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(gzip.decompress(body), b"<h1>Home</h1>")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        response, body = self.request("/", {"Accept-Encoding": "gzip;q=0"})
+        self.assertIsNone(response.getheader("Content-Encoding"))
+        self.assertEqual((body, response.getheader("Vary")), (b"<h1>Home</h1>", "Accept-Encoding"))
+        self.assertIsNone(self.request("/page.txt")[0].getheader("Vary"))
+
+    def test_immutable_assets(self):
+        """Test that only fingerprinted assets are marked immutable, on 200 and 304 alike"""
+        response, body = self.request(self.urls["/index.css"])
+        self.assertEqual(body, b"body { color: red }")
+        self.assertEqual(response.getheader("Cache-Control"), IMMUTABLE_CACHE_CONTROL)
+        response, _ = self.request(self.urls["/index.css"], {"If-None-Match": response.getheader("ETag")})
+        self.assertEqual((response.status, response.getheader("Cache-Control")), (304, IMMUTABLE_CACHE_CONTROL))
+        self.assertIsNone(self.request("/index.html")[0].getheader("Cache-Control"))
+
+    def test_live_reload(self):
+        """Test that the live-reload stream sends the build id and every new one"""
+        write_file(os.path.join(self.site, BUILD_ID_NAME), "1")
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=10)
+        self.addCleanup(connection.close)
+        connection.request("GET", LIVE_RELOAD_PATH)
+        response = connection.getresponse()
+        self.assertEqual(response.getheader("Content-Type"), "text/event-stream")
+        self.assertEqual(response.fp.readline(), b"data: 1\n")
+        self.assertEqual(response.fp.readline(), b"\n")
+        write_file(os.path.join(self.site, BUILD_ID_NAME), "2")
+        self.assertEqual(response.fp.readline(), b"data: 2\n")
+
+    def test_pin_build(self):
+        """Test that a published link is resolved per request, following a publish"""
+        builds = os.path.join(self.tmp.name, "builds")
+        for build in ("a", "b"):
+            write_file(os.path.join(builds, build, "index.html"), f"build {build}")
+        link = os.path.join(self.tmp.name, "live")
+        os.symlink(os.path.join(builds, "a"), link)
+        self.serve(self.tmp.name, published=link)
+
+        self.assertEqual(self.request("/")[1], b"build a")
+        os.symlink(os.path.join(builds, "b"), link + ".tmp")
+        os.replace(link + ".tmp", link)
+        self.assertEqual(self.request("/")[1], b"build b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Test sharded builds and their merge.
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import unittest
+
+from main import generate_pages_recursive, main
+from search import SEARCH_DIR, decode_postings, page_terms, update_search_index
+from shard import SHARD_MANIFEST_NAME, ShardError, ShardTerms, find_shards, merge_shards, select_pages, shard_of
+from testutil import TempDirTestCase, read_file, write_file
+from util import read_json
+
+SRC = os.path.dirname(os.path.abspath(__file__))
+
+
+def search_postings(public):
+    """Return {term: {url: weight}} for the search index in public, whatever the page ids."""
+    root = os.path.join(public, SEARCH_DIR)
+    urls = {}
+    for name in os.listdir(os.path.join(root, "docs")):
+        urls.update({int(page_id): doc[0] for page_id, doc in read_json(os.path.join(root, "docs", name), {}).items()})
+    postings = {}
+    for name in os.listdir(os.path.join(root, "terms")):
+        for term, encoded in read_json(os.path.join(root, "terms", name), {}).items():
+            postings[term] = {urls[page_id]: weight for page_id, weight in decode_postings(encoded)}
+    return postings
+
+
+class TestShards(TempDirTestCase):
+    """Test shard builds run as separate processes and merged into public."""
+    def setUp(self):
+        super().setUp()
+        self.site = self.tmp.name
+        write_file(os.path.join(self.site, "template.html"), "<title>{{ Title }}</title>{{ Content }}")
+        write_file(os.path.join(self.site, "static", "index.css"), "body {}")
+        for i in range(12):
+            write_file(
+                os.path.join(self.site, "content", f"section{i % 3}", f"page{i}", "index.md"),
+                f"# Page {i}\n\nShared words and page{i} words.",
+            )
+
+    def run_main(self, *argv):
+        previous = os.getcwd()
+        os.chdir(self.site)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                main(list(argv))
+        finally:
+            os.chdir(previous)
+        return out.getvalue()
+
+    def build_shards(self, count, *argv):
+        processes = [
+            subprocess.Popen(
+                [sys.executable, os.path.join(SRC, "main.py"), "--shard", f"{i}/{count}", *argv],
+                cwd=self.site, stdout=subprocess.DEVNULL,
+            )
+            for i in range(1, count + 1)
+        ]
+        for process in processes:
+            self.assertEqual(process.wait(), 0)
+
+    def test_partition(self):
+        """Test that shards are stable and every page lands in exactly one"""
+        content = os.path.join(self.site, "content")
+        pages = [(os.path.join(content, f"p{i}.md"), "public") for i in range(50)]
+        shards = [select_pages(pages, content, i, 4) for i in range(1, 5)]
+        self.assertEqual(sorted(page for shard in shards for page in shard), sorted(pages))
+        self.assertTrue(all(shards))
+        self.assertEqual(shard_of("a/index.md", 4), shard_of("a/index.md", 4))
+
+    def test_merge(self):
+        """Test that merged shards match a single build, sitemap and search index included"""
+        self.build_shards(3, "--search")
+        shard_dirs = find_shards(os.path.join(self.site, "shards"))
+        self.assertEqual(len(shard_dirs), 3)
+        keys = [set(read_json(os.path.join(d, SHARD_MANIFEST_NAME), {})["pages"]) for d in shard_dirs]
+        self.assertEqual(sum(map(len, keys)), 12)
+        self.assertEqual(len(set().union(*keys)), 12)
+
+        out = self.run_main("--merge", "--search", "--base-url", "https://example.com/")
+        self.assertIn("copied 12 of 12 page(s)", out)
+
+        single = os.path.join(self.tmp.name, "single")
+        content = os.path.join(self.site, "content")
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(
+                content, os.path.join(self.site, "template.html"), single, sitemap="https://example.com/",
+            )
+            update_search_index(
+                [(os.path.join(content, f"section{i % 3}", f"page{i}", "index.md"),
+                  os.path.join(single, f"section{i % 3}", f"page{i}")) for i in range(12)],
+                content, single,
+            )
+        public = os.path.join(self.site, "public")
+        for i in range(12):
+            rel_path = os.path.join(f"section{i % 3}", f"page{i}", "index.html")
+            self.assertEqual(read_file(os.path.join(public, rel_path)), read_file(os.path.join(single, rel_path)))
+        self.assertEqual(search_postings(public), search_postings(single))
+        self.assertIn("<loc>https://example.com/sitemap-1.xml</loc>", read_file(os.path.join(public, "sitemap.xml")))
+        sitemap = read_file(os.path.join(public, "sitemap-1.xml"))
+        self.assertEqual(sitemap.count("<url>"), 12)
+        self.assertIn("<loc>https://example.com/section1/page4/</loc>", sitemap)
+        for name in ("sitemap.xml", "sitemap-1.xml", "feed.xml"):
+            self.assertEqual(read_file(os.path.join(public, name)), read_file(os.path.join(single, name)))
+
+        out = self.run_main("--merge", "--search")
+        self.assertIn("copied 0 of 12 page(s)", out)
+        self.assertIn("Indexed 0 page(s)", out)
+
+    def test_search_terms_stay_out_of_the_manifest(self):
+        """Test that shard terms live in the terms file and survive an incremental shard build"""
+        self.build_shards(2, "--search")
+        write_file(os.path.join(self.site, "content", "section0", "page0", "index.md"), "# Page 0\n\nRewritten.")
+        self.build_shards(2, "--search")
+        for directory in find_shards(os.path.join(self.site, "shards")):
+            shard_terms = ShardTerms()
+            try:
+                for key, entry in read_json(os.path.join(directory, SHARD_MANIFEST_NAME), {})["pages"].items():
+                    self.assertEqual(len(entry["terms"]), 2)
+                    weights = page_terms(os.path.join(self.site, "content", key))[1]
+                    self.assertEqual(shard_terms.loader(directory, entry["terms"])(), weights)
+            finally:
+                shard_terms.close()
+
+    def test_merge_removes_deleted_pages_after_template_change(self):
+        """Test that a merge with a new template still removes the pages deleted since the last one"""
+        self.build_shards(2)
+        self.run_main("--merge")
+        page = os.path.join(self.site, "public", "section1", "page4", "index.html")
+        self.assertTrue(os.path.exists(page))
+
+        write_file(os.path.join(self.site, "template.html"), "<title>{{ Title }}</title><main>{{ Content }}</main>")
+        os.remove(os.path.join(self.site, "content", "section1", "page4", "index.md"))
+        self.build_shards(2)
+        out = self.run_main("--merge")
+        self.assertIn("copied 11 of 11 page(s)", out)
+        self.assertFalse(os.path.exists(page))
+
+    def test_rejected_merges(self):
+        """Test that incomplete, mismatched or colliding shard builds are not merged"""
+        self.build_shards(2)
+        shards = os.path.join(self.site, "shards")
+        public = os.path.join(self.site, "public")
+        with self.assertRaises(ShardError):
+            merge_shards([os.path.join(shards, "1-of-2")], public)
+        with self.assertRaises(ShardError):
+            merge_shards(find_shards(shards), public, asset_urls={"/index.css": "/index.0.css"})
+        with self.assertRaises(ShardError):
+            merge_shards(find_shards(shards), public, search=True)
+
+        write_file(os.path.join(self.site, "content", "section0", "page0", "other.md"), "# Other")
+        self.build_shards(2)
+        with self.assertRaisesRegex(ShardError, "section0/page0/index.html"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                merge_shards(find_shards(shards), public)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Test the sharded sitemap and the Atom feed.
+"""
+import contextlib
+import io
+import os
+import unittest
+from unittest import mock
+
+import sitemap
+from main import generate_pages_recursive
+from navigation import PageMeta, collect_metadata
+from sitemap import FEED_NAME, SITEMAP_NAME, render_feed, write_sitemaps
+from testutil import TempDirTestCase, read_file, write_file
+
+DAY_NS = 86400 * 10**9
+
+
+def site(count, changed=None):
+    """Yield count pages, one day apart, with page changed a year newer."""
+    for i in range(count):
+        mtime_ns = (i + 1) * DAY_NS + (365 * DAY_NS if i == changed else 0)
+        yield PageMeta(f"/page{i:02}/", f"Page {i} & co", mtime_ns, 10)
+
+
+class TestSitemap(TempDirTestCase):
+    """Test write_sitemaps and the --sitemap build stage."""
+    def setUp(self):
+        super().setUp()
+        self.public = os.path.join(self.tmp.name, "public")
+
+    def path(self, name):
+        return os.path.join(self.public, name)
+
+    def write(self, pages):
+        return write_sitemaps(self.public, "https://example.com/", pages, urls_per_shard=4, feed_size=3)
+
+    def test_shards(self):
+        """Test that urls are split into shards listed by the index"""
+        self.assertEqual(self.write(site(10)), (10, 5))
+        index = read_file(self.path(SITEMAP_NAME))
+        for n in (1, 2, 3):
+            self.assertIn(f"<loc>https://example.com/sitemap-{n}.xml</loc>", index)
+        self.assertNotIn("sitemap-4.xml", index)
+        self.assertEqual(read_file(self.path("sitemap-2.xml")).count("<url>"), 4)
+        self.assertIn("<loc>https://example.com/page09/</loc>", read_file(self.path("sitemap-3.xml")))
+
+    def test_incremental(self):
+        """Test that only shards with changed pages are rewritten and dropped shards are removed"""
+        self.write(site(10))
+        before = {n: os.stat(self.path(f"sitemap-{n}.xml")).st_ino for n in (1, 2, 3)}
+        self.assertEqual(self.write(site(10)), (10, 0))
+
+        # Page 5 is in the second shard; the index's lastmod and the feed change with it.
+        self.assertEqual(self.write(site(10, changed=5)), (10, 3))
+        after = {n: os.stat(self.path(f"sitemap-{n}.xml")).st_ino for n in (1, 2, 3)}
+        self.assertEqual(before[1], after[1])
+        self.assertNotEqual(before[2], after[2])
+        self.assertEqual(before[3], after[3])
+
+        self.write(site(6))
+        self.assertFalse(os.path.exists(self.path("sitemap-3.xml")))
+
+    def test_unchanged_shards_are_not_written(self):
+        """Test that shards whose pages did not change are skipped without writing anything"""
+        self.write(site(10))
+        with mock.patch.object(sitemap, "write_parts", wraps=sitemap.write_parts) as write_parts:
+            self.write(site(10))
+            self.assertEqual(write_parts.call_count, 0)
+            self.write(site(10, changed=9))
+        written = sorted(os.path.basename(call.args[0]) for call in write_parts.call_args_list)
+        self.assertEqual(written, [FEED_NAME, "sitemap-3.xml", SITEMAP_NAME])
+        self.assertFalse([name for name in os.listdir(self.public) if name.endswith(".tmp")])
+
+    def test_duplicate_urls(self):
+        """Test that of pages sharing a url the sitemap keeps the same one as navigation"""
+        content = os.path.join(self.tmp.name, "content")
+        write_file(os.path.join(content, "a.md"), "# First")
+        write_file(os.path.join(content, "a", "index.md"), "# Second")
+        pages = [
+            (os.path.join(content, "a.md"), os.path.join(self.public, "a")),
+            (os.path.join(content, "a", "index.md"), os.path.join(self.public, "a")),
+        ]
+        table = collect_metadata(pages, content, self.public)
+        self.assertEqual([meta.title for meta in table], ["Second"])
+        self.assertEqual(self.write([PageMeta("/a/", "First", DAY_NS, 0), table[0]])[0], 1)
+        self.assertIn("<title>Second</title>", read_file(self.path(FEED_NAME)))
+        self.assertNotIn("<title>First</title>", read_file(self.path(FEED_NAME)))
+
+    def test_feed(self):
+        """Test that the feed holds the newest pages, newest first, escaped"""
+        self.write(site(10, changed=2))
+        feed = read_file(self.path(FEED_NAME))
+        self.assertEqual(feed.count("<entry>"), 3)
+        links = [line.split('href="')[1].split('"')[0] for line in feed.splitlines() if line.startswith("<entry>")]
+        self.assertEqual(links, [
+            "https://example.com/page02/", "https://example.com/page09/", "https://example.com/page08/",
+        ])
+        self.assertIn("<title>Page 2 &amp; co</title>", feed)
+        self.assertIn("<author><name>https://example.com</name></author>", feed)
+
+    def test_feed_attributes(self):
+        """Test that the feed names an author and quotes urls in attributes"""
+        feed = render_feed('https://example.com/"x', "Site", [(DAY_NS, '/a"b/', "A")], author="Ann & Bo")
+        self.assertIn("<author><name>Ann &amp; Bo</name></author>", feed)
+        self.assertIn('<link href="https://example.com/&quot;x/a&quot;b/"/>', feed)
+        self.assertIn('<link rel="self" href="https://example.com/&quot;x/feed.xml"/>', feed)
+
+    def test_build(self):
+        """Test that a build with sitemap streams every page into the sitemap"""
+        content = os.path.join(self.tmp.name, "content")
+        template = os.path.join(self.tmp.name, "template.html")
+        for rel_path, text in (("index.md", "# Home"), ("b/index.md", "# B"), ("a/index.md", "# A")):
+            write_file(os.path.join(content, rel_path), text)
+        write_file(template, "{{ Content }}")
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            generate_pages_recursive(content, template, self.public, sitemap="https://example.com")
+        self.assertIn("Sitemap: 3 url(s)", out.getvalue())
+        sitemap = read_file(self.path("sitemap-1.xml"))
+        locs = [line.split("<loc>")[1].split("</loc>")[0] for line in sitemap.splitlines() if "<loc>" in line]
+        self.assertEqual(locs, ["https://example.com/", "https://example.com/a/", "https://example.com/b/"])
+        self.assertIn("<title>Home</title>", read_file(self.path(FEED_NAME)))
+
+
+if __name__ == "__main__":
+    unittest.main()
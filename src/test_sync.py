@@ -0,0 +1,78 @@
+"""
+Test the sync_tree function.
+"""
+import os
+import unittest
+
+from sync import sync_tree
+from testutil import TempDirTestCase, read_file, write_file
+
+
+class TestSync(TempDirTestCase):
+    """Test the sync_tree function."""
+    def setUp(self):
+        super().setUp()
+        self.src = os.path.join(self.tmp.name, "static")
+        self.dest = os.path.join(self.tmp.name, "public")
+        write_file(os.path.join(self.src, "index.css"), "body {}")
+        write_file(os.path.join(self.src, "images", "logo.png"), "png bytes")
+
+    def test_copies_then_skips(self):
+        """Test that a second sync skips every unchanged file."""
+        stats = sync_tree(self.src, self.dest)
+        self.assertEqual((stats.copied, stats.copied_bytes, stats.skipped), (2, 16, 0))
+        self.assertEqual(read_file(os.path.join(self.dest, "images", "logo.png")), "png bytes")
+
+        stats = sync_tree(self.src, self.dest)
+        self.assertEqual((stats.copied, stats.skipped, stats.skipped_bytes), (0, 2, 16))
+
+    def test_copies_changed_file(self):
+        """Test that only the changed file is copied again."""
+        sync_tree(self.src, self.dest)
+        write_file(os.path.join(self.src, "index.css"), "body { color: red }")
+        stats = sync_tree(self.src, self.dest)
+        self.assertEqual((stats.copied, stats.skipped), (1, 1))
+        self.assertEqual(read_file(os.path.join(self.dest, "index.css")), "body { color: red }")
+
+    def test_checksum(self):
+        """Test that checksum mode catches same-size edits even when mtimes match."""
+        sync_tree(self.src, self.dest)
+        dest_file = os.path.join(self.dest, "index.css")
+        stat = os.stat(dest_file)
+        write_file(dest_file, "body ()")
+        os.utime(dest_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertEqual(sync_tree(self.src, self.dest).copied, 0)
+        self.assertEqual(sync_tree(self.src, self.dest, checksum=True).copied, 1)
+        self.assertEqual(read_file(dest_file), "body {}")
+
+    def test_removes_stale_files_only(self):
+        """Test that deleted sources are removed but unrelated output files are kept."""
+        write_file(os.path.join(self.dest, "index.html"), "<html></html>")
+        sync_tree(self.src, self.dest)
+        os.remove(os.path.join(self.src, "images", "logo.png"))
+
+        stats = sync_tree(self.src, self.dest)
+        self.assertEqual(stats.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_hardlink(self):
+        """Test that hardlink mode shares the inode with the source."""
+        sync_tree(self.src, self.dest, link="hardlink")
+        src_stat = os.stat(os.path.join(self.src, "index.css"))
+        dest_stat = os.stat(os.path.join(self.dest, "index.css"))
+        self.assertEqual(src_stat.st_ino, dest_stat.st_ino)
+
+    def test_reflink_falls_back_to_copy(self):
+        """Test that reflink mode produces a correct copy even without clone support."""
+        sync_tree(self.src, self.dest, link="reflink")
+        self.assertEqual(read_file(os.path.join(self.dest, "index.css")), "body {}")
+
+    def test_invalid_link_mode(self):
+        """Test that an unknown link mode is rejected."""
+        self.assertRaises(ValueError, sync_tree, self.src, self.dest, link="symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+Test the Template class.
+"""
+import io
+import os
+import pickle
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import Template, TemplateError, load_template
+from testutil import TempDirTestCase
+
+
+class TestTemplate(TempDirTestCase):
+    """Test the Template class."""
+    def write(self, name, text):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_compile(self):
+        """Test that a template compiles into literals and slots."""
+        template = Template.compile(self.write("page.html", "<title>{{ Title }}</title>{{Content}}!"))
+        self.assertEqual(template.segments, ["<title>", ("Title",), "</title>", ("Content",), "!"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_render(self):
+        """Test that render fills slots, renders HtmlNodes and leaves unknown slots empty."""
+        template = Template.compile(self.write("page.html", "<h1>{{ Title }}</h1>{{ Content }}{{ Nav }}"))
+        content = ParentNode("p", [LeafNode("b", "bold")])
+        self.assertEqual(
+            template.render({"Title": "Home", "Content": content}),
+            "<h1>Home</h1><p><b>bold</b></p>",
+        )
+
+    def test_render_to(self):
+        """Test that render_to streams the same output as render."""
+        template = Template.compile(self.write("page.html", "<h1>{{ Title }}</h1>{{ Content }}"))
+        variables = {"Title": "Home", "Content": ParentNode("p", [LeafNode(None, "text")])}
+        writer = io.StringIO()
+        template.render_to(writer, variables)
+        self.assertEqual(writer.getvalue(), template.render(variables))
+
+    def test_partial(self):
+        """Test that partials are inlined at compile time and tracked as dependencies."""
+        self.write("head.html", "<head>{{ Title }}</head>")
+        page = self.write("page.html", "<html>{{> head.html }}<body>{{ Content }}</body></html>")
+        template = Template.compile(page)
+        self.assertEqual(template.segments, ["<html><head>", ("Title",), "</head><body>", ("Content",), "</body></html>"])
+        self.assertEqual(len(template.dependencies), 2)
+
+    def test_from_string(self):
+        """Test that template text compiles like a file, with includes relative to its path."""
+        self.write("head.html", "<head>{{ Title }}</head>")
+        template = Template.from_string("{{> head.html }}{{ Content }}", os.path.join(self.tmp.name, "page.html"))
+        self.assertEqual(template.segments, ["<head>", ("Title",), "</head>", ("Content",)])
+        self.assertEqual(template.digest, Template.from_string("{{> head.html }}{{ Content }}", template.path).digest)
+
+    def test_bind(self):
+        """Test that bound slots become literals and change the digest."""
+        template = Template.compile(self.write("page.html", "{{ Nav }}<h1>{{ Title }}</h1>"))
+        bound = template.bind({"Nav": LeafNode("nav", "links")})
+        self.assertEqual(bound.segments, ["<nav>links</nav><h1>", ("Title",), "</h1>"])
+        self.assertNotEqual(bound.digest, template.digest)
+        self.assertEqual(bound.digest, template.bind({"Nav": "<nav>links</nav>"}).digest)
+
+    def test_include_cycle(self):
+        """Test that a partial including itself is rejected."""
+        page = self.write("page.html", "{{> page.html }}")
+        self.assertRaises(TemplateError, Template.compile, page)
+
+    def test_pickle(self):
+        """Test that a compiled template survives pickling for worker processes."""
+        template = Template.compile(self.write("page.html", "<h1>{{ Title }}</h1>"))
+        copy = pickle.loads(pickle.dumps(template))
+        self.assertEqual(copy.render({"Title": "Home"}), "<h1>Home</h1>")
+        self.assertEqual(copy.digest, template.digest)
+
+    def test_load_template_cache(self):
+        """Test that load_template reuses a compiled template until a file changes."""
+        self.write("head.html", "<head></head>")
+        page = self.write("page.html", "{{> head.html }}{{ Content }}")
+        template = load_template(page)
+        self.assertIs(load_template(page), template)
+
+        self.write("head.html", "<head>changed</head>")
+        os.utime(os.path.join(self.tmp.name, "head.html"), ns=(0, 0))
+        reloaded = load_template(page)
+        self.assertIsNot(reloaded, template)
+        self.assertNotEqual(reloaded.digest, template.digest)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,20 @@
+import tracemalloc
 import unittest
 
-from textnode import TextNode
+from textnode import TextNode, iter_markdown_blocks, markdown_to_blocks, markdown_to_html_node
+
+
+SAMPLE_BLOCKS = (
+    "# Heading with **bold** text",
+    "A paragraph with *italic*, `code` and a [link](https://example.com).",
+    "```\nprint('hello')\nprint('world')\n```",
+    "> a quoted line\n> another quoted line",
+    "* first item\n* second item\n* third item",
+    "1. first\n2. second\n3. third\n4. fourth\n5. fifth",
+)
+
+# Peak traced bytes allowed while parsing 1 MB of markdown into an HtmlNode tree.
+PEAK_BYTES_PER_MB = 32 * 1024 * 1024
 
 
 class TestTextNode(unittest.TestCase):
@@ -20,6 +34,50 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", "bold")
         self.assertNotEqual(node, node2)
 
+    def test_slots(self):
+        node = TextNode("This is a text node", "bold")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertRaises(AttributeError, setattr, node, "extra", 1)
+
+    def test_parse_memory_peak(self):
+        blocks = []
+        size = 0
+        while size < 1024 * 1024:
+            block = SAMPLE_BLOCKS[len(blocks) % len(SAMPLE_BLOCKS)]
+            blocks.append(block)
+            size += len(block) + 2
+        markdown = "\n\n".join(blocks)
+
+        tracemalloc.start()
+        try:
+            node = markdown_to_html_node(markdown)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(len(node.children), len(blocks))
+        self.assertLess(peak, PEAK_BYTES_PER_MB)
+
+    def test_iter_markdown_blocks(self):
+        markdown = "\n\n  # Title \n\n\n\nText\nmore\n\n\n* a\n* b\n\n \n\n```\ncode\n```\n"
+        for size in (1, 2, 3, 7, len(markdown)):
+            chunks = [markdown[i:i + size] for i in range(0, len(markdown), size)]
+            self.assertEqual(list(iter_markdown_blocks(chunks)), markdown_to_blocks(markdown))
+
+    def test_iter_markdown_blocks_memory_peak(self):
+        block = "A paragraph with *italic*, `code` and a [link](https://example.com)."
+        chunks = (block + "\n\n" for _ in range(100_000))
+
+        tracemalloc.start()
+        try:
+            count = sum(1 for _ in iter_markdown_blocks(chunks))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(count, 100_000)
+        self.assertLess(peak, 64 * 1024)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,203 @@
+"""
+Test the Watcher class.
+"""
+import contextlib
+import io
+import os
+import shutil
+import unittest
+from unittest import mock
+
+import navigation
+import testutil
+from main import main
+from testutil import TempDirTestCase, read_file
+from watch import BUILD_ID_NAME, DependencyGraph, Snapshot, Watcher
+
+
+def write_file(path, text):
+    testutil.write_file(path, text)
+    # Make each edit visible to the stat snapshot even within one mtime tick.
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestDependencyGraph(unittest.TestCase):
+    """Test the DependencyGraph class."""
+    def test_affected(self):
+        """Test that outputs are found from any of their inputs and edges can be replaced."""
+        graph = DependencyGraph()
+        graph.set_inputs("a", ["a.md", "template.html"])
+        graph.set_inputs("b", ["b.md", "template.html"])
+        self.assertEqual(graph.affected(["template.html"]), {"a", "b"})
+        self.assertEqual(graph.affected(["a.md"]), {"a"})
+
+        graph.set_inputs("a", ["a.md"])
+        self.assertEqual(graph.affected(["template.html"]), {"b"})
+        graph.remove("b")
+        self.assertEqual(graph.dependents, {"a.md": {"a"}})
+
+
+class TestSnapshot(TempDirTestCase):
+    """Test the Snapshot class."""
+    def setUp(self):
+        super().setUp()
+        self.root = os.path.join(self.tmp.name, "content")
+        self.page = os.path.join(self.root, "a", "index.md")
+        write_file(self.page, "# A")
+        self.snapshot = Snapshot([self.root], sweep_every=3)
+
+    def test_directory_changes(self):
+        """Test that added and removed files and directories are found on the next refresh"""
+        added = os.path.join(self.root, "b", "c", "index.md")
+        write_file(added, "# C")
+        self.assertEqual(self.snapshot.refresh(), {added})
+        os.remove(self.page)
+        self.assertEqual(self.snapshot.refresh(), {self.page})
+        testutil.write_file(self.page, "# A")
+        shutil.rmtree(os.path.join(self.root, "b"))
+        self.assertEqual(self.snapshot.refresh(), {self.page, added})
+        self.assertEqual(list(self.snapshot.files), [self.page])
+
+    def test_edits_in_place(self):
+        """Test that an edit in place is found by the sweep, then at once while the file stays recent"""
+        write_file(self.page, "# A again")
+        self.assertEqual(self.snapshot.refresh(), set())
+        self.assertEqual(self.snapshot.refresh(), set())
+        self.assertEqual(self.snapshot.refresh(), {self.page})
+        write_file(self.page, "# A once more")
+        self.assertEqual(self.snapshot.refresh(), {self.page})
+
+
+class TestWatcher(TempDirTestCase):
+    """Test the Watcher class."""
+    def setUp(self):
+        super().setUp()
+        root = self.tmp.name
+        self.content = os.path.join(root, "content")
+        self.static = os.path.join(root, "static")
+        self.public = os.path.join(root, "public")
+        self.template = os.path.join(root, "template.html")
+        write_file(self.template, "<body>{{ Content }}</body>")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "about", "index.md"), "# About")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+
+        self.build()
+
+    def build(self, **options):
+        # Sweep every check: the tests edit files in place.
+        self.watcher = Watcher(
+            self.content, self.template, self.static, self.public, live_reload=False, sweep_every=1, **options,
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.watcher.build_all()
+
+    def check(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return [os.path.relpath(path, self.content) for path in self.watcher.check()]
+
+    def test_build_all(self):
+        """Test that the first build writes pages, syncs static files and publishes a build id."""
+        self.assertEqual(read_file(os.path.join(self.public, "about", "index.html")), "<body><div><h1>About</h1></div></body>")
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, BUILD_ID_NAME)))
+        self.assertEqual(self.check(), [])
+
+    def test_page_edit(self):
+        """Test that editing one page rebuilds only that page and bumps the build id."""
+        build_id = read_file(os.path.join(self.public, BUILD_ID_NAME))
+        write_file(os.path.join(self.content, "about", "index.md"), "# About us")
+        self.assertEqual(self.check(), [os.path.join("about", "index.md")])
+        self.assertEqual(read_file(os.path.join(self.public, "about", "index.html")), "<body><div><h1>About us</h1></div></body>")
+        self.assertNotEqual(read_file(os.path.join(self.public, BUILD_ID_NAME)), build_id)
+
+    def test_template_edit(self):
+        """Test that a template edit re-renders every page from memory."""
+        write_file(self.template, "<main>{{ Content }}</main>")
+        self.assertEqual(sorted(self.check()), [os.path.join("about", "index.md"), "index.md"])
+        self.assertEqual(read_file(os.path.join(self.public, "index.html")), "<main><div><h1>Home</h1></div></main>")
+
+    def test_add_and_remove_pages(self):
+        """Test that new pages are built and deleted pages lose their output."""
+        write_file(os.path.join(self.content, "new", "index.md"), "# New")
+        os.remove(os.path.join(self.content, "about", "index.md"))
+        self.assertEqual(self.check(), [os.path.join("new", "index.md")])
+        self.assertTrue(os.path.exists(os.path.join(self.public, "new", "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "about")))
+
+    def test_remove_page_sharing_an_output(self):
+        """Test that deleting a page that shared an output rebuilds the page that remains."""
+        shared = os.path.join(self.content, "about", "other.md")
+        write_file(shared, "# About too")
+        self.check()
+        self.assertIn("About too", read_file(os.path.join(self.public, "about", "index.html")))
+        os.remove(shared)
+        self.assertEqual(self.check(), [os.path.join("about", "index.md")])
+        self.assertIn("<h1>About</h1>", read_file(os.path.join(self.public, "about", "index.html")))
+
+    def test_broken_page(self):
+        """Test that a page error is reported on stderr and the watch keeps going."""
+        write_file(os.path.join(self.content, "about", "index.md"), "no heading")
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(self.check(), [])
+        self.assertIn("No heading", err.getvalue())
+        write_file(os.path.join(self.content, "about", "index.md"), "# Fixed")
+        self.assertEqual(self.check(), [os.path.join("about", "index.md")])
+
+    def test_page_broken_from_the_start(self):
+        """Test that a page that never rendered is built once its source is fixed."""
+        page = os.path.join(self.content, "new", "index.md")
+        write_file(page, "")
+        with contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(self.check(), [])
+        write_file(page, "# New page")
+        self.assertEqual(self.check(), [os.path.join("new", "index.md")])
+        self.assertIn("New page", read_file(os.path.join(self.public, "new", "index.html")))
+
+    def test_static_edit(self):
+        """Test that a static edit is synced without rebuilding pages."""
+        write_file(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.assertEqual(self.check(), [])
+        self.assertEqual(read_file(os.path.join(self.public, "index.css")), "body { color: red }")
+
+    def test_nav(self):
+        """Test that nav metadata is read only for edited pages and a retitle rebuilds every page."""
+        write_file(self.template, "<nav>{{ Nav }}</nav>{{ Content }}")
+        self.build()
+        self.assertIn(">About</a>", read_file(os.path.join(self.public, "index.html")))
+
+        with mock.patch.object(navigation, "page_metadata", wraps=navigation.page_metadata) as page_metadata:
+            write_file(os.path.join(self.content, "about", "index.md"), "# About us")
+            self.assertEqual(sorted(self.check()), [os.path.join("about", "index.md"), "index.md"])
+        self.assertEqual(page_metadata.call_count, 1)
+        self.assertIn(">About us</a>", read_file(os.path.join(self.public, "index.html")))
+
+    def test_fingerprint(self):
+        """Test that pages follow the fingerprinted url of an edited asset."""
+        write_file(self.template, '<link href="/index.css">{{ Content }}')
+        self.build(fingerprint=True)
+        before = read_file(os.path.join(self.public, "index.html"))
+        self.assertRegex(before, r'href="/index\.\w+\.css"')
+        write_file(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.assertEqual(sorted(self.check()), [os.path.join("about", "index.md"), "index.md"])
+        self.assertNotEqual(read_file(os.path.join(self.public, "index.html")), before)
+
+    def test_unsupported_options(self):
+        """Test that build options the watch cannot honor are rejected."""
+        with contextlib.redirect_stderr(io.StringIO()) as err, self.assertRaises(SystemExit):
+            main(["--watch", "--jobs", "4", "--search"])
+        self.assertIn("not supported with --watch: --jobs --search", err.getvalue())
+
+    def test_live_reload_script(self):
+        """Test that live reload injects the event-source script before </body>."""
+        self.watcher.live_reload = True
+        write_file(os.path.join(self.content, "index.md"), "# Home again")
+        self.check()
+        html = read_file(os.path.join(self.public, "index.html"))
+        self.assertIn("EventSource", html)
+        self.assertTrue(html.endswith("</script></body>"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+"""
+Helpers shared by the test modules.
+"""
+import os
+import tempfile
+import unittest
+
+
+def write_file(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read_file(path):
+    with open(path, "r") as f:
+        return f.read()
+
+
+class TempDirTestCase(unittest.TestCase):
+    """A test case with a fresh temporary directory in self.tmp, removed after each test."""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
@@ -1,13 +1,18 @@
 """
 Defines the TextNode class for representing text nodes.
 """
+import hashlib
+import json
 import re
+import threading
+import time
 
 from htmlnode import LeafNode, HtmlNode, ParentNode
 
 
 class TextNode:
     """Represents a text node with text, type, and URL."""
+    __slots__ = ("text", "text_type", "url")
 
     def __init__(self, text, text_type, url=None):
         self.text = text
@@ -38,20 +43,47 @@ BLOCK_TYPE_ORDERED_LIST = "ordered_list"
 TEXT_TYPES = [TEXT_TYPE_TEXT, TEXT_TYPE_CODE, TEXT_TYPE_BOLD, TEXT_TYPE_ITALIC, TEXT_TYPE_IMAGE, TEXT_TYPE_LINK]
 
 
-def text_node_to_html_node(text_node):
-    """Convert a text node into a leaf node"""
-    if text_node.text_type == "text":
-        return LeafNode(None, text_node.text)
-    if text_node.text_type == "bold":
-        return LeafNode("b", text_node.text)
-    if text_node.text_type == "italic":
-        return LeafNode("i", text_node.text)
-    if text_node.text_type == "code":
-        return LeafNode("code", text_node.text)
-    if text_node.text_type == "link":
-        return LeafNode("a", text_node.text, {"href": text_node.url})
-    if text_node.text_type == "image":
-        return LeafNode("img", "", {"src": text_node.url, "alt": text_node.text})
+TEXT_TYPE_TAGS = {
+    TEXT_TYPE_TEXT: None,
+    TEXT_TYPE_BOLD: "b",
+    TEXT_TYPE_ITALIC: "i",
+    TEXT_TYPE_CODE: "code",
+}
+
+
+class AssetUrls(dict):
+    """Link and image urls mapped to their fingerprinted names, e.g. {"/a.png": "/a.1f2e.png"}.
+
+    digest identifies the mapping for caches of rendered HTML; do not
+    change an AssetUrls once made.
+    """
+    def __init__(self, urls=()):
+        super().__init__(urls)
+        self.digest = hashlib.blake2b(
+            json.dumps(self, sort_keys=True).encode(), digest_size=16,
+        ).digest() if self else b""
+
+
+NO_ASSET_URLS = AssetUrls()
+
+
+def as_asset_urls(urls):
+    """Accept an AssetUrls, a plain dict or None."""
+    if isinstance(urls, AssetUrls):
+        return urls
+    return AssetUrls(urls) if urls else NO_ASSET_URLS
+
+
+def text_node_to_html_node(text_node, asset_urls=None):
+    """Convert a text node into a leaf node, pointing links and images at asset_urls where it maps them"""
+    text_type = text_node.text_type
+    if text_type in TEXT_TYPE_TAGS:
+        return LeafNode(TEXT_TYPE_TAGS[text_type], text_node.text)
+    url = asset_urls.get(text_node.url, text_node.url) if asset_urls else text_node.url
+    if text_type == TEXT_TYPE_LINK:
+        return LeafNode("a", text_node.text, (("href", url),))
+    if text_type == TEXT_TYPE_IMAGE:
+        return LeafNode("img", "", (("src", url), ("alt", text_node.text)))
     raise ValueError(f"Invalid text type: {text_node.text_type}")
 
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
@@ -71,212 +103,334 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type):
             )
     return new_nodes
 
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"\[(.*?)\]\((.*?)\)")
+
+
 def extract_markdown_images(text):
     """Extract markdown images from a string"""
-    return re.findall(r"!\[(.*?)\]\((.*?)\)", text)
+    return IMAGE_PATTERN.findall(text)
 
 def extract_markdown_links(text):
     """Extract markdown links from a string"""
-    return re.findall(r"\[(.*?)\]\((.*?)\)", text)
+    return LINK_PATTERN.findall(text)
 
-def split_nodes_image(old_nodes):
-    """Split markdown image from TextNode"""
-    images = []
+def split_nodes_pattern(old_nodes, pattern, text_type):
+    """Split every match of pattern out of the text nodes, walking each string once"""
     new_nodes = []
 
     for node in old_nodes:
         if len(node.text) == 0:
             continue
-        images = extract_markdown_images(node.text)
-
-        if len(images) == 0:
+        if node.text_type != TEXT_TYPE_TEXT:
             new_nodes.append(node)
+            continue
 
-        last_entry = ""
-
-        for i in range(0, len(images)):
-            split_image = node.text.split(f"![{images[i][0]}]({images[i][1]})", 1)
-            if i == len(images) - 1:
-                new_nodes.append(TextNode(split_image[0].replace(last_entry, ""), TEXT_TYPE_TEXT))
-                new_nodes.append(TextNode(images[i][0], TEXT_TYPE_IMAGE, images[i][1]))
-
-                if split_image[1] != "":
-                    new_nodes.append(TextNode(split_image[1], TEXT_TYPE_TEXT))
-            else:
-                new_nodes.append(TextNode(split_image[0].replace(last_entry, ""), TEXT_TYPE_TEXT))
-                new_nodes.append(TextNode(images[i][0], TEXT_TYPE_IMAGE, images[i][1]))
+        position = 0
+        for match in pattern.finditer(node.text):
+            new_nodes.append(TextNode(node.text[position:match.start()], TEXT_TYPE_TEXT))
+            new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+            position = match.end()
 
-            last_entry = f"{split_image[0]}![{images[i][0]}]({images[i][1]})"
+        if position == 0:
+            new_nodes.append(node)
+        elif position < len(node.text):
+            new_nodes.append(TextNode(node.text[position:], TEXT_TYPE_TEXT))
 
     return new_nodes
 
+def split_nodes_image(old_nodes):
+    """Split markdown image from TextNode"""
+    return split_nodes_pattern(old_nodes, IMAGE_PATTERN, TEXT_TYPE_IMAGE)
 
 def split_nodes_link(old_nodes):
     """Split markdown link from TextNode"""
-    links = []
-    new_nodes = []
-
-    for node in old_nodes:
-        if len(node.text) == 0:
-            continue
-        links = extract_markdown_links(node.text)
+    return split_nodes_pattern(old_nodes, LINK_PATTERN, TEXT_TYPE_LINK)
 
-        if len(links) == 0:
-            new_nodes.append(node)
+class _Finder:
+    """Memoized str.find for a needle whose search start only moves forward"""
 
-        last_entry = ""
+    def __init__(self, text, needle):
+        self.text = text
+        self.needle = needle
+        self.pos = -2
 
-        for i in range(0, len(links)):
-            split_image = node.text.split(f"[{links[i][0]}]({links[i][1]})", 1)
-            if i == len(links) - 1:
-                new_nodes.append(TextNode(split_image[0].replace(last_entry, ""), TEXT_TYPE_TEXT))
-                new_nodes.append(TextNode(links[i][0], TEXT_TYPE_LINK, links[i][1]))
+    def find(self, start):
+        if self.pos == -1 or self.pos >= start:
+            return self.pos
+        self.pos = self.text.find(self.needle, start)
+        return self.pos
 
-                if split_image[1] != "":
-                    new_nodes.append(TextNode(split_image[1], TEXT_TYPE_TEXT))
-            else:
-                new_nodes.append(TextNode(split_image[0].replace(last_entry, ""), TEXT_TYPE_TEXT))
-                new_nodes.append(TextNode(links[i][0], TEXT_TYPE_LINK, links[i][1]))
 
-            last_entry = f"{split_image[0]}[{links[i][0]}]({links[i][1]})"
+INLINE_MARKERS = re.compile(r"[*`\[!]")
+INLINE_DELIMITERS = (
+    ("**", TEXT_TYPE_BOLD),
+    ("*", TEXT_TYPE_ITALIC),
+    ("`", TEXT_TYPE_CODE),
+)
 
-    return new_nodes
 
 def text_to_textnodes(text):
-    """Convert text into a list of textnodes"""
-    text_node = TextNode(text, TEXT_TYPE_TEXT)
-    old_nodes = split_nodes_delimiter([text_node], "**", TEXT_TYPE_BOLD)
-    old_nodes = split_nodes_delimiter(old_nodes, "*", TEXT_TYPE_ITALIC)
-    old_nodes = split_nodes_delimiter(old_nodes, "`", TEXT_TYPE_CODE)
-    old_nodes = split_nodes_image(old_nodes)
-    old_nodes = split_nodes_link(old_nodes)
+    """Convert text into a list of textnodes in a single left-to-right pass"""
+    nodes = []
+    finders = {}
+
+    def finder(needle):
+        if needle not in finders:
+            finders[needle] = _Finder(text, needle)
+        return finders[needle]
+
+    def bracket_end(start):
+        """Return (label, url, end) for `[label](url)` opening at start, or None"""
+        newline = finder("\n").find(start)
+        close = finder("](").find(start + 1)
+        if close == -1 or (newline != -1 and close > newline):
+            return None
+        paren = finder(")").find(close + 2)
+        if paren == -1 or (newline != -1 and paren > newline):
+            return None
+        return text[start + 1:close], text[close + 2:paren], paren + 1
+
+    length = len(text)
+    plain_start = 0
+    marker = INLINE_MARKERS.search(text)
+    while marker is not None:
+        i = marker.start()
+        char = text[i]
+        token = None
+
+        if char == "!" and text.startswith("[", i + 1):
+            match = bracket_end(i + 1)
+            if match is not None:
+                token = (TextNode(match[0], TEXT_TYPE_IMAGE, match[1]), match[2])
+        elif char == "[":
+            match = bracket_end(i)
+            if match is not None:
+                token = (TextNode(match[0], TEXT_TYPE_LINK, match[1]), match[2])
+        elif char == "*" or char == "`":
+            for delimiter, text_type in INLINE_DELIMITERS:
+                if text.startswith(delimiter, i):
+                    end = finder(delimiter).find(i + len(delimiter))
+                    if end != -1:
+                        token = (TextNode(text[i + len(delimiter):end], text_type), end + len(delimiter))
+                    break
+
+        if token is None:
+            marker = INLINE_MARKERS.search(text, i + 1)
+            continue
+
+        if plain_start < i:
+            nodes.append(TextNode(text[plain_start:i], TEXT_TYPE_TEXT))
+        nodes.append(token[0])
+        plain_start = token[1]
+        marker = INLINE_MARKERS.search(text, plain_start)
 
-    return old_nodes
+    if plain_start < length:
+        nodes.append(TextNode(text[plain_start:], TEXT_TYPE_TEXT))
+
+    return nodes
 
 def markdown_to_blocks(markdown):
     """Split markdown text into blocks, removing leading/trailing whitespace and extra newlines."""
     blocks = [block.strip() for block in markdown.strip().split("\n\n")]
     return [block for block in blocks if block]
 
-def ordered_list_helper(text):
-    ordered_list_num = 1
-    res = True
+def iter_markdown_blocks(chunks):
+    """Yield the blocks markdown_to_blocks would return for "".join(chunks), as each one completes.
 
-    for t in text.split("\n"):
-        trimmed_t = t.strip()
-        regex = rf"^({ordered_list_num}\. )((.|\n)*?)(?=([\d]+\.)|($))"
-        if not re.search(regex, trimmed_t):
-            res = False
-        
-        ordered_list_num += 1
+    Only the unfinished block is held in memory, so a file read in pieces
+    never needs to be loaded whole.
+    """
+    parts = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        start = 0
+        if parts and parts[-1].endswith("\n") and chunk.startswith("\n"):
+            # The separator straddles two chunks.
+            parts[-1] = parts[-1][:-1]
+            block = "".join(parts).strip()
+            if block:
+                yield block
+            parts = []
+            start = 1
+        end = chunk.find("\n\n", start)
+        while end != -1:
+            parts.append(chunk[start:end])
+            block = "".join(parts).strip()
+            if block:
+                yield block
+            parts = []
+            start = end + 2
+            end = chunk.find("\n\n", start)
+        if start < len(chunk):
+            parts.append(chunk[start:])
+    block = "".join(parts).strip()
+    if block:
+        yield block
+
+HEADING_PATTERN = re.compile(r"#{1,6} \w")
+QUOTE_PATTERN = re.compile(r"> \w")
+UNORDERED_LIST_PATTERN = re.compile(r"[*-] \w")
 
-    return res
+
+def ordered_list_helper(text):
+    """Check that every line starts with its 1-based number, e.g. `1. `, `2. `"""
+    for number, line in enumerate(text.split("\n"), 1):
+        if not line.strip().startswith(f"{number}. "):
+            return False
+    return True
+
+def is_code_block(block):
+    """Check for a fenced block without scanning its body"""
+    return len(block) >= 6 and block.startswith("```") and block.endswith("```")
 
 def block_to_block_type(markdown):
-    if re.search(r"^(#{1,6} \w+)", markdown):
+    if HEADING_PATTERN.match(markdown):
         return BLOCK_TYPE_HEADING
-    if re.search(r"^(`{3})(.|\n)*\1$", markdown):
+    if is_code_block(markdown):
         return BLOCK_TYPE_CODE
-    if re.search(r"^(>{1} \w+)", markdown):
+    if QUOTE_PATTERN.match(markdown):
         return BLOCK_TYPE_QUOTE
-    if re.search(r"^((\*|-){1} \w+)", markdown):
+    if UNORDERED_LIST_PATTERN.match(markdown):
         return BLOCK_TYPE_UNORDERED_LIST
-    if re.search(r"^(1\. )((.|\n)*?)(?=([\d]+\.)|($))", markdown):
-        if ordered_list_helper(markdown):
-            return BLOCK_TYPE_ORDERED_LIST
-        else:
-            return BLOCK_TYPE_PARAGRAPH
-    
+    if markdown.startswith("1. ") and ordered_list_helper(markdown):
+        return BLOCK_TYPE_ORDERED_LIST
+
     return BLOCK_TYPE_PARAGRAPH
 
-def text_to_children(text):
-    text_nodes = text_to_textnodes(text)
+# Seconds this thread spent in text_to_textnodes while markdown_to_html_node
+# is collecting stage timings; unset otherwise.
+_inline_clock = threading.local()
+
+def inline_textnodes(text):
+    """text_to_textnodes, timed while markdown_to_html_node collects stage timings."""
+    seconds = getattr(_inline_clock, "seconds", None)
+    if seconds is None:
+        return text_to_textnodes(text)
+    start = time.perf_counter()
+    nodes = text_to_textnodes(text)
+    _inline_clock.seconds = seconds + time.perf_counter() - start
+    return nodes
+
+def text_to_children(text, asset_urls=None):
+    text_nodes = inline_textnodes(text)
     children = []
     for text_node in text_nodes:
-        html_node = text_node_to_html_node(text_node)
+        html_node = text_node_to_html_node(text_node, asset_urls)
         children.append(html_node)
     return children
 
-def convert_block_to_html_nodes(block):
-    text_nodes = text_to_textnodes(block)
+def convert_block_to_html_nodes(block, asset_urls=None):
+    text_nodes = inline_textnodes(block)
 
     html_nodes = []
     for node in text_nodes:
-        html_nodes.append(text_node_to_html_node(node))
+        html_nodes.append(text_node_to_html_node(node, asset_urls))
 
     return html_nodes
 
-def block_to_blockquote(block):
-    html_nodes = convert_block_to_html_nodes(block)
+def block_to_blockquote(block, asset_urls=None):
+    html_nodes = convert_block_to_html_nodes(block, asset_urls)
     for node in html_nodes:
         if node.tag == None:
             node.value = node.value.strip(r"^(>{1} \w+)")
     return ParentNode("blockquote", html_nodes)
 
-def block_to_unordered_list(block):
+def block_to_unordered_list(block, asset_urls=None):
     items = block.split("\n")
     html_items = []
     for item in items:
-        text = item[3:]
-        children = text_to_children(text)
+        text = item[2:]
+        children = text_to_children(text, asset_urls)
         html_items.append(ParentNode("li", children))
     return ParentNode("ul", html_items)
 
-def block_to_ordered_list(block):
+def block_to_ordered_list(block, asset_urls=None):
     items = block.split("\n")
     html_items = []
     for item in items:
-        text = item[3:]
-        children = text_to_children(text)
+        text = item.split(". ", 1)[1]
+        children = text_to_children(text, asset_urls)
         html_items.append(ParentNode("li", children))
     return ParentNode("ol", html_items)
 
-def block_to_code(block):
-    if not block.startswith("```") or not block.endswith("```"):
+def block_to_code(block, asset_urls=None):
+    if not is_code_block(block):
         raise ValueError("Invalid code block")
     text = block[4:-3]
-    children = text_to_children(text)
+    children = text_to_children(text, asset_urls)
     code = ParentNode("code", children)
     return ParentNode("pre", [code])
 
-def block_to_heading(block):
+def block_to_heading(block, asset_urls=None):
     split = block.split('#')
     heading_type = len(split) - 1
 
-    html_nodes = convert_block_to_html_nodes(block)
+    html_nodes = convert_block_to_html_nodes(block, asset_urls)
     for node in html_nodes:
         if node.tag == None:
             node.value = node.value.strip(r"^(#{1,6} \w+)")
 
     return ParentNode(f"h{heading_type}", html_nodes)
 
-def block_to_paragraph(block):
-    html_nodes = convert_block_to_html_nodes(block)
+def block_to_paragraph(block, asset_urls=None):
+    html_nodes = convert_block_to_html_nodes(block, asset_urls)
 
     return ParentNode("p", html_nodes, None)
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    content = []
-
-    for block in blocks:
-        if block_to_block_type(block) == BLOCK_TYPE_PARAGRAPH:
-            p = block_to_paragraph(block)
-            content.append(p)
-        if block_to_block_type(block) == BLOCK_TYPE_CODE:
-            code = block_to_code(block)
-            content.append(code)
-        if block_to_block_type(block) == BLOCK_TYPE_QUOTE:
-            blockquote = block_to_blockquote(block)
-            content.append(blockquote)
-        if block_to_block_type(block) == BLOCK_TYPE_HEADING:
-            heading = block_to_heading(block)
-            content.append(heading)
-        if block_to_block_type(block) == BLOCK_TYPE_UNORDERED_LIST:
-            ulist = block_to_unordered_list(block)
-            content.append(ulist)
-        if block_to_block_type(block) == BLOCK_TYPE_ORDERED_LIST:
-            olist = block_to_ordered_list(block)
-            content.append(olist)
-    return ParentNode("div", content, None)
-
+BLOCK_BUILDERS = {
+    BLOCK_TYPE_PARAGRAPH: block_to_paragraph,
+    BLOCK_TYPE_CODE: block_to_code,
+    BLOCK_TYPE_QUOTE: block_to_blockquote,
+    BLOCK_TYPE_HEADING: block_to_heading,
+    BLOCK_TYPE_UNORDERED_LIST: block_to_unordered_list,
+    BLOCK_TYPE_ORDERED_LIST: block_to_ordered_list,
+}
+
+def block_to_html_node(block, cache=None, block_type=None, asset_urls=None):
+    """Build the node for one block, or a raw-HTML leaf when it goes through a BlockCache.
+
+    Cached fragments are keyed by the block and the digest of asset_urls.
+    """
+    if cache is None:
+        return BLOCK_BUILDERS[block_type or block_to_block_type(block)](block, asset_urls)
+    asset_urls = as_asset_urls(asset_urls)
+    html = cache.get(block, asset_urls.digest)
+    if html is None:
+        html = BLOCK_BUILDERS[block_type or block_to_block_type(block)](block, asset_urls).to_html()
+        cache.put(block, html, asset_urls.digest)
+    return LeafNode(None, html)
+
+def markdown_to_html_node(markdown, cache=None, timings=None, asset_urls=None):
+    """Build the HtmlNode tree for a document.
+
+    With a BlockCache, each block becomes a raw-HTML leaf holding its
+    rendered fragment, looked up by the block's text before parsing it.
+    With a timings dict, the seconds spent splitting and classifying blocks,
+    parsing inline markup and building nodes are added to its "blocks",
+    "inline" and "render" entries. asset_urls rewrites link and image urls.
+    """
+    asset_urls = as_asset_urls(asset_urls)
+    if timings is None:
+        return ParentNode("div", [
+            block_to_html_node(block, cache, asset_urls=asset_urls) for block in markdown_to_blocks(markdown)
+        ], None)
+
+    start = time.perf_counter()
+    blocks = [(block, block_to_block_type(block)) for block in markdown_to_blocks(markdown)]
+    parsed = time.perf_counter()
+    _inline_clock.seconds = 0.0
+    try:
+        node = ParentNode("div", [
+            block_to_html_node(block, cache, block_type, asset_urls) for block, block_type in blocks
+        ], None)
+        inline = _inline_clock.seconds
+    finally:
+        _inline_clock.seconds = None
+    rendered = time.perf_counter()
+
+    timings["blocks"] = timings.get("blocks", 0.0) + parsed - start
+    timings["inline"] = timings.get("inline", 0.0) + inline
+    timings["render"] = timings.get("render", 0.0) + rendered - parsed - inline
+    return node
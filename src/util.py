@@ -0,0 +1,41 @@
+"""
+This module holds the small helpers that the output stages share.
+"""
+import json
+import os
+
+# Suffixes of the precompressed siblings that compress.py writes next to an output file.
+COMPRESSED_SUFFIXES = (".gz", ".br", ".zst")
+
+
+def page_url(dest_path, dest_dir_path):
+    rel_path = os.path.relpath(dest_path, dest_dir_path).replace(os.sep, "/")
+    return "/" if rel_path == "." else f"/{rel_path}/"
+
+
+def write_json(path, data, sort_keys=False):
+    """Write data to path as compact JSON, atomically, creating the directory if needed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def map_pages(function, paths, jobs):
+    """Map function over paths in order, in a process pool when jobs > 1."""
+    if jobs <= 1 or len(paths) <= 1:
+        yield from map(function, paths)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(function, paths, chunksize=64)
@@ -0,0 +1,359 @@
+"""
+This module contains the watch mode: poll sources and rebuild only what changed.
+"""
+import os
+import sys
+import time
+
+from blockcache import BlockCache
+from fingerprint import fingerprint_assets, remove_fingerprints
+from main import discover_pages, read_page
+from manifest import MANIFEST_NAME, remove_empty_dirs
+from sync import sync_tree
+from template import load_template
+from textnode import as_asset_urls
+
+# Read by server.py's live-reload endpoint; rewritten after every rebuild.
+BUILD_ID_NAME = ".build-id"
+LIVE_RELOAD_SCRIPT = (
+    '<script>(() => { let id; new EventSource("/__livereload").onmessage = (e) => {'
+    ' if (id && id !== e.data) location.reload(); id = e.data; }; })();</script>'
+)
+# Build options the watch cannot honor; main rejects them along with --watch.
+UNSUPPORTED_OPTIONS = (
+    "--jobs", "--daemon", "--socket", "--search", "--shard", "--merge", "--listings", "--sitemap",
+    "--publish", "--rollback", "--report", "--profile",
+)
+# Every file is statted once per this many polls, a second at the default
+# interval; in between only directories and recently changed files are.
+SWEEP_EVERY = 20
+RECENT_FILES = 64
+
+
+class DependencyGraph:
+    """Maps input files to the outputs built from them, in both directions."""
+    def __init__(self):
+        self.dependents = {}
+        self.inputs = {}
+
+    def set_inputs(self, output, inputs):
+        self.remove(output)
+        self.inputs[output] = set(inputs)
+        for path in inputs:
+            self.dependents.setdefault(path, set()).add(output)
+
+    def remove(self, output):
+        for path in self.inputs.pop(output, ()):
+            outputs = self.dependents.get(path)
+            if outputs is not None:
+                outputs.discard(output)
+                if not outputs:
+                    del self.dependents[path]
+
+    def affected(self, paths):
+        """Return every output built from any of paths."""
+        outputs = set()
+        for path in paths:
+            outputs |= self.dependents.get(path, set())
+        return outputs
+
+
+class Snapshot:
+    """The (mtime_ns, size) of every file under some roots, refreshed without statting them all each poll.
+
+    A refresh stats every directory and rescans only those whose mtime
+    moved, which catches files being added, removed or replaced by an
+    editor's atomic save. Files edited in place are caught by statting the
+    recently changed ones on every refresh and all of them every
+    sweep_every refreshes.
+    """
+    def __init__(self, roots, sweep_every=SWEEP_EVERY):
+        self.roots = list(roots)
+        self.sweep_every = sweep_every
+        self.files = {}
+        self.dirs = {}
+        self.recent = {}
+        self.polls = 0
+        for root in self.roots:
+            self.add_tree(root, set())
+
+    def add_tree(self, path, changed):
+        if os.path.isfile(path):
+            self.stat_file(path, changed)
+            return
+        try:
+            self.rescan_dir(path, changed)
+        except FileNotFoundError:
+            pass
+
+    def rescan_dir(self, path, changed):
+        mtime_ns = os.stat(path).st_mtime_ns
+        with os.scandir(path) as entries:
+            entries = list(entries)
+        self.dirs[path] = mtime_ns
+        seen = set()
+        for entry in entries:
+            seen.add(entry.path)
+            if entry.is_dir():
+                if entry.path not in self.dirs:
+                    self.add_tree(entry.path, changed)
+            else:
+                self.stat_file(entry.path, changed)
+        for child in [p for p in (*self.files, *self.dirs) if os.path.dirname(p) == path and p not in seen]:
+            self.remove_tree(child, changed)
+
+    def remove_tree(self, path, changed):
+        if self.files.pop(path, None) is not None:
+            changed.add(path)
+            return
+        self.dirs.pop(path, None)
+        prefix = path + os.sep
+        for file_path in [p for p in self.files if p.startswith(prefix)]:
+            del self.files[file_path]
+            changed.add(file_path)
+        for dir_path in [p for p in self.dirs if p.startswith(prefix)]:
+            del self.dirs[dir_path]
+
+    def stat_file(self, path, changed):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            if self.files.pop(path, None) is not None:
+                changed.add(path)
+            return
+        key = (stat.st_mtime_ns, stat.st_size)
+        if self.files.get(path) != key:
+            self.files[path] = key
+            changed.add(path)
+
+    def track(self, paths):
+        """Start watching paths outside the roots, such as template files, without reporting them."""
+        for path in paths:
+            self.stat_file(path, set())
+
+    def refresh(self, paths=()):
+        """Return the files that changed, appeared or disappeared since the last refresh.
+
+        paths are statted every time, for files outside the roots.
+        """
+        self.polls += 1
+        sweep = self.polls % self.sweep_every == 0
+        changed = set()
+        for root in self.roots:
+            if root not in self.dirs and root not in self.files:
+                self.add_tree(root, changed)
+        for path in list(self.dirs):
+            if path not in self.dirs:
+                continue
+            try:
+                moved = sweep or os.stat(path).st_mtime_ns != self.dirs[path]
+                if moved:
+                    self.rescan_dir(path, changed)
+            except FileNotFoundError:
+                self.remove_tree(path, changed)
+        for path in (*([] if sweep else self.recent), *paths):
+            self.stat_file(path, changed)
+
+        for path in changed:
+            self.recent.pop(path, None)
+            self.recent[path] = None
+        while len(self.recent) > RECENT_FILES:
+            del self.recent[next(iter(self.recent))]
+        return changed
+
+
+class Watcher:
+    """Keeps the template and every page's rendered body in memory between rebuilds.
+
+    A markdown edit re-parses just that page; a template edit re-renders
+    every page from its cached body without parsing any markdown again.
+    """
+    def __init__(
+        self, content_dir, template_path, static_dir, output_dir, live_reload=True,
+        fingerprint=False, checksum=False, link="copy", cache=None, sweep_every=SWEEP_EVERY,
+    ):
+        self.content_dir = content_dir
+        self.template_path = template_path
+        self.static_dir = static_dir
+        self.output_dir = output_dir
+        self.live_reload = live_reload
+        self.fingerprint = fingerprint
+        self.checksum = checksum
+        self.link = link
+        self.sweep_every = sweep_every
+        self.asset_urls = as_asset_urls(None)
+        self.base_template = None
+        self.template = None
+        self.graph = DependencyGraph()
+        self.pages = {}
+        self.bodies = {}
+        # The PageMeta of every page, kept up to date for the Nav slot.
+        self.metadata = {}
+        self.snapshot = None
+        self.build_id = 0
+        # Unchanged blocks of an edited page are not parsed again.
+        self.cache = BlockCache() if cache is None else cache
+
+    def place_static(self):
+        """Sync static files and return whether the fingerprinted asset urls changed."""
+        sync_tree(self.static_dir, self.output_dir, checksum=self.checksum, link=self.link)
+        if not self.fingerprint:
+            remove_fingerprints(self.output_dir)
+            return False
+        asset_urls = as_asset_urls(fingerprint_assets(self.static_dir, self.output_dir, self.link))
+        if asset_urls == self.asset_urls:
+            return False
+        self.asset_urls = asset_urls
+        return True
+
+    def load_template(self):
+        self.base_template = self.template = load_template(self.template_path).with_asset_urls(self.asset_urls)
+
+    def with_nav(self, template):
+        """Return template with its Nav slot filled from the current pages."""
+        if "Nav" not in template.slots:
+            return template
+        from navigation import bind_nav, metadata_table
+
+        return bind_nav(template, metadata_table(self.metadata[from_path] for from_path in self.pages))
+
+    def update_metadata(self, from_paths):
+        """Read the nav metadata of from_paths again, for pages that were added or edited."""
+        if "Nav" not in self.base_template.slots:
+            # Read them all again should the Nav slot come back.
+            self.metadata.clear()
+            return
+        from navigation import read_page_meta
+
+        for from_path in from_paths:
+            self.metadata[from_path] = read_page_meta(from_path, self.pages[from_path], self.output_dir)
+
+    def template_files(self):
+        return [path for path, _, _ in self.template.dependencies]
+
+    def render(self, from_path):
+        """Write one page from its cached variables with the current template."""
+        html = self.template.render(self.bodies[from_path])
+        if self.live_reload:
+            head, marker, tail = html.rpartition("</body>")
+            html = head + LIVE_RELOAD_SCRIPT + marker + tail if marker else html + LIVE_RELOAD_SCRIPT
+
+        dest_path = self.pages[from_path]
+        os.makedirs(dest_path, exist_ok=True)
+        with open(os.path.join(dest_path, "index.html"), "w") as f:
+            f.write(html)
+        self.graph.set_inputs(from_path, [from_path, *self.template_files()])
+
+    def parse_safely(self, from_path):
+        """Parse a page into its cached variables, reporting errors instead of stopping the watch."""
+        try:
+            variables = read_page(from_path, self.cache, asset_urls=self.asset_urls)
+        except Exception as e:
+            print(f"Error generating page from {from_path}: {type(e).__name__}: {e}", file=sys.stderr)
+            self.bodies.pop(from_path, None)
+            # Still watched, so fixing the source rebuilds the page.
+            self.graph.set_inputs(from_path, [from_path, *self.template_files()])
+            return False
+        variables["Content"] = variables["Content"].to_html()
+        self.bodies[from_path] = variables
+        return True
+
+    def build_all(self):
+        # Pages written here carry the live-reload script, so the next regular
+        # build must not trust the manifest's record of them.
+        try:
+            os.remove(os.path.join(self.output_dir, MANIFEST_NAME))
+        except FileNotFoundError:
+            pass
+
+        self.place_static()
+        self.load_template()
+        self.pages = dict(discover_pages(self.content_dir, self.output_dir))
+        self.metadata = {}
+        self.update_metadata(self.pages)
+        self.template = self.with_nav(self.base_template)
+        for from_path in self.pages:
+            if self.parse_safely(from_path):
+                self.render(from_path)
+        self.snapshot = Snapshot([self.content_dir, self.static_dir], self.sweep_every)
+        self.snapshot.track(self.template_files())
+        self.publish()
+
+    def check(self):
+        """Rebuild whatever changed since the last check; return the pages written."""
+        changed = self.snapshot.refresh(self.template_files())
+        if not changed:
+            return []
+
+        dirty = set()
+        reload_template = bool(changed & set(self.template_files()))
+        if any(path.startswith(self.static_dir + os.sep) for path in changed) and self.place_static():
+            # Pages link to the new asset urls, so every one is parsed again.
+            self.bodies.clear()
+            dirty |= set(self.pages)
+            reload_template = True
+        if reload_template:
+            self.load_template()
+            # The new template may include partials we were not watching yet.
+            self.snapshot.track(self.template_files())
+
+        pages = dict(discover_pages(self.content_dir, self.output_dir))
+        for from_path in set(self.pages) - set(pages):
+            dirty |= self.remove_page(from_path, pages)
+        added = set(pages) - set(self.pages)
+        dirty |= self.graph.affected(changed) | added
+        self.pages = pages
+        self.update_metadata(added | (changed & set(pages)) | (set(pages) - set(self.metadata)))
+        template = self.with_nav(self.base_template)
+        if template.digest != self.template.digest:
+            # A page was added, removed or retitled: every page shows the nav.
+            dirty |= set(pages)
+        self.template = template
+
+        written = []
+        for from_path in sorted(dirty & set(pages)):
+            if from_path in changed or from_path not in self.bodies:
+                if not self.parse_safely(from_path):
+                    continue
+            self.render(from_path)
+            written.append(from_path)
+
+        self.publish()
+        return written
+
+    def remove_page(self, from_path, pages):
+        """Forget a deleted page and remove its output; return the remaining pages that share the output.
+
+        Those must render again, since the output may hold the deleted page.
+        """
+        dest_path = self.pages[from_path]
+        self.bodies.pop(from_path, None)
+        self.metadata.pop(from_path, None)
+        self.graph.remove(from_path)
+        survivors = {path for path, dest in pages.items() if dest == dest_path}
+        if survivors:
+            return survivors
+        output = os.path.join(dest_path, "index.html")
+        if os.path.exists(output):
+            os.remove(output)
+            remove_empty_dirs(dest_path, self.output_dir)
+        return set()
+
+    def publish(self):
+        """Bump the build id the live-reload endpoint watches."""
+        self.build_id += 1
+        path = os.path.join(self.output_dir, BUILD_ID_NAME)
+        with open(path + ".tmp", "w") as f:
+            f.write(f"{os.getpid()}-{self.build_id}")
+        os.replace(path + ".tmp", path)
+
+    def run(self, interval=0.05):
+        self.build_all()
+        print(f"Watching {self.content_dir}, {self.static_dir} and {self.template_path} for changes...")
+        while True:
+            time.sleep(interval)
+            start = time.perf_counter()
+            written = self.check()
+            if written:
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"Rebuilt {len(written)} page(s) in {elapsed:.0f} ms")